@@ -0,0 +1,117 @@
+"""
+Recall-vs-latency report for reduced-dimension embeddings.
+
+Usage (from the api/ directory, with the usual API environment variables):
+    python -m benchmarks.bench_embedding_dimensions --user-id <uuid> --queries queries.txt
+
+Two sections are printed:
+  * online:  for every query, match_document_chunks (full) and
+             match_document_chunks_reduced are called and timed; recall@k is
+             the share of the full top-k also returned by the reduced RPC.
+  * offline: a sample of the tenant's full embeddings is fetched and brute-force
+             top-k is recomputed at each candidate size (e.g. 256/512/1024),
+             to choose a size before changing the schema.
+"""
+import argparse
+import asyncio
+import json
+import math
+import statistics
+import time
+
+from core.embeddings import FULL_EMBEDDING_DIMENSIONS, reduce_embedding
+from infrastructure.openai_adapter import OpenAIEmbeddingAdapter
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+def _top_k(query: list[float], vectors: dict[str, list[float]], k: int) -> list[str]:
+    def cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        return dot / ((math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))) or 1.0)
+
+    scored = sorted(vectors.items(), key=lambda item: cosine(query, item[1]), reverse=True)
+    return [chunk_id for chunk_id, _ in scored[:k]]
+
+
+async def _timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def online(adapter: SupabaseAdapter, user_id: str, embeddings: list[list[float]], k: int):
+    full_ms, reduced_ms, recalls = [], [], []
+    for embedding in embeddings:
+        full, t_full = await _timed(adapter._match_chunks(
+            "match_document_chunks", user_id, embedding, 0.0, k))
+        reduced, t_reduced = await _timed(adapter._match_chunks(
+            "match_document_chunks_reduced", user_id, reduce_embedding(embedding), 0.0, k))
+        full_ms.append(t_full)
+        reduced_ms.append(t_reduced)
+        if full:
+            full_ids = {row["id"] for row in full}
+            recalls.append(len(full_ids & {row["id"] for row in reduced}) / len(full_ids))
+
+    print("\n== online (deployed reduced column) ==")
+    print(f"{'rpc':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, samples in (("full", full_ms), ("reduced", reduced_ms)):
+        samples.sort()
+        print(f"{name:>10} {statistics.median(samples):>9.1f} {samples[int(len(samples) * 0.95) - 1]:>9.1f}")
+    if recalls:
+        print(f"recall@{k}: mean {statistics.mean(recalls):.3f}, min {min(recalls):.3f}")
+
+
+async def offline(adapter: SupabaseAdapter, user_id: str, embeddings: list[list[float]], k: int, dims: list[int], sample: int):
+    query = (
+        adapter.client.table("document_chunks")
+        .select("id, embedding")
+        .eq("user_id", user_id)
+        .limit(sample)
+    )
+    rows = (await adapter._execute(query)).data or []
+    vectors = {
+        row["id"]: json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"]
+        for row in rows if row.get("embedding")
+    }
+    if not vectors:
+        print("\nNo full embeddings found for this tenant; skipping offline section.")
+        return
+
+    truth = [set(_top_k(e, vectors, k)) for e in embeddings]
+    print(f"\n== offline ({len(vectors)} sampled chunks) ==")
+    print(f"{'dims':>6} {'bytes/vec':>10} {'recall@' + str(k):>10}")
+    print(f"{FULL_EMBEDDING_DIMENSIONS:>6} {FULL_EMBEDDING_DIMENSIONS * 4:>10} {1.0:>10.3f}")
+    for d in dims:
+        reduced_vectors = {cid: reduce_embedding(v, d) for cid, v in vectors.items()}
+        recalls = [
+            len(expected & set(_top_k(reduce_embedding(e, d), reduced_vectors, k))) / len(expected)
+            for e, expected in zip(embeddings, truth) if expected
+        ]
+        print(f"{d:>6} {d * 4:>10} {statistics.mean(recalls):>10.3f}")
+
+
+async def run(args):
+    supabase = SupabaseAdapter()
+    embedder = OpenAIEmbeddingAdapter(api_key=None, supabase_adapter=supabase, gemini_adapter=None)
+    with open(args.queries) as fh:
+        queries = [line.strip() for line in fh if line.strip()]
+    embeddings = [e for e in await embedder.get_embeddings(queries) if e]
+    if len(embeddings[0]) != FULL_EMBEDDING_DIMENSIONS:
+        raise SystemExit("Run with EMBEDDING_MIGRATION_MODE=full or dual_read so full vectors are returned.")
+
+    await online(supabase, args.user_id, embeddings, args.match_count)
+    await offline(supabase, args.user_id, embeddings, args.match_count, args.dims, args.sample)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", required=True, help="Tenant whose knowledge base is searched")
+    parser.add_argument("--queries", required=True, help="File with one sample query per line")
+    parser.add_argument("--match-count", type=int, default=5)
+    parser.add_argument("--dims", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--sample", type=int, default=1000, help="Chunks sampled for the offline section")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
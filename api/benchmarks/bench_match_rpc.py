@@ -0,0 +1,83 @@
+"""
+Compares match_document_chunks (v1, global index) with the tenant-aware
+match_document_chunks_v2 (migration 013) on latency and recall.
+
+Usage (from the api/ directory, with the usual API environment variables):
+    python -m benchmarks.bench_match_rpc --user-id <uuid> --queries queries.txt \
+        --ef-search 40 100 200
+
+Ground truth is an exact scan, obtained by calling v2 with an exact_threshold
+larger than any tenant. Run it once for a small and once for a large tenant:
+small tenants should hit the exact path, large ones the HNSW path.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from infrastructure.openai_adapter import OpenAIEmbeddingAdapter
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+EXACT_THRESHOLD = 2_000_000_000
+
+
+async def _timed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, (time.perf_counter() - started) * 1000
+
+
+def _report(name: str, latencies: list[float], recalls: list[float]):
+    latencies.sort()
+    p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)]
+    recall = f"{statistics.mean(recalls):.3f}" if recalls else "n/a"
+    print(f"{name:>18} {statistics.median(latencies):>9.1f} {p95:>9.1f} {recall:>9}")
+
+
+async def run(args):
+    supabase = SupabaseAdapter()
+    embedder = OpenAIEmbeddingAdapter(api_key=None, supabase_adapter=supabase, gemini_adapter=None)
+    with open(args.queries) as fh:
+        queries = [line.strip() for line in fh if line.strip()]
+    embeddings = [e for e in await embedder.get_embeddings(queries) if e]
+
+    k = args.match_count
+    truth = []
+    for embedding in embeddings:
+        rows = await supabase._match_chunks(
+            "match_document_chunks_v2", args.user_id, embedding, 0.0, k,
+            exact_threshold=EXACT_THRESHOLD,
+        )
+        truth.append({row["id"] for row in rows})
+
+    variants = [("v1", "match_document_chunks", {})]
+    variants += [
+        (f"v2 ef_search={ef}", "match_document_chunks_v2", {"ef_search": ef})
+        for ef in args.ef_search
+    ]
+
+    print(f"{'rpc':>18} {'p50 ms':>9} {'p95 ms':>9} {'recall@' + str(k):>9}")
+    for name, rpc, params in variants:
+        latencies, recalls = [], []
+        for _ in range(args.repeat):
+            for embedding, expected in zip(embeddings, truth):
+                rows, ms = await _timed(supabase._match_chunks(
+                    rpc, args.user_id, embedding, 0.0, k, **params))
+                latencies.append(ms)
+                if expected:
+                    recalls.append(len(expected & {row["id"] for row in rows}) / len(expected))
+        _report(name, latencies, recalls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user-id", required=True, help="Tenant whose knowledge base is searched")
+    parser.add_argument("--queries", required=True, help="File with one sample query per line")
+    parser.add_argument("--match-count", type=int, default=5)
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[40, 100, 200])
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the query set")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
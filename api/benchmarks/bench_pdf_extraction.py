@@ -0,0 +1,96 @@
+"""
+Benchmarks PDF text extraction across a corpus of sample PDFs.
+
+Usage (from the api/ directory):
+    python -m benchmarks.bench_pdf_extraction /path/to/pdf/corpus --workers 1 2 4
+
+For every pool size it reports per-file latency percentiles, pages per second
+and how long the event loop was blocked (it should stay near zero, since all
+parsing happens in the process pool).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from pathlib import Path
+
+from infrastructure.pdf_extractor import PdfTextExtractor, PdfExtractionError
+
+
+async def _loop_lag_probe(stop: asyncio.Event, samples: list[float], interval: float = 0.01):
+    """Measures how late the event loop wakes up, i.e. how long it was blocked."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+async def _run(files: list[Path], workers: int, concurrency: int, timeout: float) -> dict:
+    extractor = PdfTextExtractor(max_workers=workers, timeout=timeout)
+    # Warm the pool so process start-up is not counted against the first file.
+    extractor._get_executor().submit(int).result()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    pages = 0
+    failures = 0
+
+    async def one(path: Path):
+        nonlocal pages, failures
+        data = path.read_bytes()
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async for _ in extractor.iter_pages(data):
+                    pages += 1
+            except PdfExtractionError:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lag: list[float] = []
+    probe = asyncio.create_task(_loop_lag_probe(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in files))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    extractor.shutdown()
+
+    latencies.sort()
+    return {
+        "workers": workers,
+        "files": len(files),
+        "failures": failures,
+        "pages": pages,
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0.0,
+        "max_loop_lag_ms": max(lag, default=0.0) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", type=Path, help="Directory containing sample PDFs")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="Files extracted concurrently")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-file timeout in seconds")
+    args = parser.parse_args()
+
+    files = sorted(args.corpus.rglob("*.pdf"))
+    if not files:
+        parser.error(f"No PDFs found under {args.corpus}")
+
+    print(f"{'workers':>7} {'files':>6} {'fail':>5} {'pages':>7} {'pages/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'loop lag ms':>12}")
+    for workers in args.workers:
+        r = asyncio.run(_run(files, workers, args.concurrency, args.timeout))
+        print(
+            f"{r['workers']:>7} {r['files']:>6} {r['failures']:>5} {r['pages']:>7} "
+            f"{r['pages_per_sec']:>9.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['max_loop_lag_ms']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
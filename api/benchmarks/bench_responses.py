@@ -0,0 +1,130 @@
+"""
+Benchmarks JSON serialization and compression of our largest API payloads.
+
+Usage (from the api/ directory):
+    python -m benchmarks.bench_responses --rows 100 500 1000 --repeat 50
+
+Payloads are synthetic but shaped like the real responses: a documents
+listing, a page of performance logs and an admin conversation listing.
+For each it reports the serialization CPU time of the stdlib encoder used by
+JSONResponse versus orjson, and the bytes on the wire uncompressed, with
+gzip and with brotli at the levels used by CompressionMiddleware.
+"""
+import argparse
+import gzip
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from core.compression import BROTLI_QUALITY, GZIP_LEVEL, brotli
+
+
+def _documents(rows: int) -> list[dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "file_name": f"catalogo-productos-{i}.pdf",
+            "storage_path": f"{uuid.uuid4()}/catalogo-productos-{i}.pdf",
+            "status": "completed" if i % 7 else "processing",
+            "created_at": (now - timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(rows)
+    ]
+
+
+def _performance_logs(rows: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "user_id": str(uuid.uuid4()),
+        "logs": [
+            {
+                "id": str(uuid.uuid4()),
+                "agent_id": str(uuid.uuid4()),
+                "created_at": (now - timedelta(seconds=i)).isoformat(),
+                "ingest_ms": 12 + i % 5,
+                "queue_wait_ms": 150 + i % 90,
+                "retrieval_ms": 80 + i % 40,
+                "generation_ms": 900 + i % 700,
+                "total_ms": 1150 + i % 800,
+            }
+            for i in range(rows)
+        ],
+        "next_cursor": "eyJjcmVhdGVkX2F0IjogIjIwMjUtMDEtMDEifQ",
+    }
+
+
+def _conversations(rows: int) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "items": [
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": str(uuid.uuid4()),
+                "agent_id": str(uuid.uuid4()),
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+                "ended_at": None,
+            }
+            for i in range(rows)
+        ],
+        "next_cursor": None,
+    }
+
+
+PAYLOADS = {
+    "documents": _documents,
+    "performance_log": _performance_logs,
+    "admin_conversations": _conversations,
+}
+
+
+def _time_per_call(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def _stdlib_dumps(content) -> bytes:
+    # What starlette's JSONResponse does.
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 500, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(
+        f"{'payload':<20} {'rows':>6} {'json ms':>8} {'orjson ms':>9} "
+        f"{'raw KB':>8} {'gzip KB':>8} {'br KB':>8} {'gzip ms':>8} {'br ms':>8}"
+    )
+    for name, build in PAYLOADS.items():
+        for rows in args.rows:
+            content = jsonable_encoder(build(rows))
+            json_s = _time_per_call(lambda: _stdlib_dumps(content), args.repeat)
+            orjson_s = _time_per_call(lambda: orjson.dumps(content), args.repeat)
+
+            body = orjson.dumps(content)
+            gzipped = gzip.compress(body, compresslevel=GZIP_LEVEL)
+            gzip_s = _time_per_call(lambda: gzip.compress(body, compresslevel=GZIP_LEVEL), args.repeat)
+            if brotli is not None:
+                br_size = f"{len(brotli.compress(body, quality=BROTLI_QUALITY)) / 1024:>8.1f}"
+                br_ms = f"{_time_per_call(lambda: brotli.compress(body, quality=BROTLI_QUALITY), args.repeat) * 1000:>8.2f}"
+            else:
+                br_size = br_ms = f"{'n/a':>8}"
+
+            print(
+                f"{name:<20} {rows:>6} {json_s * 1000:>8.2f} {orjson_s * 1000:>9.2f} "
+                f"{len(body) / 1024:>8.1f} {len(gzipped) / 1024:>8.1f} {br_size} "
+                f"{gzip_s * 1000:>8.2f} {br_ms}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+import os
+import math
+import time
+import uuid
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable
+
+from fastapi.responses import ORJSONResponse
+from prometheus_client import Counter as MetricCounter, Gauge
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# How long a user's plan limits are reused before being read again.
+RATE_LIMIT_PLAN_TTL_SECONDS = float(os.getenv("RATE_LIMIT_PLAN_TTL_SECONDS", "300"))
+# Instances exchange their consumption this often through the shared store;
+# 0 keeps every instance's buckets purely local.
+RATE_LIMIT_SYNC_SECONDS = float(os.getenv("RATE_LIMIT_SYNC_SECONDS", "0"))
+# Idle buckets are full, so evicting the least recently used loses nothing.
+RATE_LIMIT_MAX_BUCKETS = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "50000"))
+
+# Limits for users without an active subscription (same as the free plan).
+DEFAULT_RATE_LIMITS = {
+    "rate_limit_per_minute": 20,
+    "rate_limit_burst": 10,
+    "agent_rate_limit_per_minute": 10,
+    "agent_rate_limit_burst": 5,
+}
+
+# Paths never throttled: probes must work while a tenant is limited.
+UNTHROTTLED_PATHS = ("/health", "/docs", "/openapi.json")
+
+ADMISSION_DECISIONS = MetricCounter(
+    "admission_decisions_total", "Requests admitted or throttled by the per-tenant rate limiter.", ["source", "outcome"]
+)
+ADMISSION_BUCKETS = Gauge("admission_buckets", "Token buckets held in memory.")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, per_minute: float, burst: int, now: float):
+        self.rate = per_minute / 60
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available; 0 when one is available now."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+    def debit(self, tokens: float):
+        # May go negative when other instances consumed tokens in the meantime.
+        self.tokens -= tokens
+
+
+class AdmissionController:
+    """
+    Per-user and per-agent token buckets sized by the user's plan.
+
+    Buckets live in memory, so admitting a request costs no I/O once the
+    user's limits are cached. With a shared store, instances periodically
+    report what they consumed and debit what the others consumed, which
+    keeps the effective limit close to the plan's across the fleet.
+    """
+
+    def __init__(
+        self,
+        load_limits: Callable[[str], Awaitable[dict | None]],
+        sync_usage: Callable[[str, dict[str, int]], Awaitable[dict[tuple[str, str], int]]] | None = None,
+        enabled: bool = RATE_LIMIT_ENABLED,
+        plan_ttl: float = RATE_LIMIT_PLAN_TTL_SECONDS,
+        sync_interval: float = RATE_LIMIT_SYNC_SECONDS,
+        max_buckets: int = RATE_LIMIT_MAX_BUCKETS,
+    ):
+        self._load_limits = load_limits
+        self._sync_usage = sync_usage
+        self.enabled = enabled
+        self.plan_ttl = plan_ttl
+        self.sync_interval = sync_interval
+        self.max_buckets = max_buckets
+        self.instance_id = uuid.uuid4().hex
+        self._limits: dict[str, tuple[float, dict]] = {}
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        # Tokens consumed here since the last sync, and the other instances'
+        # counters seen then, by (bucket, instance).
+        self._consumed: Counter[str] = Counter()
+        self._others_seen: dict[tuple[str, str], int] = {}
+        self._task: asyncio.Task | None = None
+
+    async def _limits_for(self, user_id: str) -> dict:
+        cached = self._limits.get(user_id)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        try:
+            limits = await self._load_limits(user_id) or DEFAULT_RATE_LIMITS
+        except Exception as e:
+            logger.error(f"Could not load rate limits for user {user_id}: {e}")
+            limits = cached[1] if cached is not None else DEFAULT_RATE_LIMITS
+        self._limits[user_id] = (now + self.plan_ttl, limits)
+        return limits
+
+    async def prime(self, user_ids: list[str]):
+        """Loads the limits of these users ahead of their next request."""
+        await asyncio.gather(*(self._limits_for(user_id) for user_id in user_ids))
+
+    def _bucket(self, key: str, per_minute: float, burst: int, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.rate != per_minute / 60 or bucket.capacity != max(burst, 1):
+            bucket = self._buckets[key] = TokenBucket(per_minute, burst, now)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+            ADMISSION_BUCKETS.set(len(self._buckets))
+        self._buckets.move_to_end(key)
+        return bucket
+
+    async def admit(self, user_id: str, agent_id: str | None = None, source: str = "api") -> float:
+        """
+        Takes a token from the user's bucket and, when given, the agent's.
+        Returns 0 when admitted, else the seconds to wait before retrying.
+        """
+        if not self.enabled:
+            return 0.0
+        limits = await self._limits_for(user_id)
+        now = time.monotonic()
+        keys = [f"user:{user_id}"]
+        buckets = [self._bucket(keys[0], limits["rate_limit_per_minute"], limits["rate_limit_burst"], now)]
+        if agent_id:
+            keys.append(f"agent:{user_id}:{agent_id}")
+            buckets.append(
+                self._bucket(keys[1], limits["agent_rate_limit_per_minute"], limits["agent_rate_limit_burst"], now)
+            )
+
+        wait = max(bucket.wait_time(now) for bucket in buckets)
+        if wait > 0:
+            ADMISSION_DECISIONS.labels(source, "throttled").inc()
+            return wait
+        for key, bucket in zip(keys, buckets):
+            bucket.debit(1)
+            self._consumed[key] += 1
+        ADMISSION_DECISIONS.labels(source, "admitted").inc()
+        return 0.0
+
+    async def sync(self):
+        """Exchanges consumption with the other instances through the shared store."""
+        if self._sync_usage is None:
+            return
+        consumed, self._consumed = dict(self._consumed), Counter()
+        try:
+            others = await self._sync_usage(self.instance_id, consumed)
+        except Exception as e:
+            logger.error(f"Could not sync rate limit usage: {e}")
+            self._consumed.update(consumed)
+            return
+        seen = {}
+        for (key, instance_id), consumed_there in others.items():
+            seen[key, instance_id] = consumed_there
+            previous = self._others_seen.get((key, instance_id))
+            if previous is None:
+                # First sight of this counter: only later growth is new.
+                continue
+            # Counters only grow; a lower one was purged and started over.
+            delta = consumed_there - previous if consumed_there >= previous else consumed_there
+            bucket = self._buckets.get(key)
+            if bucket is not None and delta > 0:
+                bucket.debit(delta)
+        # Counters idle for a while are not returned; keep their last value
+        # while the bucket is in use, so only their growth counts when they are.
+        for (key, instance_id), consumed_there in self._others_seen.items():
+            if (key, instance_id) not in seen and key in self._buckets:
+                seen[key, instance_id] = consumed_there
+        self._others_seen = seen
+
+    def start(self):
+        if self._task is None and self._sync_usage is not None and self.sync_interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+
+def throttled_response(retry_after: float) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": "Too many requests. Please slow down."},
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    Applies the user's token bucket to every request that identifies a user.
+    `identify` maps request headers to a user ID, or None for anonymous
+    requests, which are left to the endpoints.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: AdmissionController,
+        identify: Callable[[Headers], str | None],
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.identify = identify
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(UNTHROTTLED_PATHS):
+            await self.app(scope, receive, send)
+            return
+        user_id = self.identify(Headers(scope=scope))
+        if user_id is not None:
+            retry_after = await self.controller.admit(user_id)
+            if retry_after > 0:
+                await throttled_response(retry_after)(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -1,9 +1,23 @@
+import os
 import logging
+from functools import partial
 from typing import Optional
 
+from core.fair_scheduler import FairScheduler
+from core.query_expansion import expand_query
+from core.timing import timed_phase
+
 
 logger = logging.getLogger(__name__)
 
+# Retrieval used for chat RAG. Hybrid search ranks exact SKU/product matches
+# well enough that fewer chunks are needed in the prompt.
+CHAT_SEARCH_MODE = os.getenv("RAG_CHAT_SEARCH_MODE", "hybrid")
+CHAT_MATCH_COUNT = int(os.getenv("RAG_CHAT_MATCH_COUNT", "3"))
+# Expand chat queries into variants (history rewrite, keywords). All variants
+# are embedded in one request and searched in one RPC.
+QUERY_EXPANSION = os.getenv("RAG_QUERY_EXPANSION", "true").lower() == "true"
+
 
 class AIRouter:
     def __init__(
@@ -12,6 +26,7 @@ class AIRouter:
         deepseek_v2_adapter,
         deepseek_chat_adapter,
         openai_embedding_adapter,
+        scheduler: Optional[FairScheduler] = None,
     ):
         self.gemini_adapter = gemini_adapter
         self.deepseek_v2_adapter = deepseek_v2_adapter
@@ -19,10 +34,41 @@ class AIRouter:
         self.openai_embedding_adapter = openai_embedding_adapter
         # Reuse Supabase adapter from the embedding adapter for RAG searches
         self.supabase_adapter = openai_embedding_adapter.supabase_adapter
+        # Shares LLM capacity fairly between tenants when set
+        self.scheduler = scheduler
 
     async def _get_embedding(self, text: str) -> list[float]:
         return await self.openai_embedding_adapter.get_embedding(text)
 
+    async def _retrieve_chunks(
+        self, user_id: str, query: str, history: list, agent_id: Optional[str]
+    ) -> list:
+        """Finds context for a chat query, expanding it into variants when enabled."""
+        # The multi-query RPC only serves hybrid search on full vectors; other
+        # configurations search the original query alone.
+        expand = QUERY_EXPANSION and self.supabase_adapter.multi_query_supported(CHAT_SEARCH_MODE)
+        variants = expand_query(query, history) if expand else [query]
+
+        if len(variants) > 1:
+            embeddings = await self.openai_embedding_adapter.get_embeddings(variants)
+            return await self.supabase_adapter.find_relevant_chunks_multi(
+                user_id,
+                embeddings,
+                match_count=CHAT_MATCH_COUNT,
+                query_texts=variants,
+                agent_id=agent_id,
+            ) or []
+
+        query_embedding = await self._get_embedding(query)
+        return await self.supabase_adapter.find_relevant_chunks(
+            user_id,
+            query_embedding,
+            match_count=CHAT_MATCH_COUNT,
+            search_mode=CHAT_SEARCH_MODE,
+            agent_id=agent_id,
+            query_text=query,
+        ) or []
+
     async def route_query(
         self,
         user_id: str,
@@ -31,30 +77,51 @@ class AIRouter:
         task: str,
         agent_prompt: Optional[str] = None,
         agent_guardrails: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> str:
         """
         Routes a query to the appropriate AI model based on the specified task,
         implementing the 'Santo Grial' architecture with a full RAG pipeline.
+
+        With a scheduler, the query waits for its tenant's fair share of LLM
+        capacity; `deadline` (epoch seconds) drops it with DeadlineExceeded
+        if it would start too late to be useful.
         """
+        route = partial(
+            self._route_query, user_id, query, history, task, agent_prompt, agent_guardrails, agent_id
+        )
+        if self.scheduler is None:
+            return await route()
+        return await self.scheduler.run(user_id, route, deadline)
+
+    async def _route_query(
+        self,
+        user_id: str,
+        query: str,
+        history: list,
+        task: str,
+        agent_prompt: Optional[str],
+        agent_guardrails: Optional[str],
+        agent_id: Optional[str],
+    ) -> str:
         # Task-based routing as per AGENT.md
         if task == 'analysis':
             logger.info("Routing to DeepSeek-V2 for analysis.")
-            return await self.deepseek_v2_adapter.generate_response(query, history)
+            with timed_phase("generation_ms"):
+                return await self.deepseek_v2_adapter.generate_response(query, history)
 
         elif task == 'extraction':
             logger.info("Routing to DeepSeek-Chat for data extraction.")
-            return await self.deepseek_chat_adapter.generate_response(query, history)
+            with timed_phase("generation_ms"):
+                return await self.deepseek_chat_adapter.generate_response(query, history)
 
         elif task == 'chat':
             # --- RAG Pipeline ---
             logger.info("Initiating RAG pipeline for chat query.")
-            # 1. Get embedding for the user's query
-            query_embedding = await self._get_embedding(query)
-
-            # 2. Find relevant document chunks
-            relevant_chunks = await self.supabase_adapter.find_relevant_chunks(
-                user_id, query_embedding
-            ) or []
+            # 1-2. Embed the query (and its variants) and find relevant chunks
+            with timed_phase("retrieval_ms"):
+                relevant_chunks = await self._retrieve_chunks(user_id, query, history, agent_id)
 
             context = ""
             if relevant_chunks:
@@ -72,8 +139,10 @@ class AIRouter:
                 full_prompt = f"Guardrails (must follow):\n{agent_guardrails}\n\n{full_prompt}"
 
             logger.info("Routing to Gemini 1.5 Flash for RAG-enhanced chat.")
-            return await self.gemini_adapter.generate_response(prompt=full_prompt, history=history)
+            with timed_phase("generation_ms"):
+                return await self.gemini_adapter.generate_response(prompt=full_prompt, history=history)
 
         else:
             logger.warning("Unknown task '%s'. Defaulting to Gemini for general chat.", task)
-            return await self.gemini_adapter.generate_response(prompt=query, history=history)
+            with timed_phase("generation_ms"):
+                return await self.gemini_adapter.generate_response(prompt=query, history=history)
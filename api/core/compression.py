@@ -0,0 +1,133 @@
+import os
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; clients then get gzip.
+    brotli = None
+
+# Responses smaller than this go out uncompressed; the savings would not
+# pay for the CPU time and the encoding overhead.
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+# Levels tuned for dynamic responses: most of the size reduction at a
+# fraction of the CPU cost of the maximum settings.
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Already-compressed or event-stream bodies are passed through untouched.
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "application/gzip", "application/zip")
+
+
+def choose_encoding(accept_encoding: str) -> str | None:
+    """
+    Picks the response encoding from an Accept-Encoding header: brotli when
+    available and accepted, else gzip, else None. Codings with q=0 are refused.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = quality
+
+    def acceptable(coding: str) -> bool:
+        return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+    if brotli is not None and acceptable("br"):
+        return "br"
+    if acceptable("gzip"):
+        return "gzip"
+    return None
+
+
+class _SkipsCompressedTypes:
+    """Extends the excluded content types of Starlette's responders."""
+
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(EXCLUDED_CONTENT_TYPES):
+                self.content_type_is_excluded = True
+
+
+class _TagsEncodedETags:
+    """
+    Suffixes the ETag of responses this responder compresses with the coding,
+    so gzip, br and identity bodies never share a strong ETag. A 304 keeps the
+    suffixed ETag the client revalidated with.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if_none_match = Headers(scope=scope).get("if-none-match", "")
+
+        async def send_tagged(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if etag:
+                    tagged = encoded_etag(etag, self.content_encoding)
+                    compressed = headers.get("content-encoding") == self.content_encoding
+                    if (compressed and not self.content_encoding_set) or (message["status"] == 304 and tagged in if_none_match):
+                        headers["ETag"] = tagged
+            await send(message)
+
+        await super().__call__(scope, receive, send_tagged)
+
+
+class _IdentityResponder(_SkipsCompressedTypes, IdentityResponder):
+    pass
+
+
+class _GZipResponder(_TagsEncodedETags, _SkipsCompressedTypes, GZipResponder):
+    pass
+
+
+class _BrotliResponder(_TagsEncodedETags, _SkipsCompressedTypes, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = BROTLI_QUALITY) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        # Flush each streamed chunk so NDJSON rows reach the client promptly.
+        return data + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least `minimum_size` bytes with brotli or gzip,
+    as negotiated through Accept-Encoding. Streaming responses are compressed
+    chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_BYTES) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding == "br":
+            responder = _BrotliResponder(self.app, self.minimum_size)
+        elif encoding == "gzip":
+            responder = _GZipResponder(self.app, self.minimum_size, compresslevel=GZIP_LEVEL)
+        else:
+            responder = _IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -6,6 +6,16 @@ from functools import lru_cache
 import stripe
 
 
+# Base URL of the provider emulator (infrastructure/provider_emulator.py).
+# When set, the Gemini, DeepSeek and OpenAI adapters call it instead of the
+# real providers, e.g. for load tests.
+PROVIDER_EMULATOR_URL = os.getenv("PROVIDER_EMULATOR_URL", "").rstrip("/")
+
+# Bearer token Prometheus sends to scrape /metrics. Without one, /metrics is
+# not served: the API is public.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
 @dataclass
 class Settings:
     # Supabase
@@ -26,6 +36,8 @@ class Settings:
     stripe_api_key: str
     stripe_webhook_secret: str
     frontend_url: str
+    # Queue of text chat messages, consumed by jobs/chat_consumer.py (optional)
+    cloudflare_chat_queue_id: str = ""
 
 
 @lru_cache
@@ -66,4 +78,5 @@ def get_settings() -> Settings:
         stripe_api_key=os.environ["STRIPE_API_KEY"],
         stripe_webhook_secret=os.environ["STRIPE_WEBHOOK_SECRET"],
         frontend_url=os.environ["FRONTEND_URL"],
+        cloudflare_chat_queue_id=os.getenv("CLOUDFLARE_CHAT_QUEUE_ID", ""),
     )
@@ -0,0 +1,41 @@
+import os
+import math
+
+
+# Native output size of text-embedding-3-large; document_chunks.embedding uses it.
+FULL_EMBEDDING_DIMENSIONS = 3072
+
+# Size of the reduced embedding stored in document_chunks.embedding_reduced.
+# Migration 011 declares the column, trigger and match RPC as vector(1024), so
+# any other value would only fail later, on the first reduced query.
+REDUCED_EMBEDDING_COLUMN_DIMENSIONS = 1024
+EMBEDDING_DIMENSIONS = int(os.getenv("OPENAI_EMBED_DIMENSIONS", str(REDUCED_EMBEDDING_COLUMN_DIMENSIONS)))
+if EMBEDDING_DIMENSIONS != REDUCED_EMBEDDING_COLUMN_DIMENSIONS:
+    raise RuntimeError(
+        f"OPENAI_EMBED_DIMENSIONS must be {REDUCED_EMBEDDING_COLUMN_DIMENSIONS} to match migration 011"
+    )
+
+# Migration path off vector(3072):
+#   full      - read and query with full vectors only (original behaviour)
+#   dual_read - query both columns, serve full results, log reduced recall
+#   reduced   - request reduced vectors from OpenAI and query the reduced column
+# Writes are always dual: a trigger derives embedding_reduced from embedding.
+EMBEDDING_MIGRATION_MODES = ("full", "dual_read", "reduced")
+EMBEDDING_MIGRATION_MODE = os.getenv("EMBEDDING_MIGRATION_MODE", "full")
+if EMBEDDING_MIGRATION_MODE not in EMBEDDING_MIGRATION_MODES:
+    raise RuntimeError(
+        f"EMBEDDING_MIGRATION_MODE must be one of {', '.join(EMBEDDING_MIGRATION_MODES)}"
+    )
+
+
+def reduce_embedding(embedding: list[float], dimensions: int = EMBEDDING_DIMENSIONS) -> list[float]:
+    """
+    Shortens a text-embedding-3 vector to `dimensions` and re-normalizes it.
+    This is equivalent to requesting `dimensions` from the API, so full
+    vectors can be reduced locally without a second request.
+    """
+    if len(embedding) <= dimensions:
+        return embedding
+    truncated = embedding[:dimensions]
+    norm = math.sqrt(sum(x * x for x in truncated)) or 1.0
+    return [x / norm for x in truncated]
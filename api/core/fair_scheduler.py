@@ -0,0 +1,162 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from itertools import count
+from typing import Awaitable, Callable, TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# LLM turns (retrieval plus generation) running at once across all tenants.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Share of the LLM capacity per plan tier when tenants compete for it, e.g.
+# a pro tenant is served four turns for each turn of a free tenant.
+LLM_TIER_WEIGHTS = os.getenv("LLM_TIER_WEIGHTS", "free:1,pro:4")
+DEFAULT_TIER = "free"
+# How long a tenant's tier is reused before being read again.
+LLM_TIER_TTL_SECONDS = float(os.getenv("LLM_TIER_TTL_SECONDS", "300"))
+
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "llm_queue_wait_seconds",
+    "Time LLM turns waited for a slot, per plan tier.",
+    ["tier"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+LLM_QUEUED = Gauge("llm_queued", "LLM turns waiting for a slot, per plan tier.", ["tier"])
+LLM_EXPIRED = Counter("llm_expired_total", "LLM turns dropped because their deadline passed.", ["tier"])
+
+
+def parse_weights(spec: str) -> dict[str, float]:
+    """Parses "tier:weight,..." pairs."""
+    weights = {}
+    for item in spec.split(","):
+        tier, _, weight = item.partition(":")
+        if tier.strip() and weight.strip():
+            weights[tier.strip()] = float(weight)
+    return weights
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is still queued when its deadline passes."""
+
+
+class _Job:
+    __slots__ = ("tier", "deadline", "queued_at", "granted")
+
+    def __init__(self, tier: str, deadline: float | None):
+        self.tier = tier
+        self.deadline = deadline
+        self.queued_at = time.monotonic()
+        self.granted: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class FairScheduler:
+    """
+    Runs work under a global concurrency cap, sharing it fairly between tenants.
+
+    When every slot is taken, work queues and is dispatched by weighted fair
+    queuing (self-clocked): each job gets a virtual finish time one
+    weight-sized step after its tenant's previous job, and the job with the
+    earliest finish time runs next. A tenant flooding the queue only delays
+    its own work, and higher tiers get proportionally more turns. Work whose
+    deadline passes while queued is dropped with DeadlineExceeded.
+    """
+
+    def __init__(
+        self,
+        tier_of: Callable[[str], Awaitable[str | None]],
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        weights: dict[str, float] | None = None,
+        tier_ttl: float = LLM_TIER_TTL_SECONDS,
+    ):
+        self._tier_of = tier_of
+        self.max_concurrency = max_concurrency
+        self.weights = weights if weights is not None else parse_weights(LLM_TIER_WEIGHTS)
+        self.tier_ttl = tier_ttl
+        self._tiers: dict[str, tuple[float, str]] = {}
+        self._running = 0
+        # (finish_tag, sequence, job); the sequence keeps equal tags FIFO.
+        self._queue: list[tuple[float, int, _Job]] = []
+        self._sequence = count()
+        self._virtual_time = 0.0
+        self._last_finish: dict[str, float] = {}
+
+    async def tier(self, tenant_id: str) -> str:
+        cached = self._tiers.get(tenant_id)
+        now = time.monotonic()
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        try:
+            tier = await self._tier_of(tenant_id) or DEFAULT_TIER
+        except Exception as e:
+            logger.error(f"Could not load the plan tier of tenant {tenant_id}: {e}")
+            tier = cached[1] if cached is not None else DEFAULT_TIER
+        self._tiers[tenant_id] = (now + self.tier_ttl, tier)
+        return tier
+
+    async def prime(self, tenant_ids: list[str]):
+        """Loads the tiers of these tenants ahead of their next turn."""
+        await asyncio.gather(*(self.tier(tenant_id) for tenant_id in tenant_ids))
+
+    async def run(self, tenant_id: str, work: Callable[[], Awaitable[T]], deadline: float | None = None) -> T:
+        """
+        Runs `work()` once a slot is available. `deadline` is an epoch time in
+        seconds; DeadlineExceeded is raised if it passes before `work` starts.
+        """
+        tier = await self.tier(tenant_id)
+        if deadline is not None and deadline <= time.time():
+            LLM_EXPIRED.labels(tier).inc()
+            raise DeadlineExceeded(f"Deadline passed before scheduling work for tenant {tenant_id}")
+
+        if self._running < self.max_concurrency and not self._queue:
+            self._running += 1
+            LLM_QUEUE_WAIT_SECONDS.labels(tier).observe(0)
+        else:
+            await self._wait_for_slot(tenant_id, tier, deadline)
+        try:
+            return await work()
+        finally:
+            self._release()
+
+    async def _wait_for_slot(self, tenant_id: str, tier: str, deadline: float | None):
+        job = _Job(tier, deadline)
+        finish = max(self._virtual_time, self._last_finish.get(tenant_id, 0.0)) + 1 / self.weights.get(tier, 1.0)
+        self._last_finish[tenant_id] = finish
+        heapq.heappush(self._queue, (finish, next(self._sequence), job))
+        LLM_QUEUED.labels(tier).inc()
+
+        timeout = None if deadline is None else max(deadline - time.time(), 0)
+        try:
+            await asyncio.wait_for(asyncio.shield(job.granted), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if job.granted.done() and not job.granted.cancelled():
+                # The slot was granted just as we gave up; pass it on.
+                self._release()
+            else:
+                job.granted.cancel()
+            if isinstance(e, asyncio.TimeoutError):
+                LLM_EXPIRED.labels(tier).inc()
+                raise DeadlineExceeded(f"Deadline passed while work for tenant {tenant_id} was queued") from None
+            raise
+
+    def _release(self):
+        self._running -= 1
+        while self._queue and self._running < self.max_concurrency:
+            finish, _, job = heapq.heappop(self._queue)
+            LLM_QUEUED.labels(job.tier).dec()
+            if job.granted.done():
+                continue  # Gave up while queued.
+            self._virtual_time = finish
+            self._running += 1
+            LLM_QUEUE_WAIT_SECONDS.labels(job.tier).observe(time.monotonic() - job.queued_at)
+            job.granted.set_result(None)
+        if not self._queue:
+            # Idle: restart virtual time so old tags do not accumulate.
+            self._virtual_time = 0.0
+            self._last_finish.clear()
@@ -0,0 +1,143 @@
+import os
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+
+# Entries kept across all tenants; the least recently used are evicted first.
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+# How long a tenant response is reused when nothing in this API changed it.
+# Bounds staleness for data written by workers, jobs and webhooks.
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+PUBLIC_CACHE_TTL_SECONDS = 300
+
+# Scope for responses that are the same for every caller (e.g. /plans).
+PUBLIC_SCOPE = "public"
+# Cache-Control values. Tenant data may only be stored by the user's browser
+# and must be revalidated on every poll, which the ETag makes cheap.
+PUBLIC_CACHE_CONTROL = f"public, max-age={PUBLIC_CACHE_TTL_SECONDS}"
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+# Content codings whose responses carry their own ETag (see encoded_etag).
+ETAG_ENCODINGS = ("gzip", "br")
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag of a content-coded variant: '"abc"' sent as gzip is '"abc-gzip"'.
+    Each coding has different bytes, so they cannot share a strong ETag.
+    """
+    return etag[:-1] + f'-{encoding}"'
+
+
+def _strip_encoding(tag: str) -> str:
+    for encoding in ETAG_ENCODINGS:
+        if tag.endswith(f'-{encoding}"'):
+            return tag[: -len(encoding) - 2] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Implements the weak comparison RFC 9110 requires for If-None-Match. The
+    ETag of any content-coded variant of the response matches as well.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (_strip_encoding(tag.strip().removeprefix("W/")) for tag in if_none_match.split(","))
+    return etag in candidates
+
+
+class ResponseCache:
+    """
+    Rendered JSON responses per tenant, keyed by request and tenant version.
+
+    Writes made through this API bump the tenant's version with `invalidate`,
+    which retires every entry of that tenant at once. Data changed elsewhere
+    (workers, jobs, webhooks) is picked up when an entry's TTL runs out.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._versions: dict[str, int] = {}
+        # (scope, key) -> (version, expires_at, etag, body)
+        self._entries: OrderedDict[tuple[str, str], tuple[int, float, str, bytes]] = OrderedDict()
+
+    def version(self, scope: str) -> int:
+        return self._versions.get(scope, 0)
+
+    def invalidate(self, scope: str):
+        """Drops every cached response of a tenant (or the public scope)."""
+        self._versions[scope] = self.version(scope) + 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, scope: str, key: str) -> tuple[str, bytes] | None:
+        entry = self._entries.get((scope, key))
+        if entry is None:
+            return None
+        version, expires_at, etag, body = entry
+        if version != self.version(scope) or expires_at <= time.monotonic():
+            del self._entries[(scope, key)]
+            return None
+        self._entries.move_to_end((scope, key))
+        return etag, body
+
+    def put(self, scope: str, key: str, etag: str, body: bytes, ttl: float):
+        self._entries[(scope, key)] = (self.version(scope), time.monotonic() + ttl, etag, body)
+        self._entries.move_to_end((scope, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _request_key(request: Request) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+
+def prime(cache: ResponseCache, scope: str, path: str, content: Any, ttl: float):
+    """Stores `content` as the response to a GET of `path` without query parameters."""
+    body = ORJSONResponse(jsonable_encoder(content)).body
+    cache.put(scope, f"{path}?", compute_etag(body), body, ttl)
+
+
+async def cached_json(
+    request: Request,
+    cache: ResponseCache,
+    scope: str,
+    load: Callable[[], Awaitable[Any]],
+    ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+    cache_control: str = PRIVATE_CACHE_CONTROL,
+) -> Response:
+    """
+    Serves `load()` as JSON with an ETag, answering 304 when the client's copy
+    is current. Within `ttl` seconds, repeat requests skip `load` entirely.
+    Exceptions from `load` propagate and nothing is cached.
+    """
+    key = _request_key(request)
+    cached = cache.get(scope, key)
+    if cached is None:
+        body = ORJSONResponse(jsonable_encoder(await load())).body
+        etag = compute_etag(body)
+        cache.put(scope, key, etag, body, ttl)
+    else:
+        etag, body = cached
+
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if scope != PUBLIC_SCOPE:
+        headers["Vary"] = "Authorization"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
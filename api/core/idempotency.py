@@ -0,0 +1,95 @@
+import os
+import time
+from collections import OrderedDict
+
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+# How long a replayed response is served from memory before going back to
+# the database, which keeps message IDs for a day (see migration 021).
+INGEST_DEDUP_TTL_SECONDS = float(os.getenv("INGEST_DEDUP_TTL_SECONDS", "600"))
+INGEST_DEDUP_MAX_ENTRIES = int(os.getenv("INGEST_DEDUP_MAX_ENTRIES", "10000"))
+# A claim not settled within this time is taken over by the next retry, so a
+# message is not stuck "in flight" when an instance dies while ingesting it.
+INGEST_CLAIM_LEASE_SECONDS = float(os.getenv("INGEST_CLAIM_LEASE_SECONDS", "60"))
+
+# Returned while the first delivery of a message is still being processed.
+IN_FLIGHT_RESPONSE = (409, {"detail": "Message is already being processed."})
+
+
+class IngestDeduplicator:
+    """
+    Ensures each gateway message is ingested once.
+
+    `claim` returns the (status_code, body) to answer with for every message
+    seen before; the other messages are claimed, and the caller processes
+    them and passes their responses to `settle`. Successful and client-error
+    responses are kept and replayed to retries; server errors release the
+    claim so that a retry may process the message again.
+
+    Recent responses are served from memory; the database claim makes this
+    hold across API instances and restarts.
+    """
+
+    def __init__(
+        self,
+        db_adapter: SupabaseAdapter,
+        ttl: float = INGEST_DEDUP_TTL_SECONDS,
+        max_entries: int = INGEST_DEDUP_MAX_ENTRIES,
+        lease: float = INGEST_CLAIM_LEASE_SECONDS,
+    ):
+        self.db_adapter = db_adapter
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease = lease
+        # message_id -> (expires_at, status_code, body)
+        self._responses: OrderedDict[str, tuple[float, int, dict]] = OrderedDict()
+
+    def clear(self):
+        self._responses.clear()
+
+    def _recall(self, message_id: str) -> tuple[int, dict] | None:
+        entry = self._responses.get(message_id)
+        if entry is None:
+            return None
+        expires_at, status_code, body = entry
+        if expires_at <= time.monotonic():
+            del self._responses[message_id]
+            return None
+        return status_code, body
+
+    def _remember(self, message_id: str, status_code: int, body: dict):
+        self._responses[message_id] = (time.monotonic() + self.ttl, status_code, body)
+        self._responses.move_to_end(message_id)
+        while len(self._responses) > self.max_entries:
+            self._responses.popitem(last=False)
+
+    async def claim(self, message_ids: list[str]) -> dict[str, tuple[int, dict]]:
+        replays = {}
+        unknown = []
+        for message_id in message_ids:
+            replay = self._recall(message_id)
+            if replay is None:
+                unknown.append(message_id)
+            else:
+                replays[message_id] = replay
+        if not unknown:
+            return replays
+
+        existing = await self.db_adapter.claim_ingest_requests(unknown, self.lease)
+        for message_id, record in existing.items():
+            if record["status"] != "completed":
+                replays[message_id] = IN_FLIGHT_RESPONSE
+                continue
+            self._remember(message_id, record["response_status"], record["response_body"])
+            replays[message_id] = record["response_status"], record["response_body"]
+        return replays
+
+    async def settle(self, responses: dict[str, tuple[int, dict]]):
+        completed = {message_id: response for message_id, response in responses.items() if response[0] < 500}
+        failed = [message_id for message_id, response in responses.items() if response[0] >= 500]
+        for message_id, (status_code, body) in completed.items():
+            self._remember(message_id, status_code, body)
+        if completed:
+            await self.db_adapter.complete_ingest_requests(completed)
+        if failed:
+            await self.db_adapter.release_ingest_requests(failed)
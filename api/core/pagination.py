@@ -0,0 +1,56 @@
+import re
+import json
+import uuid
+import base64
+from datetime import datetime
+
+
+# Keyset pagination orders by (created_at, id) descending: created_at alone is
+# not unique, and the id tie-breaker keeps page boundaries stable.
+CURSOR_COLUMNS = ("created_at", "id")
+
+_COLUMN_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def encode_cursor(row: dict) -> str:
+    """Builds an opaque cursor pointing just after `row`."""
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    """
+    Returns (created_at, id) from a cursor. Raises ValueError if it is
+    malformed or its values are not a timestamp and a UUID.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise ValueError("Invalid cursor.") from e
+    # Both values end up inside a PostgREST filter, so only a real timestamp
+    # and UUID are let through, re-serialized from their parsed form.
+    try:
+        return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(row_id))
+    except (TypeError, ValueError, AttributeError) as e:
+        raise ValueError("Invalid cursor.") from e
+
+
+def keyset_filter(cursor: tuple[str, str]) -> str:
+    """PostgREST `or` filter selecting rows after the cursor in descending order."""
+    created_at, row_id = cursor
+    return f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """
+    Parses a comma-separated column projection. The cursor columns are always
+    included. Raises ValueError on anything that is not a plain column name.
+    """
+    if not fields:
+        return None
+    columns = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in columns if not _COLUMN_NAME.match(name)]
+    if invalid:
+        raise ValueError(f"Invalid field names: {', '.join(invalid)}")
+    return list(dict.fromkeys([*CURSOR_COLUMNS, *columns]))
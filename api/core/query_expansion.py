@@ -0,0 +1,67 @@
+import re
+
+
+# Words that carry no retrieval signal on their own (Spanish and English).
+STOPWORDS = {
+    "el", "la", "los", "las", "un", "una", "unos", "unas", "de", "del", "al",
+    "que", "qué", "y", "o", "en", "con", "por", "para", "es", "son", "me",
+    "mi", "tu", "su", "se", "lo", "le", "les", "hay", "como", "cómo", "cuál",
+    "cual", "cuanto", "cuánto", "cuesta", "tiene", "tienen", "quiero", "puedo",
+    "the", "a", "an", "of", "to", "in", "on", "for", "and", "or", "is", "are",
+    "what", "how", "much", "do", "does", "you", "i", "can", "have", "with",
+}
+
+_TOKEN = re.compile(r"[\w$€.,\-/]+", re.UNICODE)
+
+
+def extract_keywords(text: str) -> list[str]:
+    """
+    Keeps the tokens most likely to match literally: anything containing a
+    digit (SKUs, prices, sizes), acronyms, and non-stopwords of four letters
+    or more.
+    """
+    keywords = []
+    for token in _TOKEN.findall(text):
+        token = token.strip(".,")
+        if not token or token.lower() in STOPWORDS:
+            continue
+        if any(ch.isdigit() for ch in token) or token.isupper() or len(token) >= 4:
+            keywords.append(token)
+    return keywords
+
+
+def _last_user_message(history: list) -> str | None:
+    """Returns the text of the most recent user turn in Gemini-style history."""
+    for turn in reversed(history or []):
+        if turn.get("role") == "user":
+            parts = turn.get("parts") or []
+            text = " ".join(part.get("text", "") for part in parts).strip()
+            if text:
+                return text
+    return None
+
+
+def expand_query(query: str, history: list | None = None, max_variants: int = 3) -> list[str]:
+    """
+    Builds retrieval variants for a user query without an extra LLM call:
+      1. the query itself,
+      2. the query rewritten with the previous user turn, so follow-ups such
+         as "¿y en azul?" keep their subject,
+      3. a keyword-only variant for codes, names and prices.
+    Duplicates are removed and the original query is always first.
+    """
+    variants = [query]
+
+    previous = _last_user_message(history or [])
+    if previous:
+        variants.append(f"{previous} {query}")
+
+    keywords = " ".join(extract_keywords(query))
+    if keywords:
+        variants.append(keywords)
+
+    unique = []
+    for variant in variants:
+        if variant.strip() and variant not in unique:
+            unique.append(variant)
+    return unique[:max_variants]
@@ -0,0 +1,43 @@
+import io
+import csv
+import json
+import zlib
+from typing import AsyncIterator
+
+
+async def ndjson_lines(rows: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    """Serializes rows as newline-delimited JSON, one row at a time."""
+    async for row in rows:
+        yield (json.dumps(row, default=str, ensure_ascii=False) + "\n").encode()
+
+
+async def csv_lines(rows: AsyncIterator[dict], columns: list[str]) -> AsyncIterator[bytes]:
+    """Serializes rows as CSV with a header line, one row at a time."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue().encode()
+    async for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], flush_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+    """
+    Gzip-compresses a byte stream incrementally. Output is emitted roughly
+    every `flush_size` input bytes, so compression stays effective while
+    memory stays bounded.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    pending = 0
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= flush_size:
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            pending = 0
+        if data:
+            yield data
+    yield compressor.flush()
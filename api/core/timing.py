@@ -0,0 +1,61 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+
+class TurnTimings:
+    """
+    Durations, in milliseconds, of the stages of one chat turn.
+
+    Stages measured outside this process (ingest, queue wait) are set
+    directly; in-process stages are measured with `phase`.
+    """
+
+    STAGES = ("ingest_ms", "queue_wait_ms", "retrieval_ms", "generation_ms")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: dict[str, int] = {}
+
+    def set(self, stage: str, ms: Optional[float]):
+        if ms is not None:
+            self.durations[stage] = max(0, round(ms))
+
+    @contextmanager
+    def phase(self, stage: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.set(stage, self.durations.get(stage, 0) + elapsed)
+
+    def elapsed_ms(self) -> int:
+        """Time spent in this process since the turn started."""
+        return round((time.perf_counter() - self.started) * 1000)
+
+    def as_record(self) -> dict:
+        """Stage durations plus the end-to-end total, as a performance_logs row."""
+        record = {stage: self.durations.get(stage) for stage in self.STAGES}
+        record["total_ms"] = (
+            self.elapsed_ms()
+            + self.durations.get("ingest_ms", 0)
+            + self.durations.get("queue_wait_ms", 0)
+        )
+        return record
+
+
+# Timings of the turn being processed by the current task, if any.
+current_turn: ContextVar[Optional[TurnTimings]] = ContextVar("current_turn", default=None)
+
+
+@contextmanager
+def timed_phase(stage: str):
+    """Times a stage of the current turn; a no-op outside a timed turn."""
+    timings = current_turn.get()
+    if timings is None:
+        yield
+        return
+    with timings.phase(stage):
+        yield
@@ -0,0 +1,87 @@
+import logging
+from datetime import datetime, timezone
+
+from infrastructure.stripe_gateway import StripeGateway
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+class StripeEventError(Exception):
+    """Raised when an event could not be applied yet and should be retried."""
+
+
+class StripeEventDeferred(StripeEventError):
+    """
+    Raised when an event needs another one applied first, which may be queued
+    behind it for the same subscription: it must wait rather than retry in place.
+    """
+
+
+def ordering_key(event: dict) -> str:
+    """Events for the same subscription must be applied one at a time, in order."""
+    data = event["data"]["object"]
+    if event["type"] == "checkout.session.completed":
+        return data.get("subscription") or event["id"]
+    if event["type"].startswith("customer.subscription."):
+        return data["id"]
+    return event["id"]
+
+
+def _iso(timestamp: int | None) -> str | None:
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat()
+
+
+class ApplyStripeEvent:
+    def __init__(self, db_adapter: SupabaseAdapter, gateway: StripeGateway):
+        self.db_adapter = db_adapter
+        self.gateway = gateway
+
+    async def execute(self, event: dict):
+        """
+        Applies a verified Stripe webhook event to our subscription records.
+        Raises on any failure so the caller can retry; applying the same
+        event twice is harmless.
+        """
+        data = event["data"]["object"]
+        event_type = event["type"]
+
+        if event_type == "checkout.session.completed":
+            if data["mode"] != "subscription":
+                return
+            # Retrieve the full subscription object to get all details
+            sub_data = await self.gateway.retrieve_subscription(data["subscription"])
+            subscription = await self.db_adapter.create_subscription(
+                user_id=data["metadata"]["user_id"],
+                plan_id=data["metadata"]["plan_id"],
+                status=sub_data["status"],
+                stripe_subscription_id=sub_data["id"],
+                stripe_customer_id=data["customer"],
+                current_period_start=_iso(sub_data["current_period_start"]),
+                current_period_end=_iso(sub_data["current_period_end"]),
+                cancel_at_period_end=sub_data["cancel_at_period_end"],
+                event_created=event["created"],
+            )
+            if subscription is None:
+                raise StripeEventError(f"Could not store subscription {sub_data['id']}")
+
+        elif event_type in ["customer.subscription.updated", "customer.subscription.deleted"]:
+            outcome = await self.db_adapter.apply_subscription_event(
+                stripe_subscription_id=data["id"],
+                new_status=data["status"],
+                cancel_at_period_end=data["cancel_at_period_end"],
+                current_period_start=_iso(data.get("current_period_start")),
+                current_period_end=_iso(data.get("current_period_end")),
+                event_created=event["created"],
+            )
+            if outcome == "missing":
+                # The checkout event creating this subscription is not applied yet.
+                raise StripeEventDeferred(f"Subscription {data['id']} does not exist yet")
+            if outcome == "stale":
+                logger.info("Skipped stale %s for subscription %s.", event_type, data["id"])
+
+        else:
+            logger.info("Unhandled webhook event type: %s", event_type)
@@ -1,26 +1,62 @@
+import os
+import time
 import logging
+from typing import Optional
 from core.ai_router import AIRouter
+from core.timing import TurnTimings, current_turn
+from infrastructure.performance_log_writer import PerformanceLogWriter
 from infrastructure.supabase_adapter import SupabaseAdapter
 
 
 logger = logging.getLogger(__name__)
 
+# Replies generated later than this after the message arrived are no longer
+# useful; such turns are dropped instead of taking LLM capacity.
+LLM_TURN_MAX_AGE_SECONDS = float(os.getenv("LLM_TURN_MAX_AGE_SECONDS", "120"))
+
 
 class ProcessChatMessage:
     def __init__(
-        self, router: AIRouter, db_adapter: SupabaseAdapter
+        self,
+        router: AIRouter,
+        db_adapter: SupabaseAdapter,
+        performance_log: Optional[PerformanceLogWriter] = None,
     ):
         self.router = router
         self.db_adapter = db_adapter
+        self.performance_log = performance_log
 
-    async def execute(self, user_id: str, user_query: str) -> str:
+    async def execute(
+        self,
+        user_id: str,
+        user_query: str,
+        ingested_at_ms: Optional[float] = None,
+        ingest_ms: Optional[float] = None,
+        agent: Optional[dict] = None,
+    ) -> str:
         """
         Orchestrates the processing of a user's chat message using the AI Router.
+
+        `ingested_at_ms` (epoch milliseconds, stamped when the message was
+        enqueued) and `ingest_ms` come from the ingest endpoint and complete
+        the turn's timing record with the time spent before this process.
+        They also set the turn's deadline: the router raises DeadlineExceeded
+        when the turn is still waiting for LLM capacity LLM_TURN_MAX_AGE_SECONDS
+        after the message arrived.
+
+        Callers processing several messages of the same user can pass the
+        `agent` they already loaded to skip the lookup.
         """
+        timings = TurnTimings()
+        timings.set("ingest_ms", ingest_ms)
+        if ingested_at_ms is not None:
+            timings.set("queue_wait_ms", time.time() * 1000 - ingested_at_ms)
+
         # 1. Get the agent configuration for the user
         # Note: In a multi-agent setup, we'd need a way to map user_id to a specific agent.
         # For now, we get the first agent associated with the user's account.
-        agent = await self.db_adapter.get_agent_for_user(user_id)
+        if agent is None:
+            agent = await self.db_adapter.get_agent_for_user(user_id)
 
         if not agent:
             return "I'm sorry, I can't find an agent configured for your account."
@@ -40,14 +76,22 @@ class ProcessChatMessage:
         )
 
         # 3. Route the query to the appropriate AI model
-        bot_response = await self.router.route_query(
-            user_id=user_id,
-            query=user_query,
-            history=history,
-            task='chat',  # This use case is for standard chat interactions
-            agent_prompt=agent.get('base_prompt'),
-            agent_guardrails=agent.get('guardrails')
-        )
+        started = time.perf_counter()
+        token = current_turn.set(timings)
+        try:
+            bot_response = await self.router.route_query(
+                user_id=user_id,
+                query=user_query,
+                history=history,
+                task='chat',  # This use case is for standard chat interactions
+                agent_prompt=agent.get('base_prompt'),
+                agent_guardrails=agent.get('guardrails'),
+                agent_id=agent['id'],
+                deadline=None if ingested_at_ms is None else ingested_at_ms / 1000 + LLM_TURN_MAX_AGE_SECONDS,
+            )
+        finally:
+            current_turn.reset(token)
+        response_time_ms = round((time.perf_counter() - started) * 1000)
 
         # 3. Log the conversation
         try:
@@ -55,7 +99,8 @@ class ProcessChatMessage:
                 agent_id=agent['id'],
                 user_id=user_id,
                 user_message=user_query,
-                bot_response=bot_response
+                bot_response=bot_response,
+                response_time_ms=response_time_ms,
             )
             logger.info(
                 "Logged conversation for user %s with agent %s.",
@@ -69,4 +114,11 @@ class ProcessChatMessage:
                 e,
             )
 
+        if self.performance_log is not None:
+            self.performance_log.record({
+                "user_id": user_id,
+                "agent_id": agent['id'],
+                **timings.as_record(),
+            })
+
         return bot_response
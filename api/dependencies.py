@@ -1,42 +1,89 @@
 from fastapi import Depends, HTTPException, Request
+from starlette.datastructures import Headers
+import hmac
 import time
 import jwt
 from jwt import InvalidTokenError
 
+from core.admission import AdmissionController
 from core.ai_router import AIRouter
-from infrastructure.deepseek_adapter import DeepSeekV2Adapter, DeepSeekChatAdapter
+from core.fair_scheduler import FairScheduler
+from core.http_cache import ResponseCache
+from core.idempotency import IngestDeduplicator
+from core.use_cases.apply_stripe_event import ApplyStripeEvent
+from infrastructure.deepseek_adapter import DEEPSEEK_BASE_URL, DeepSeekV2Adapter, DeepSeekChatAdapter
 from infrastructure.gemini_adapter import GeminiAdapter
-from infrastructure.openai_adapter import OpenAIEmbeddingAdapter
-import httpx
-from infrastructure.cloudflare_queue_adapter import CloudflareQueueAdapter
+from infrastructure.openai_adapter import OPENAI_BASE_URL, OpenAIEmbeddingAdapter
+from infrastructure.cloudflare_queue_adapter import CLOUDFLARE_API_URL, CloudflareQueueAdapter
+from infrastructure.http_transport import HttpTransportManager
 from infrastructure.supabase_adapter import SupabaseAdapter
-from core.config import get_settings
+from infrastructure.outbox_relay import OutboxRelay, route_by_media
+from infrastructure.pdf_extractor import PdfTextExtractor
+from infrastructure.performance_log_writer import PerformanceLogWriter
+from infrastructure.stripe_event_processor import StripeEventProcessor
+from infrastructure.stripe_gateway import StripeGateway
+from core.config import METRICS_TOKEN, get_settings
 
 settings = get_settings()
 
 # Create singleton instances of our adapters
-http_client = httpx.AsyncClient()
+# One pooled HTTP/2 client per upstream host, shared by all its adapters
+transport_manager = HttpTransportManager()
 supabase_adapter = SupabaseAdapter()
 cloudflare_queue_adapter = CloudflareQueueAdapter(
     account_id=settings.cloudflare_account_id,
     api_token=settings.cloudflare_api_token,
     queue_id=settings.cloudflare_queue_id,
-    http_client=http_client,
+    http_client=transport_manager.client(CLOUDFLARE_API_URL),
+)
+admission_controller = AdmissionController(
+    supabase_adapter.get_rate_limits, supabase_adapter.sync_rate_limit_usage
+)
+# Text messages get their own queue, consumed by jobs/chat_consumer.py; without
+# one configured, every message goes to the transcription queue.
+chat_queue_adapter = CloudflareQueueAdapter(
+    account_id=settings.cloudflare_account_id,
+    api_token=settings.cloudflare_api_token,
+    queue_id=settings.cloudflare_chat_queue_id,
+    http_client=transport_manager.client(CLOUDFLARE_API_URL),
+) if settings.cloudflare_chat_queue_id else None
+outbox_relay = OutboxRelay(
+    supabase_adapter,
+    route_by_media(
+        cloudflare_queue_adapter.publish_messages,
+        (chat_queue_adapter or cloudflare_queue_adapter).publish_messages,
+    ),
+)
+pdf_extractor = PdfTextExtractor()
+response_cache = ResponseCache()
+ingest_deduplicator = IngestDeduplicator(supabase_adapter)
+performance_log_writer = PerformanceLogWriter(supabase_adapter.insert_performance_logs)
+stripe_gateway = StripeGateway(api_key=settings.stripe_api_key)
+stripe_event_processor = StripeEventProcessor(
+    ApplyStripeEvent(supabase_adapter, stripe_gateway).execute, supabase_adapter
 )
 gemini_adapter = GeminiAdapter(api_key=settings.google_api_key)
-deepseek_v2_adapter = DeepSeekV2Adapter(api_key=settings.deepseek_api_key)
-deepseek_chat_adapter = DeepSeekChatAdapter(api_key=settings.deepseek_api_key)
+deepseek_v2_adapter = DeepSeekV2Adapter(
+    api_key=settings.deepseek_api_key, http_client=transport_manager.client(DEEPSEEK_BASE_URL)
+)
+deepseek_chat_adapter = DeepSeekChatAdapter(
+    api_key=settings.deepseek_api_key, http_client=transport_manager.client(DEEPSEEK_BASE_URL)
+)
 openai_embedding_adapter = OpenAIEmbeddingAdapter(
     api_key=settings.openai_api_key,
     supabase_adapter=supabase_adapter,
     gemini_adapter=gemini_adapter,
+    http_client=transport_manager.client(OPENAI_BASE_URL),
 )
 
+llm_scheduler = FairScheduler(tier_of=supabase_adapter.get_plan_tier)
+
 ai_router = AIRouter(
     gemini_adapter=gemini_adapter,
     deepseek_v2_adapter=deepseek_v2_adapter,
     deepseek_chat_adapter=deepseek_chat_adapter,
     openai_embedding_adapter=openai_embedding_adapter,
+    scheduler=llm_scheduler,
 )
 
 
@@ -70,6 +117,26 @@ def _get_token_payload(request: Request) -> dict:
     return payload
 
 
+def rate_limit_identity(headers: Headers) -> str | None:
+    """
+    Identifies the user a request is rate limited as. Requests without a valid
+    token are not attributed to anyone; their endpoints reject them anyway.
+    """
+    auth_header = headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        return None
+    try:
+        payload = jwt.decode(
+            auth_header.split(" ", 1)[1],
+            settings.supabase_jwt_secret,
+            algorithms=["HS256"],
+            options={"verify_aud": False},
+        )
+    except InvalidTokenError:
+        return None
+    return payload.get("sub")
+
+
 def get_current_user_id(payload: dict = Depends(_get_token_payload)) -> str:
     """Extracts user ID from the token payload."""
     user_id = payload.get("sub")
@@ -91,11 +158,33 @@ def require_admin_role(payload: dict = Depends(_get_token_payload)):
         raise HTTPException(status_code=403, detail="User is not authorized to perform this action")
 
 
+def require_metrics_token(request: Request):
+    """Lets only scrapers holding METRICS_TOKEN read /metrics."""
+    auth_header = request.headers.get("Authorization", "")
+    if not METRICS_TOKEN or not hmac.compare_digest(auth_header.encode(), f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+
+
 def get_supabase_adapter() -> SupabaseAdapter:
     """Returns the shared Supabase adapter instance."""
     return supabase_adapter
 
 
+def get_response_cache() -> ResponseCache:
+    """Returns the shared server-side response cache."""
+    return response_cache
+
+
+def get_stripe_gateway() -> StripeGateway:
+    """Returns the shared async Stripe API gateway."""
+    return stripe_gateway
+
+
+def get_stripe_event_processor() -> StripeEventProcessor:
+    """Returns the shared background processor for Stripe webhook events."""
+    return stripe_event_processor
+
+
 async def check_message_quota(
     user_id: str = Depends(get_current_user_id),
     supabase: SupabaseAdapter = Depends(get_supabase_adapter),
@@ -0,0 +1,311 @@
+"""
+Record/replay of outbound calls, for reproducing production traffic shapes
+offline (e.g. in the benchmarks).
+
+With CASSETTE_MODE=record, every call made through the shared httpx clients
+(DeepSeek, OpenAI, Cloudflare), the Supabase PostgREST session and the Gemini
+SDK is passed through and written, with its timing, to CASSETTE_PATH when
+the process exits. With CASSETTE_MODE=replay, nothing leaves the process:
+calls are answered from the cassette after the recorded latency, multiplied
+by CASSETTE_LATENCY_SCALE (0 answers at once).
+
+A call is matched on method, URL and body; failing that, on method and path
+in recorded order, so requests carrying timestamps or IDs still replay.
+Recordings are reused from the start once exhausted. Credentials are never
+written.
+
+The cassette is a gzipped JSON-lines file: a header line, then one line per
+call with its response and the time offsets of the body chunks.
+"""
+import os
+import json
+import time
+import gzip
+import atexit
+import base64
+import hashlib
+import asyncio
+import logging
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import httpx
+
+
+logger = logging.getLogger(__name__)
+
+# "record", "replay", or empty to call the real services.
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/default.jsonl.gz")
+CASSETTE_LATENCY_SCALE = float(os.getenv("CASSETTE_LATENCY_SCALE", "1"))
+
+CASSETTE_FORMAT_VERSION = 1
+_SECRET_HEADERS = {"authorization", "apikey", "x-api-key", "x-goog-api-key", "cookie", "set-cookie"}
+# Describe the original connection, not the recorded body.
+_DROPPED_RESPONSE_HEADERS = {"connection", "keep-alive", "transfer-encoding", "date"}
+
+
+class CassetteMiss(httpx.TransportError):
+    """Raised in replay mode for a call the cassette has no recording for."""
+
+
+def _request_key(method: str, url: str, body: bytes) -> str:
+    return hashlib.sha256(b"\0".join([method.encode(), url.encode(), body])).hexdigest()
+
+
+def _url_without_secrets(url: httpx.URL) -> str:
+    params = [(k, v) for k, v in url.params.multi_items() if k.lower() not in ("key", "api_key", "apikey")]
+    return str(url.copy_with(params=params))
+
+
+class Cassette:
+    def __init__(self, path: str, mode: str, latency_scale: float = CASSETTE_LATENCY_SCALE):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.interactions: list[dict] = []
+        self._lock = threading.Lock()
+        # Lookup key -> indexes of matching interactions, and the next to use.
+        self._by_key: dict[str, list[int]] = defaultdict(list)
+        self._cursors: dict[str, int] = defaultdict(int)
+        if mode == "replay":
+            self.load()
+        else:
+            atexit.register(self.save)
+
+    # --- Storage ---
+
+    def load(self):
+        with gzip.open(self.path, "rt") as fh:
+            header = json.loads(fh.readline())
+            if header.get("version") != CASSETTE_FORMAT_VERSION:
+                raise ValueError(f"Unsupported cassette version in {self.path}: {header.get('version')}")
+            self.interactions = [json.loads(line) for line in fh if line.strip()]
+        self._by_key.clear()
+        for index, interaction in enumerate(self.interactions):
+            for key in interaction["match"]:
+                self._by_key[key].append(index)
+
+    def save(self):
+        if self.mode != "record":
+            return
+        with self._lock:
+            interactions = list(self.interactions)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt") as fh:
+            fh.write(json.dumps({"version": CASSETTE_FORMAT_VERSION, "recorded_at": time.time()}) + "\n")
+            for interaction in interactions:
+                fh.write(json.dumps(interaction, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        logger.info(f"Recorded {len(interactions)} calls to {self.path}")
+
+    def _add(self, interaction: dict):
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def _find(self, keys: list[str], description: str) -> dict:
+        with self._lock:
+            for key in keys:
+                indexes = self._by_key.get(key)
+                if indexes:
+                    index = indexes[self._cursors[key] % len(indexes)]
+                    self._cursors[key] += 1
+                    return self.interactions[index]
+        raise CassetteMiss(f"No recording for {description} in {self.path}")
+
+    # --- HTTP ---
+
+    def _http_keys(self, request: httpx.Request, body: bytes) -> list[str]:
+        url = _url_without_secrets(request.url)
+        return [
+            _request_key(request.method, url, body),
+            _request_key(request.method, f"{request.url.host}{request.url.path}", b""),
+        ]
+
+    def _http_interaction(self, request: httpx.Request, response: httpx.Response, elapsed: float) -> dict:
+        return {
+            "kind": "http",
+            "match": self._http_keys(request, request.content),
+            "method": request.method,
+            "url": _url_without_secrets(request.url),
+            "status": response.status_code,
+            "headers": [
+                [k, v] for k, v in response.headers.multi_items()
+                if k.lower() not in _SECRET_HEADERS and k.lower() not in _DROPPED_RESPONSE_HEADERS
+            ],
+            "elapsed": round(elapsed, 6),
+            "chunks": [],
+        }
+
+    def _http_replay(self, request: httpx.Request, body: bytes) -> tuple[dict, list[tuple[float, bytes]]]:
+        interaction = self._find(self._http_keys(request, body), f"{request.method} {request.url}")
+        chunks = [(offset * self.latency_scale, base64.b64decode(data)) for offset, data in interaction["chunks"]]
+        return interaction, chunks
+
+    def async_transport(self, transport: httpx.AsyncBaseTransport) -> "AsyncCassetteTransport":
+        return AsyncCassetteTransport(self, transport)
+
+    def sync_transport(self, transport: httpx.BaseTransport) -> "SyncCassetteTransport":
+        return SyncCassetteTransport(self, transport)
+
+    # --- SDK calls ---
+
+    def wrap(
+        self,
+        name: str,
+        call: Callable[..., Any],
+        dump: Callable[[Any], Any] = lambda result: result,
+        load: Callable[[Any], Any] = lambda data: data,
+    ) -> Callable[..., Any]:
+        """
+        Records or replays a blocking SDK call. Arguments form the match key;
+        `dump` turns the result into JSON and `load` rebuilds what callers use.
+        """
+
+        def wrapped(*args, **kwargs):
+            key = _request_key("CALL", name, json.dumps([args, kwargs], sort_keys=True, default=str).encode())
+            if self.mode == "replay":
+                interaction = self._find([key, _request_key("CALL", name, b"")], name)
+                time.sleep(interaction["elapsed"] * self.latency_scale)
+                return load(interaction["result"])
+            started = time.perf_counter()
+            result = call(*args, **kwargs)
+            self._add({
+                "kind": "call",
+                "match": [key, _request_key("CALL", name, b"")],
+                "name": name,
+                "elapsed": round(time.perf_counter() - started, 6),
+                "result": dump(result),
+            })
+            return result
+
+        return wrapped
+
+
+def gemini_response(data: dict) -> SimpleNamespace:
+    """Rebuilds the part of a Gemini generate_content response the adapter reads."""
+    return SimpleNamespace(**data)
+
+
+class AsyncCassetteTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cassette: Cassette, transport: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        if self.cassette.mode == "replay":
+            interaction, chunks = self.cassette._http_replay(request, body)
+            await asyncio.sleep(interaction["elapsed"] * self.cassette.latency_scale)
+            return httpx.Response(
+                interaction["status"], headers=interaction["headers"], stream=_AsyncReplayStream(chunks)
+            )
+
+        started = time.perf_counter()
+        response = await self.transport.handle_async_request(request)
+        interaction = self.cassette._http_interaction(request, response, time.perf_counter() - started)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_AsyncRecordingStream(self.cassette, interaction, response.stream, started),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class SyncCassetteTransport(httpx.BaseTransport):
+    def __init__(self, cassette: Cassette, transport: httpx.BaseTransport):
+        self.cassette = cassette
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        if self.cassette.mode == "replay":
+            interaction, chunks = self.cassette._http_replay(request, body)
+            time.sleep(interaction["elapsed"] * self.cassette.latency_scale)
+            return httpx.Response(
+                interaction["status"], headers=interaction["headers"], stream=_SyncReplayStream(chunks)
+            )
+
+        started = time.perf_counter()
+        response = self.transport.handle_request(request)
+        interaction = self.cassette._http_interaction(request, response, time.perf_counter() - started)
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_SyncRecordingStream(self.cassette, interaction, response.stream, started),
+            extensions=response.extensions,
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    """Passes the raw body through, noting when each chunk arrived."""
+
+    def __init__(self, cassette: Cassette, interaction: dict, stream: httpx.AsyncByteStream, started: float):
+        self.cassette = cassette
+        self.interaction = interaction
+        self.stream = stream
+        self.started = started
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            offset = round(time.perf_counter() - self.started - self.interaction["elapsed"], 6)
+            self.interaction["chunks"].append([offset, base64.b64encode(chunk).decode()])
+            yield chunk
+
+    async def aclose(self):
+        await self.stream.aclose()
+        self.cassette._add(self.interaction)
+
+
+class _SyncRecordingStream(httpx.SyncByteStream):
+    def __init__(self, cassette: Cassette, interaction: dict, stream: httpx.SyncByteStream, started: float):
+        self.cassette = cassette
+        self.interaction = interaction
+        self.stream = stream
+        self.started = started
+
+    def __iter__(self):
+        for chunk in self.stream:
+            offset = round(time.perf_counter() - self.started - self.interaction["elapsed"], 6)
+            self.interaction["chunks"].append([offset, base64.b64encode(chunk).decode()])
+            yield chunk
+
+    def close(self):
+        self.stream.close()
+        self.cassette._add(self.interaction)
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]]):
+        self.chunks = chunks
+
+    async def __aiter__(self):
+        started = time.perf_counter()
+        for offset, chunk in self.chunks:
+            await asyncio.sleep(max(offset - (time.perf_counter() - started), 0))
+            yield chunk
+
+
+class _SyncReplayStream(httpx.SyncByteStream):
+    def __init__(self, chunks: list[tuple[float, bytes]]):
+        self.chunks = chunks
+
+    def __iter__(self):
+        started = time.perf_counter()
+        for offset, chunk in self.chunks:
+            time.sleep(max(offset - (time.perf_counter() - started), 0))
+            yield chunk
+
+
+cassette: Cassette | None = Cassette(CASSETTE_PATH, CASSETTE_MODE) if CASSETTE_MODE else None
@@ -0,0 +1,314 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from collections import deque
+from itertools import count
+from typing import Awaitable, Callable
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from core.fair_scheduler import DeadlineExceeded
+from core.use_cases.process_chat_message import ProcessChatMessage
+from infrastructure.cloudflare_queue_adapter import CloudflareQueueAdapter
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Messages processed at once. Each holds at most one LLM turn, which the
+# router's fair scheduler also caps per process.
+CONSUMER_CONCURRENCY = int(os.getenv("CONSUMER_CONCURRENCY", "16"))
+# Messages leased per pull; Cloudflare Queues returns at most 100.
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "50"))
+# A leased message reappears if it is not settled within this time, so it
+# must cover a turn's maximum age plus a whole group processed before it.
+CONSUMER_VISIBILITY_TIMEOUT_SECONDS = float(os.getenv("CONSUMER_VISIBILITY_TIMEOUT_SECONDS", "300"))
+# How long to wait before pulling again from an empty queue.
+CONSUMER_POLL_SECONDS = float(os.getenv("CONSUMER_POLL_SECONDS", "1"))
+# Deliveries of a failing message before it is dropped.
+CONSUMER_MAX_ATTEMPTS = int(os.getenv("CONSUMER_MAX_ATTEMPTS", "5"))
+# Failed messages are retried after 1s, 2s, 4s... up to this delay.
+CONSUMER_RETRY_MAX_SECONDS = 300
+
+CONSUMER_MESSAGES = Counter(
+    "chat_consumer_messages_total", "Queue messages settled by the chat consumer, by outcome.", ["outcome"]
+)
+CONSUMER_PROCESSING_SECONDS = Histogram(
+    "chat_consumer_processing_seconds",
+    "Time to process one chat message, from pickup to settlement.",
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+CONSUMER_LAG_SECONDS = Histogram(
+    "chat_consumer_lag_seconds",
+    "Time from ingest to pickup by the consumer.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+CONSUMER_IN_FLIGHT = Gauge("chat_consumer_in_flight", "Leased messages not yet settled.")
+CONSUMER_BACKLOG = Gauge("chat_consumer_backlog", "Messages waiting in the queue, as last reported by it.")
+
+
+class QueueMessage:
+    __slots__ = ("id", "body", "attempts", "lease_id", "enqueued_at")
+
+    def __init__(self, id: str, body: dict, attempts: int, lease_id: str, enqueued_at: float):
+        self.id = id
+        self.body = body
+        self.attempts = attempts
+        self.lease_id = lease_id
+        # Epoch seconds.
+        self.enqueued_at = enqueued_at
+
+
+class CloudflarePullBackend:
+    """
+    Consumes a Cloudflare Queue through its HTTP pull API. Backends provide
+    `pull(batch_size, visibility_timeout)`, returning leased QueueMessages,
+    and `settle(acks, retries)`, which acknowledges messages and hands
+    others (message -> delay in seconds) back to the queue.
+    """
+
+    def __init__(self, queue_adapter: CloudflareQueueAdapter):
+        self.queue_adapter = queue_adapter
+
+    async def pull(self, batch_size: int, visibility_timeout: float) -> list[QueueMessage]:
+        result = await self.queue_adapter.pull_messages(batch_size, visibility_timeout)
+        CONSUMER_BACKLOG.set(result.get("message_backlog_count", 0))
+        messages = []
+        for message in result.get("messages", []):
+            body = message["body"]
+            messages.append(QueueMessage(
+                id=message["id"],
+                body=json.loads(body) if isinstance(body, str) else body,
+                attempts=message.get("attempts", 1),
+                lease_id=message["lease_id"],
+                enqueued_at=message.get("timestamp_ms", time.time() * 1000) / 1000,
+            ))
+        return messages
+
+    async def settle(self, acks: list[QueueMessage], retries: dict[QueueMessage, float]):
+        await self.queue_adapter.ack_messages(
+            [message.lease_id for message in acks],
+            {message.lease_id: delay for message, delay in retries.items()},
+        )
+
+
+class LocalQueue:
+    """
+    In-memory stand-in for the queue, with the same leases, visibility
+    timeouts and retry delays, for local runs and tests. `publish` matches
+    CloudflareQueueAdapter.publish_messages, so the outbox relay can feed it.
+    """
+
+    def __init__(self):
+        # (available_at, message); leased messages stay here until settled.
+        self._messages: deque[tuple[float, QueueMessage]] = deque()
+        self._leases: dict[str, tuple[float, QueueMessage]] = {}
+        self._ids = count(1)
+
+    async def publish(self, payloads: list[dict]):
+        now = time.time()
+        for payload in payloads:
+            message_id = str(next(self._ids))
+            self._messages.append((now, QueueMessage(message_id, payload, 0, "", now)))
+
+    def __len__(self) -> int:
+        return len(self._messages) + len(self._leases)
+
+    async def pull(self, batch_size: int, visibility_timeout: float) -> list[QueueMessage]:
+        now = time.time()
+        for lease_id, (expires_at, message) in list(self._leases.items()):
+            if expires_at <= now:
+                # Lease ran out: the message is delivered again.
+                del self._leases[lease_id]
+                self._messages.append((now, message))
+        leased, waiting = [], deque()
+        while self._messages:
+            available_at, message = self._messages.popleft()
+            if available_at > now or len(leased) == batch_size:
+                waiting.append((available_at, message))
+                continue
+            message.attempts += 1
+            message.lease_id = f"{message.id}:{message.attempts}"
+            self._leases[message.lease_id] = (now + visibility_timeout, message)
+            leased.append(message)
+        self._messages = waiting
+        CONSUMER_BACKLOG.set(len(self._messages))
+        return leased
+
+    async def settle(self, acks: list[QueueMessage], retries: dict[QueueMessage, float]):
+        for message in acks:
+            self._leases.pop(message.lease_id, None)
+        for message, delay in retries.items():
+            if self._leases.pop(message.lease_id, None) is not None:
+                self._messages.append((time.time() + delay, message))
+
+
+class ChatConsumer:
+    """
+    Pulls chat messages from a queue backend and runs ProcessChatMessage on
+    them, with at most `concurrency` leased messages at a time.
+
+    Messages of a batch are grouped by user and agent: a group loads the
+    agent once and processes its messages in order, so replies follow the
+    conversation; groups run concurrently. Each message is settled on its
+    own: acknowledged once processed, dropped (and acknowledged) when its
+    deadline passed or after `max_attempts`, otherwise retried with backoff.
+    The queue delivers at least once, so each message is claimed by its
+    gateway message ID first and duplicates are acknowledged unanswered.
+    Audio messages belong to the transcription pipeline: should one reach
+    this queue, it is passed on with `forward_audio` (retried if that fails).
+    """
+
+    def __init__(
+        self,
+        backend,
+        use_case: ProcessChatMessage,
+        db_adapter: SupabaseAdapter,
+        forward_audio: Callable[[list[dict]], Awaitable],
+        concurrency: int = CONSUMER_CONCURRENCY,
+        batch_size: int = CONSUMER_BATCH_SIZE,
+        visibility_timeout: float = CONSUMER_VISIBILITY_TIMEOUT_SECONDS,
+        poll_interval: float = CONSUMER_POLL_SECONDS,
+        max_attempts: int = CONSUMER_MAX_ATTEMPTS,
+        max_retry_delay: float = CONSUMER_RETRY_MAX_SECONDS,
+    ):
+        self.backend = backend
+        self.use_case = use_case
+        self.db_adapter = db_adapter
+        self._forward_audio = forward_audio
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_retry_delay = max_retry_delay
+        self._in_flight = 0
+        self._capacity = asyncio.Condition()
+        self._tasks: set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+
+    async def run(self):
+        """Consumes until `stop` is called, then waits for the groups in progress."""
+        while not self._stopping.is_set():
+            async with self._capacity:
+                await self._capacity.wait_for(lambda: self._in_flight < self.concurrency)
+            if self._stopping.is_set():
+                break
+            try:
+                processed = await self.consume_once()
+            except Exception as e:
+                logger.error(f"Could not pull chat messages: {e}")
+                processed = 0
+            if not processed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self):
+        """Stops pulling; messages already leased are still processed."""
+        self._stopping.set()
+
+    async def consume_once(self) -> int:
+        """Leases one batch and starts processing it. Returns the number leased."""
+        batch_size = min(self.batch_size, self.concurrency - self._in_flight)
+        messages = await self.backend.pull(batch_size, self.visibility_timeout)
+        if not messages:
+            return 0
+        now = time.time()
+        groups: dict[tuple[str, str], list[QueueMessage]] = {}
+        for message in messages:
+            ingested_at = message.body.get("ingestedAt")
+            CONSUMER_LAG_SECONDS.observe(max(now - (ingested_at / 1000 if ingested_at else message.enqueued_at), 0))
+            key = (message.body.get("userId", ""), message.body.get("agentId", ""))
+            groups.setdefault(key, []).append(message)
+
+        self._in_flight += len(messages)
+        CONSUMER_IN_FLIGHT.set(self._in_flight)
+        for (user_id, _), group in groups.items():
+            task = asyncio.ensure_future(self._process_group(user_id, group))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return len(messages)
+
+    async def _process_group(self, user_id: str, messages: list[QueueMessage]):
+        agent = None
+        if user_id:
+            try:
+                agent = await self.db_adapter.get_agent_for_user(user_id)
+            except Exception as e:
+                # Each message looks the agent up again, and is retried if that fails too.
+                logger.warning(f"Could not load the agent of user {user_id}: {e}")
+        for message in messages:
+            started = time.perf_counter()
+            outcome, retry_delay = await self._process(message, agent)
+            try:
+                if retry_delay is None:
+                    await self.backend.settle([message], {})
+                else:
+                    await self.backend.settle([], {message: retry_delay})
+            except Exception as e:
+                # Unsettled messages are delivered again once their lease runs out.
+                logger.error(f"Could not settle chat message {message.id}: {e}")
+            CONSUMER_MESSAGES.labels(outcome).inc()
+            CONSUMER_PROCESSING_SECONDS.observe(time.perf_counter() - started)
+            async with self._capacity:
+                self._in_flight -= 1
+                CONSUMER_IN_FLIGHT.set(self._in_flight)
+                self._capacity.notify_all()
+
+    async def _process(self, message: QueueMessage, agent: dict | None) -> tuple[str, float | None]:
+        """Returns the outcome and, for messages to retry, the delay."""
+        body = message.body
+        message_id = body.get("messageId")
+        claimed = False
+        try:
+            if body.get("mediaKey"):
+                await self._forward_audio([body])
+                return "forwarded", None
+            if not body.get("body") or not body.get("userId"):
+                logger.info(f"Skipping queue message {message.id}: not a text chat message.")
+                return "skipped", None
+            if message_id:
+                # A claim outlives a consumer that dies mid-turn by one lease.
+                if not await self.db_adapter.claim_chat_turn(message_id, self.visibility_timeout):
+                    logger.info(f"Skipping chat message {message.id}: {message_id} was already answered.")
+                    return "duplicate", None
+                claimed = True
+            await self.use_case.execute(
+                user_id=body["userId"],
+                user_query=body["body"],
+                ingested_at_ms=body.get("ingestedAt"),
+                ingest_ms=body.get("ingestMs"),
+                agent=agent,
+            )
+        except DeadlineExceeded as e:
+            logger.warning(f"Dropping chat message {message.id}: {e}")
+            outcome, delay = "expired", None
+        except Exception as e:
+            if message.attempts >= self.max_attempts:
+                logger.error(f"Dropping chat message {message.id} after {message.attempts} attempts: {e}")
+                outcome, delay = "dropped", None
+            else:
+                delay = min(2 ** (message.attempts - 1), self.max_retry_delay)
+                logger.warning(
+                    f"Chat message {message.id} failed (attempt {message.attempts}); retrying in {delay}s: {e}"
+                )
+                outcome = "retried"
+        else:
+            outcome, delay = "processed", None
+        if claimed:
+            try:
+                if delay is None:
+                    await self.db_adapter.complete_chat_turn(message_id)
+                else:
+                    # The retry has to be able to claim it again.
+                    await self.db_adapter.release_chat_turn(message_id)
+            except Exception as e:
+                # Left 'processing', the claim is taken over once its lease runs out.
+                logger.error(f"Could not settle the claim of chat message {message_id}: {e}")
+        return outcome, delay
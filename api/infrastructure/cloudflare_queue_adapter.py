@@ -1,9 +1,11 @@
 import httpx
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
+CLOUDFLARE_API_URL = "https://api.cloudflare.com/client/v4"
+
 
 class CloudflareQueueAdapter:
     def __init__(
@@ -13,7 +15,8 @@ class CloudflareQueueAdapter:
         self.api_token = api_token
         self.queue_id = queue_id
         self.http_client = http_client
-        self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{self.account_id}/queues/{self.queue_id}/messages"
+        self.base_url = f"{CLOUDFLARE_API_URL}/accounts/{self.account_id}/queues/{self.queue_id}/messages"
+        self.batch_url = f"{self.base_url}/batch"
 
     async def publish_message(self, payload: Dict[str, Any]):
         """
@@ -48,3 +51,84 @@ class CloudflareQueueAdapter:
         except Exception as e:
             logger.error(f"An unexpected error occurred: {e}")
             raise
+
+    async def publish_messages(self, payloads: List[Dict[str, Any]]):
+        """
+        Publishes several messages to the configured Cloudflare Queue in one
+        request. Cloudflare accepts at most 100 messages (256 KB) per batch.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+        data = {"messages": [{"body": payload} for payload in payloads]}
+
+        try:
+            logger.info(f"Publishing {len(payloads)} messages to Cloudflare Queue '{self.queue_id}'...")
+            response = await self.http_client.post(
+                self.batch_url,
+                json=data,
+                headers=headers,
+                timeout=10.0,
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(
+                f"HTTP error occurred while publishing a batch to Cloudflare Queue: {e.response.status_code} - {e.response.text}"
+            )
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Request error occurred while publishing a batch to Cloudflare Queue: {e}")
+            raise
+
+    async def pull_messages(self, batch_size: int, visibility_timeout: float) -> dict:
+        """
+        Leases up to `batch_size` messages for `visibility_timeout` seconds
+        (the queue must have an HTTP pull consumer). Returns the API result:
+        `messages` (each with `body`, `id`, `timestamp_ms`, `attempts` and
+        `lease_id`) and `message_backlog_count`.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+        data = {"batch_size": batch_size, "visibility_timeout_ms": round(visibility_timeout * 1000)}
+        try:
+            response = await self.http_client.post(f"{self.base_url}/pull", json=data, headers=headers, timeout=10.0)
+            response.raise_for_status()
+            return response.json()["result"]
+        except httpx.HTTPStatusError as e:
+            logger.error(
+                f"HTTP error occurred while pulling from Cloudflare Queue: {e.response.status_code} - {e.response.text}"
+            )
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Request error occurred while pulling from Cloudflare Queue: {e}")
+            raise
+
+    async def ack_messages(self, lease_ids: List[str], retries: Dict[str, float]):
+        """
+        Acknowledges the leased messages in `lease_ids` and hands those in
+        `retries` (lease ID -> delay in seconds) back to the queue.
+        """
+        headers = {
+            "Authorization": f"Bearer {self.api_token}",
+            "Content-Type": "application/json",
+        }
+        data = {
+            "acks": [{"lease_id": lease_id} for lease_id in lease_ids],
+            "retries": [{"lease_id": lease_id, "delay_seconds": round(delay)} for lease_id, delay in retries.items()],
+        }
+        try:
+            response = await self.http_client.post(f"{self.base_url}/ack", json=data, headers=headers, timeout=10.0)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(
+                f"HTTP error occurred while acknowledging Cloudflare Queue messages: {e.response.status_code} - {e.response.text}"
+            )
+            raise
+        except httpx.RequestError as e:
+            logger.error(f"Request error occurred while acknowledging Cloudflare Queue messages: {e}")
+            raise
@@ -1,17 +1,23 @@
 import os
 import logging
+import httpx
 from openai import AsyncOpenAI
 
+from core.config import PROVIDER_EMULATOR_URL
+
 logger = logging.getLogger(__name__)
 
+DEEPSEEK_BASE_URL = f"{PROVIDER_EMULATOR_URL}/v1" if PROVIDER_EMULATOR_URL else "https://api.deepseek.com/v1"
+
 class DeepSeekV2Adapter:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client: httpx.AsyncClient | None = None):
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         if not self.api_key:
             raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
         self.client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url="https://api.deepseek.com/v1"
+            base_url=DEEPSEEK_BASE_URL,
+            http_client=http_client,
         )
 
     async def generate_response(self, prompt: str, history: list) -> str:
@@ -30,13 +36,14 @@ class DeepSeekV2Adapter:
             return "Error: Could not get response from DeepSeek V2."
 
 class DeepSeekChatAdapter:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, http_client: httpx.AsyncClient | None = None):
         self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
         if not self.api_key:
             raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
         self.client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url="https://api.deepseek.com/v1"
+            base_url=DEEPSEEK_BASE_URL,
+            http_client=http_client,
         )
 
     async def generate_response(self, prompt: str, history: list) -> str:
@@ -5,6 +5,9 @@ import logging
 
 import google.generativeai as genai
 
+from core.config import PROVIDER_EMULATOR_URL
+from infrastructure.cassette import cassette, gemini_response
+
 
 logger = logging.getLogger(__name__)
 
@@ -14,12 +17,24 @@ class GeminiAdapter:
         api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY must be set in environment.")
-        genai.configure(api_key=api_key)
+        if PROVIDER_EMULATOR_URL:
+            # The emulator only speaks the REST flavour of the API.
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": PROVIDER_EMULATOR_URL})
+        else:
+            genai.configure(api_key=api_key)
 
         embed_model = embed_model or os.getenv("GEMINI_EMBED_MODEL", "models/embedding-001")
         chat_model = chat_model or os.getenv("GEMINI_CHAT_MODEL", "gemini-1.5-flash")
         self.embedding_model = embed_model
         self.generative_model = genai.GenerativeModel(chat_model)
+        self._embed_content = genai.embed_content
+        self._generate_content = self.generative_model.generate_content
+        if cassette:
+            self._embed_content = cassette.wrap("gemini.embed_content", self._embed_content, dump=dict)
+            self._generate_content = cassette.wrap(
+                "gemini.generate_content", self._generate_content,
+                dump=lambda response: {"text": response.text}, load=gemini_response,
+            )
 
     async def get_embedding(self, text: str):
         """
@@ -27,7 +42,7 @@ class GeminiAdapter:
         """
         try:
             result = await asyncio.to_thread(
-                genai.embed_content, model=self.embedding_model, content=text
+                self._embed_content, model=self.embedding_model, content=text
             )
             return result["embedding"]
         except Exception as e:
@@ -46,7 +61,7 @@ class GeminiAdapter:
         )
         try:
             response = await asyncio.to_thread(
-                self.generative_model.generate_content, prompt
+                self._generate_content, prompt
             )
             data = json.loads(response.text)
             return data
@@ -82,7 +97,7 @@ class GeminiAdapter:
         """
         try:
             response = await asyncio.to_thread(
-                self.generative_model.generate_content, prompt
+                self._generate_content, prompt
             )
             return response.text
         except Exception as e:
@@ -94,7 +109,7 @@ class GeminiAdapter:
         try:
             # Gemini SDK is synchronous; run in thread to avoid blocking.
             response = await asyncio.to_thread(
-                self.generative_model.generate_content, prompt
+                self._generate_content, prompt
             )
             return response.text
         except Exception as e:
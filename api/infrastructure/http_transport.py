@@ -0,0 +1,187 @@
+import os
+import time
+import socket
+import asyncio
+import logging
+import ipaddress
+import weakref
+
+import httpx
+import httpcore
+from prometheus_client.core import REGISTRY, GaugeMetricFamily
+
+from infrastructure.cassette import cassette
+
+
+logger = logging.getLogger(__name__)
+
+# Connections kept per upstream host. With HTTP/2 one connection carries
+# many concurrent requests, so few are needed.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+# Idle connections are closed after this long; upstreams drop them anyway
+# after a few minutes and a dead pooled connection costs a retry.
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+# Read timeout; LLM completions can take a while to start streaming.
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+# Resolved addresses are reused this long when opening new connections.
+DNS_CACHE_TTL_SECONDS = float(os.getenv("DNS_CACHE_TTL_SECONDS", "300"))
+
+
+class CachingNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that caches DNS lookups. Only the TCP connect
+    uses the cached address; TLS still verifies and sends SNI for the host
+    name. A failed connect evicts the entry so the next one resolves again.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL_SECONDS, backend: httpcore.AsyncNetworkBackend | None = None):
+        self.ttl = ttl
+        self._backend = backend or httpcore.AnyIOBackend()
+        # (host, port) -> (expires_at, address)
+        self._addresses: dict[tuple[str, int], tuple[float, str]] = {}
+
+    async def _resolve(self, host: str, port: int) -> str:
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        cached = self._addresses.get((host, port))
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        address = infos[0][4][0]
+        self._addresses[(host, port)] = (time.monotonic() + self.ttl, address)
+        return address
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        address = await self._resolve(host, port)
+        try:
+            return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+        except Exception:
+            self._addresses.pop((host, port), None)
+            raise
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return await self._backend.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float):
+        await self._backend.sleep(seconds)
+
+
+class PooledTransport(httpx.AsyncHTTPTransport):
+    """httpx transport whose connection pool uses the DNS-caching backend."""
+
+    def __init__(self, limits: httpx.Limits, http2: bool, network_backend: httpcore.AsyncNetworkBackend):
+        super().__init__(http2=http2, limits=limits)
+        # httpx has no option for the network backend, so the pool it built
+        # is replaced with an equivalent one that uses ours.
+        self._pool = self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http1=True,
+            http2=http2,
+            network_backend=network_backend,
+        )
+
+
+class HttpTransportManager:
+    """
+    Hands out one pooled, HTTP/2-enabled httpx.AsyncClient per upstream host,
+    shared by every adapter calling that host, and owns their lifecycle:
+    `warm_up` opens connections ahead of the first request and `aclose`
+    closes them all on shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        connect_timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS,
+        timeout: float = HTTP_TIMEOUT_SECONDS,
+        http2: bool = HTTP2_ENABLED,
+        dns_cache_ttl: float = DNS_CACHE_TTL_SECONDS,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2
+        self.network_backend = CachingNetworkBackend(dns_cache_ttl)
+        # host -> (base_url, client, transport)
+        self._clients: dict[str, tuple[str, httpx.AsyncClient, PooledTransport]] = {}
+        _managers.add(self)
+
+    def client(self, base_url: str) -> httpx.AsyncClient:
+        """Returns the shared client for the host of `base_url`."""
+        host = httpx.URL(base_url).host
+        if host not in self._clients:
+            transport = PooledTransport(self.limits, self.http2, self.network_backend)
+            client = httpx.AsyncClient(
+                transport=cassette.async_transport(transport) if cassette else transport, timeout=self.timeout
+            )
+            self._clients[host] = (base_url, client, transport)
+        return self._clients[host][1]
+
+    async def warm_up(self, timeout: float = HTTP_CONNECT_TIMEOUT_SECONDS):
+        """
+        Opens a connection (DNS, TCP, TLS and HTTP/2 setup) to every host, so
+        the first real requests do not pay for it. Any response will do;
+        failures are logged and left for the first request to retry.
+        """
+
+        async def touch(host: str, base_url: str, client: httpx.AsyncClient):
+            try:
+                await client.head(base_url, timeout=timeout)
+            except Exception as e:
+                logger.warning(f"Could not warm up connections to {host}: {e}")
+
+        await asyncio.gather(
+            *(touch(host, base_url, client) for host, (base_url, client, _) in self._clients.items())
+        )
+
+    def pool_stats(self) -> dict[str, dict[str, int]]:
+        """Connections per host: open, idle and in use."""
+        stats = {}
+        for host, (_, _, transport) in self._clients.items():
+            connections = transport.pool.connections
+            idle = sum(1 for connection in connections if connection.is_idle())
+            stats[host] = {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+        return stats
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(client.aclose() for _, client, _ in clients.values()))
+
+
+_managers: "weakref.WeakSet[HttpTransportManager]" = weakref.WeakSet()
+
+
+class _PoolCollector:
+    """Exports connection pool utilization of every manager to Prometheus."""
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "http_pool_connections", "Pooled outbound connections per host and state.", labels=["host", "state"]
+        )
+        limit = GaugeMetricFamily(
+            "http_pool_max_connections", "Connection limit of each outbound pool.", labels=["host"]
+        )
+        for manager in list(_managers):
+            for host, stats in manager.pool_stats().items():
+                connections.add_metric([host, "active"], stats["active"])
+                connections.add_metric([host, "idle"], stats["idle"])
+                limit.add_metric([host], manager.limits.max_connections)
+        yield connections
+        yield limit
+
+
+REGISTRY.register(_PoolCollector())
@@ -1,7 +1,14 @@
 import os
+import math
+import asyncio
 import logging
+from typing import Awaitable, Callable
+import httpx
 from openai import AsyncOpenAI
 
+from core.config import PROVIDER_EMULATOR_URL
+from core.embeddings import EMBEDDING_DIMENSIONS, EMBEDDING_MIGRATION_MODE
+
 # === Project Imports ===
 # Need to use forward declaration for type hints to avoid circular imports
 from typing import TYPE_CHECKING
@@ -10,45 +17,228 @@ if TYPE_CHECKING:
     from infrastructure.gemini_adapter import GeminiAdapter
 
 # --- Configuration ---
+OPENAI_BASE_URL = f"{PROVIDER_EMULATOR_URL}/v1" if PROVIDER_EMULATOR_URL else "https://api.openai.com/v1"
 EMBEDDING_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-large")
+# OpenAI limits: 2048 inputs and ~300k tokens per request, 8191 tokens per input.
+EMBEDDING_MAX_BATCH_ITEMS = int(os.getenv("OPENAI_EMBED_MAX_BATCH_ITEMS", "2048"))
+EMBEDDING_MAX_BATCH_TOKENS = int(os.getenv("OPENAI_EMBED_MAX_BATCH_TOKENS", "300000"))
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+# How long the auto-batcher waits for more concurrent calls before sending.
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("OPENAI_EMBED_BATCH_WAIT_MS", "5"))
 
 logger = logging.getLogger(__name__)
 
+
+def estimate_tokens(text: str) -> int:
+    """
+    Conservative token estimate (about 3 characters per token) that avoids a
+    tokenizer dependency while staying under the API limits for Spanish text.
+    """
+    return len(text) // 3 + 1
+
+
+def _split_oversize(text: str, max_tokens: int | None = None) -> list[str]:
+    """Splits a text that exceeds the per-input token limit into pieces."""
+    max_chars = (max_tokens or EMBEDDING_MAX_INPUT_TOKENS) * 3 - 3
+    if len(text) <= max_chars:
+        return [text]
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _combine_embeddings(embeddings: list[list[float]], weights: list[int]) -> list[float]:
+    """Weighted average of piece embeddings, re-normalized to unit length."""
+    total = sum(weights)
+    combined = [
+        sum(vector[i] * weight for vector, weight in zip(embeddings, weights)) / total
+        for i in range(len(embeddings[0]))
+    ]
+    norm = math.sqrt(sum(x * x for x in combined)) or 1.0
+    return [x / norm for x in combined]
+
+
+class EmbeddingBatcher:
+    """
+    Packs concurrent single-text embedding calls into one batch request.
+
+    Calls that arrive within `max_wait` seconds of each other are sent together,
+    and a batch is flushed early once it reaches the item or token limit.
+    Each caller gets back only its own embedding.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[list[str]], Awaitable[list[list[float]]]],
+        max_items: int = EMBEDDING_MAX_BATCH_ITEMS,
+        max_tokens: int = EMBEDDING_MAX_BATCH_TOKENS,
+        max_wait: float = EMBEDDING_BATCH_WAIT_MS / 1000,
+    ):
+        self._embed_many = embed_many
+        self.max_items = max_items
+        self.max_tokens = max_tokens
+        self.max_wait = max_wait
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Oversize inputs are split by embed_many; cap their weight here.
+        tokens = min(estimate_tokens(text), self.max_tokens)
+
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        self._pending.append((text, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_items:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_tokens = self._pending, [], 0
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: list[tuple[str, asyncio.Future]]):
+        try:
+            results = await self._embed_many([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), embedding in zip(batch, results):
+            if not future.done():
+                future.set_result(embedding)
+
 class OpenAIEmbeddingAdapter:
-    def __init__(self, api_key: str, supabase_adapter: 'SupabaseAdapter', gemini_adapter: 'GeminiAdapter'):
+    def __init__(
+        self,
+        api_key: str,
+        supabase_adapter: 'SupabaseAdapter',
+        gemini_adapter: 'GeminiAdapter',
+        http_client: httpx.AsyncClient | None = None,
+    ):
         """
         Initializes the adapter with an API key and other required adapters.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set.")
-        self.client = AsyncOpenAI(api_key=self.api_key)
+        self.client = AsyncOpenAI(api_key=self.api_key, base_url=OPENAI_BASE_URL, http_client=http_client)
 
         # Store other adapters needed for the RAG pipeline
         self.supabase_adapter = supabase_adapter
         self.gemini_adapter = gemini_adapter
 
+        # Concurrent get_embedding calls are packed into shared requests
+        self.batcher = EmbeddingBatcher(self.get_embeddings)
+
     async def get_embedding(self, text: str) -> list[float]:
         """
         Generates a vector embedding for the given text using OpenAI's API.
+        The call is transparently batched with other concurrent calls.
         """
         logger.info("OpenAI Embeddings: generating for text '%s'...", text[:30])
-        try:
-            text_to_embed = text.replace("\n", " ")
-            response = await self.client.embeddings.create(
-                input=[text_to_embed],
-                model=EMBEDDING_MODEL
-            )
-            embedding = response.data[0].embedding
+        embedding = await self.batcher.embed(text)
+        if embedding:
             logger.info(
                 "Successfully generated embedding of dimension %d.",
                 len(embedding),
             )
-            return embedding
-        except Exception as e:
-            logger.error("An error occurred while calling the OpenAI API: %s", e)
+        return embedding
+
+    async def get_embeddings(self, texts: list[str]) -> list[list[float]]:
+        """
+        Generates embeddings for many texts using as few API requests as possible.
+
+        Inputs are packed into requests up to the item and token limits; inputs
+        over the per-input limit are split and their piece embeddings averaged.
+        Results are returned in the same order as `texts`. An input whose request
+        failed gets an empty list, matching `get_embedding`.
+        """
+        if not texts:
             return []
 
+        # Flatten every text into one or more pieces, remembering the owner.
+        pieces: list[str] = []
+        owners: list[int] = []
+        for index, text in enumerate(texts):
+            for piece in _split_oversize(text.replace("\n", " ")):
+                pieces.append(piece)
+                owners.append(index)
+
+        # Pack pieces into requests that respect both API limits.
+        requests: list[list[int]] = []
+        current: list[int] = []
+        current_tokens = 0
+        for i, piece in enumerate(pieces):
+            tokens = estimate_tokens(piece)
+            if current and (
+                len(current) >= EMBEDDING_MAX_BATCH_ITEMS
+                or current_tokens + tokens > EMBEDDING_MAX_BATCH_TOKENS
+            ):
+                requests.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+        requests.append(current)
+
+        piece_embeddings: list[list[float] | None] = [None] * len(pieces)
+
+        # Once reads use the reduced column only, ask the API for the smaller
+        # vectors directly; otherwise keep full vectors (they can be reduced locally).
+        options = {}
+        if EMBEDDING_MIGRATION_MODE == "reduced":
+            options["dimensions"] = EMBEDDING_DIMENSIONS
+
+        async def send(indexes: list[int]):
+            try:
+                response = await self.client.embeddings.create(
+                    input=[pieces[i] for i in indexes],
+                    model=EMBEDDING_MODEL,
+                    **options,
+                )
+            except Exception as e:
+                logger.error("An error occurred while calling the OpenAI API: %s", e)
+                return
+            for item in response.data:
+                piece_embeddings[indexes[item.index]] = item.embedding
+
+        await asyncio.gather(*(send(indexes) for indexes in requests))
+        if len(requests) > 1:
+            logger.info("Embedded %d texts in %d requests.", len(texts), len(requests))
+
+        # Map piece embeddings back to the original inputs.
+        grouped: list[list[int]] = [[] for _ in texts]
+        for i, owner in enumerate(owners):
+            grouped[owner].append(i)
+
+        results: list[list[float]] = []
+        for indexes in grouped:
+            vectors = [piece_embeddings[i] for i in indexes]
+            if any(v is None for v in vectors):
+                results.append([])
+            elif len(vectors) == 1:
+                results.append(vectors[0])
+            else:
+                results.append(
+                    _combine_embeddings(vectors, [len(pieces[i]) for i in indexes])
+                )
+        return results
+
     async def generate_response_from_rag(self, query: str, user_id: str) -> str:
         """
         Generates a response using a full RAG (Retrieval-Augmented Generation) pipeline.
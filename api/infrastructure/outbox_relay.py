@@ -0,0 +1,121 @@
+import os
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Off in processes that must not publish, e.g. tests or a read-only replica.
+OUTBOX_RELAY_ENABLED = os.getenv("OUTBOX_RELAY_ENABLED", "true").lower() == "true"
+# Rows published per queue call; Cloudflare Queues accepts at most 100.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+# How often the outbox is polled when no ingest request woke the relay up.
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+# A claimed batch is retried by any relay if it is not settled within this time.
+OUTBOX_LEASE_SECONDS = 30
+# Failed batches are retried after 1s, 2s, 4s... up to this delay.
+OUTBOX_RETRY_MAX_SECONDS = 300
+
+
+def route_by_media(
+    publish_audio: Callable[[list[dict]], Awaitable[Any]],
+    publish_text: Callable[[list[dict]], Awaitable[Any]],
+) -> Callable[[list[dict]], Awaitable[None]]:
+    """
+    Publisher for OutboxRelay that sends audio messages (with a mediaKey) to
+    the transcription queue and text messages to the chat queue.
+    """
+
+    async def publish_many(payloads: list[dict]):
+        audio = [payload for payload in payloads if payload.get("mediaKey")]
+        text = [payload for payload in payloads if not payload.get("mediaKey")]
+        await asyncio.gather(*(
+            publish(batch) for publish, batch in ((publish_audio, audio), (publish_text, text)) if batch
+        ))
+
+    return publish_many
+
+
+class OutboxRelay:
+    """
+    Publishes the message outbox (migration 023) to the queue in batches.
+
+    Ingest requests call `notify` after writing to the outbox, so messages
+    are normally published within one round trip; polling picks up anything
+    left behind by other instances or earlier failures. Delivery is at least
+    once: a batch published just before its rows could be deleted is
+    published again once its lease runs out.
+    """
+
+    def __init__(
+        self,
+        db_adapter: SupabaseAdapter,
+        publish_many: Callable[[list[dict]], Awaitable[Any]],
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        poll_interval: float = OUTBOX_POLL_SECONDS,
+        lease_seconds: int = OUTBOX_LEASE_SECONDS,
+        max_retry_delay: float = OUTBOX_RETRY_MAX_SECONDS,
+    ):
+        self.db_adapter = db_adapter
+        self._publish_many = publish_many
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_retry_delay = max_retry_delay
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+
+    def notify(self):
+        """Wakes the relay up to publish newly written rows."""
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """Stops the relay after the batch in progress, if any."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                published = await self.relay_once()
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+                published = 0
+            if published == self.batch_size:
+                continue  # More rows are probably waiting.
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def relay_once(self) -> int:
+        """Publishes one batch of outbox rows. Returns the number published."""
+        rows = await self.db_adapter.claim_outbox_messages(self.batch_size, self.lease_seconds)
+        if not rows:
+            return 0
+        rows.sort(key=lambda row: row["id"])
+        ids = [row["id"] for row in rows]
+        try:
+            await self._publish_many([row["payload"] for row in rows])
+        except Exception as e:
+            attempts = max(row["attempts"] for row in rows)
+            delay = min(2 ** (attempts - 1), self.max_retry_delay)
+            logger.warning(f"Could not publish {len(rows)} outbox messages (attempt {attempts}); retrying in {delay}s: {e}")
+            await self.db_adapter.reschedule_outbox_messages(ids, delay, str(e))
+            return 0
+        await self.db_adapter.delete_outbox_messages(ids)
+        return len(rows)
@@ -0,0 +1,158 @@
+import os
+import asyncio
+import logging
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator
+
+
+logger = logging.getLogger(__name__)
+
+# --- Configuration ---
+PDF_MAX_WORKERS = int(os.getenv("PDF_MAX_WORKERS", "2"))
+PDF_TIMEOUT_SECONDS = float(os.getenv("PDF_TIMEOUT_SECONDS", "30"))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "8"))
+
+
+class PdfExtractionError(Exception):
+    """Raised when a PDF cannot be parsed or exceeds its time budget."""
+
+
+# --- Worker functions (run inside the process pool) ---
+
+def _count_pages(path: str) -> int:
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def _extract_page_range(path: str, start: int, end: int) -> list[str]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+class PdfTextExtractor:
+    """
+    Extracts text from PDFs in a bounded process pool so CPU-heavy parsing
+    never runs on the event loop.
+
+    Pages are extracted in small ranges and yielded in order as soon as each
+    range is ready, so callers can feed the chunking pipeline while the rest
+    of the document is still being parsed.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = PDF_MAX_WORKERS,
+        timeout: float = PDF_TIMEOUT_SECONDS,
+        pages_per_task: int = PDF_PAGES_PER_TASK,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.pages_per_task = max(1, pages_per_task)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the API does not spawn processes.
+        # 'spawn' avoids forking a process that already runs gRPC/asyncio threads.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _reset_executor(self):
+        """Kills the pool after a timeout; a stuck parse cannot be cancelled otherwise."""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def iter_pages(
+        self, data: bytes, timeout: float | None = None
+    ) -> AsyncIterator[tuple[int, str]]:
+        """
+        Yields (page_number, text) tuples in page order, 1-based.
+        Raises PdfExtractionError if the file is invalid or the whole file
+        takes longer than `timeout` seconds.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (timeout or self.timeout)
+
+        # Workers read the file from disk instead of receiving the bytes
+        # pickled once per page range.
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        pending: list[tuple[int, asyncio.Future]] = []
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+
+            page_count = await self._run(loop, deadline, _count_pages, path)
+            ranges = [
+                (start, min(start + self.pages_per_task, page_count))
+                for start in range(0, page_count, self.pages_per_task)
+            ]
+
+            # Keep a bounded window in flight so one large file does not
+            # monopolise the pool or buffer every page in memory.
+            window = max(1, self.max_workers)
+            next_range = 0
+            while next_range < len(ranges) or pending:
+                while next_range < len(ranges) and len(pending) < window:
+                    start, end = ranges[next_range]
+                    future = loop.run_in_executor(
+                        self._get_executor(), _extract_page_range, path, start, end
+                    )
+                    pending.append((start, future))
+                    next_range += 1
+
+                start, future = pending.pop(0)
+                others = [f for _, f in pending]
+                texts = await self._await(loop, deadline, future, others)
+                for offset, text in enumerate(texts):
+                    yield start + offset + 1, text
+        finally:
+            # The consumer may stop early (e.g. a queue publish failed).
+            for _, future in pending:
+                future.cancel()
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    async def _run(self, loop, deadline: float, fn, *args):
+        future = loop.run_in_executor(self._get_executor(), fn, *args)
+        return await self._await(loop, deadline, future, [])
+
+    async def _await(self, loop, deadline: float, future, pending: list):
+        remaining = deadline - loop.time()
+        try:
+            return await asyncio.wait_for(future, timeout=max(remaining, 0))
+        except asyncio.TimeoutError as e:
+            for other in pending:
+                other.cancel()
+            logger.warning("PDF extraction exceeded its time budget; recycling pool.")
+            self._reset_executor()
+            raise PdfExtractionError("PDF extraction timed out.") from e
+        except Exception as e:
+            for other in pending:
+                other.cancel()
+            logger.error("Error extracting text from PDF: %s", e)
+            raise PdfExtractionError(f"Could not extract text from PDF: {e}") from e
+
+    async def extract_text(self, data: bytes, timeout: float | None = None) -> str:
+        """Convenience wrapper returning the whole document as one string."""
+        pages = [text async for _, text in self.iter_pages(data, timeout=timeout)]
+        return "\n\n".join(pages)
+
+    def shutdown(self):
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,92 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+
+logger = logging.getLogger(__name__)
+
+# Rows are written in one insert once this many are buffered...
+PERF_LOG_BATCH_SIZE = int(os.getenv("PERF_LOG_BATCH_SIZE", "200"))
+# ...or when the oldest buffered row is this old.
+PERF_LOG_FLUSH_SECONDS = float(os.getenv("PERF_LOG_FLUSH_SECONDS", "5"))
+# Rows kept while the database is unreachable; the oldest are dropped first.
+PERF_LOG_MAX_BUFFER = int(os.getenv("PERF_LOG_MAX_BUFFER", "10000"))
+
+
+class PerformanceLogWriter:
+    """
+    Buffers per-turn timing rows and writes them to performance_logs in batches.
+
+    `record` never blocks or raises, so timing capture cannot slow down or
+    break the turn it measures. Failed batches are put back in the buffer
+    and retried with the next flush.
+    """
+
+    def __init__(
+        self,
+        write_many: Callable[[list[dict]], Awaitable[int]],
+        batch_size: int = PERF_LOG_BATCH_SIZE,
+        flush_interval: float = PERF_LOG_FLUSH_SECONDS,
+        max_buffer: int = PERF_LOG_MAX_BUFFER,
+    ):
+        self._write_many = write_many
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: list[dict] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.dropped = 0
+
+    def record(self, row: dict):
+        self._buffer.append(row)
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+            logger.warning("Performance log buffer full; dropped %d rows.", overflow)
+
+        if len(self._buffer) >= self.batch_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule_flush)
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer[: self.batch_size], self._buffer[self.batch_size :]
+        task = asyncio.ensure_future(self._write(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._buffer and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule_flush)
+
+    async def _write(self, batch: list[dict]):
+        try:
+            await self._write_many(batch)
+        except Exception as e:
+            logger.error("Error writing %d performance log rows: %s", len(batch), e)
+            # Keep the rows for the next flush, ahead of newer ones.
+            self._buffer[:0] = batch
+            del self._buffer[self.max_buffer :]
+            if self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._schedule_flush)
+
+    async def flush(self):
+        """Writes everything buffered so far; used on shutdown."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._buffer:
+            batch, self._buffer = self._buffer[: self.batch_size], self._buffer[self.batch_size :]
+            try:
+                await self._write_many(batch)
+            except Exception as e:
+                logger.error("Dropping %d performance log rows on flush: %s", len(batch) + len(self._buffer), e)
+                self._buffer = []
@@ -0,0 +1,376 @@
+"""
+Deterministic stand-in for the AI providers, for load tests and local runs
+that must not spend API quota.
+
+It serves the OpenAI-compatible endpoints used by the DeepSeek and OpenAI
+adapters (/v1/chat/completions, with streaming, and /v1/embeddings) and the
+Gemini REST endpoints used by the Gemini SDK (generateContent,
+streamGenerateContent, embedContent and batchEmbedContents). Embeddings are
+derived from a hash of each word, so equal texts get equal vectors and texts
+sharing words are similar. Completions are canned. Latency, token rate and
+injected errors follow EmulatorConfig.
+
+Setting PROVIDER_EMULATOR_URL points the adapters at it. Run it as a process
+(from the api/ directory):
+    python -m infrastructure.provider_emulator --port 8900 --latency lognormal:300,0.6 --error-rate 0.01
+
+or in-process, e.g. for benchmarks, through httpx.ASGITransport(create_app()).
+"""
+import os
+import json
+import math
+import array
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable
+
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+from core.embeddings import FULL_EMBEDDING_DIMENSIONS, reduce_embedding
+
+
+logger = logging.getLogger(__name__)
+
+# Output size of Gemini's embedding-001.
+GEMINI_EMBEDDING_DIMENSIONS = 768
+# Hashed positions set per word; more positions make vectors less sparse.
+FEATURES_PER_TOKEN = 8
+
+_VOCABULARY = (
+    "el la los las un una de del en con para por que su sus tu tus negocio empresa clientes ventas "
+    "servicio plan precio equipo cuenta pago factura reunión agenda propuesta información datos "
+    "podemos puedes ayudar revisar ofrecer mejorar crecer resolver consultar confirmar "
+    "claro gracias además también ahora hoy mañana siempre mejor rápido simple"
+).split()
+
+_GOOGLE_STATUSES = {400: "INVALID_ARGUMENT", 429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 503: "UNAVAILABLE"}
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parses a latency distribution in milliseconds and returns a sampler of
+    seconds: "fixed:200", "uniform:100,400" or "lognormal:300,0.6" (median
+    and sigma of the underlying normal).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value.strip()]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0] / 1000
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+
+@dataclass
+class EmulatorConfig:
+    # Seeds latencies and injected errors; runs with the same seed and request
+    # order behave the same.
+    seed: int = 0
+    # Time to the first token of a completion.
+    latency: str = "lognormal:300,0.6"
+    # Completion tokens emitted per second after the first; 0 emits them at once.
+    tokens_per_second: float = 50
+    # Length of generated completions, before max_tokens.
+    completion_tokens: int = 60
+    embedding_latency: str = "lognormal:40,0.4"
+    # Share of requests answered with one of error_statuses instead.
+    error_rate: float = 0.0
+    error_statuses: tuple[int, ...] = (429, 500, 503)
+    # Replies for prompts containing a key (case-insensitive), checked in order.
+    completions: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "EmulatorConfig":
+        completions = {}
+        completions_file = os.getenv("EMULATOR_COMPLETIONS_FILE")
+        if completions_file:
+            with open(completions_file) as fh:
+                completions = json.load(fh)
+        statuses = os.getenv("EMULATOR_ERROR_STATUSES", "429,500,503")
+        return cls(
+            seed=int(os.getenv("EMULATOR_SEED", "0")),
+            latency=os.getenv("EMULATOR_LATENCY", cls.latency),
+            tokens_per_second=float(os.getenv("EMULATOR_TOKENS_PER_SECOND", str(cls.tokens_per_second))),
+            completion_tokens=int(os.getenv("EMULATOR_COMPLETION_TOKENS", str(cls.completion_tokens))),
+            embedding_latency=os.getenv("EMULATOR_EMBEDDING_LATENCY", cls.embedding_latency),
+            error_rate=float(os.getenv("EMULATOR_ERROR_RATE", "0")),
+            error_statuses=tuple(int(status) for status in statuses.split(",") if status.strip()),
+            completions=completions,
+        )
+
+
+def hash_embedding(text: str, dimensions: int = FULL_EMBEDDING_DIMENSIONS) -> list[float]:
+    """
+    Unit vector built by feature hashing the words of `text`. Smaller sizes
+    are truncations of the full vector, as with text-embedding-3.
+    """
+    vector = [0.0] * max(dimensions, FULL_EMBEDDING_DIMENSIONS)
+    for token in text.lower().split() or [text]:
+        digest = hashlib.blake2b(token.encode(), digest_size=4 * FEATURES_PER_TOKEN).digest()
+        for i in range(FEATURES_PER_TOKEN):
+            value = int.from_bytes(digest[4 * i:4 * i + 4], "little")
+            vector[(value >> 1) % len(vector)] += 1.0 if value & 1 else -1.0
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return reduce_embedding([x / norm for x in vector], dimensions)
+
+
+def canned_completion(prompt: str, config: EmulatorConfig) -> str:
+    lowered = prompt.lower()
+    for key, reply in config.completions.items():
+        if key.lower() in lowered:
+            return reply
+    # Same prompt, same reply.
+    rng = random.Random(hashlib.blake2b(prompt.encode(), digest_size=8).digest())
+    words = [rng.choice(_VOCABULARY) for _ in range(config.completion_tokens)]
+    return " ".join(words).capitalize() + "."
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 3 + 1
+
+
+class ProviderEmulator:
+    """Request handling shared by the OpenAI-compatible and Gemini routes."""
+
+    def __init__(self, config: EmulatorConfig):
+        self.config = config
+        self._rng = random.Random(config.seed)
+        self._first_token_latency = parse_latency(config.latency)
+        self._embedding_latency = parse_latency(config.embedding_latency)
+
+    def injected_error(self) -> int | None:
+        """The status of an injected failure for this request, if any."""
+        if self.config.error_rate > 0 and self._rng.random() < self.config.error_rate:
+            return self._rng.choice(self.config.error_statuses)
+        return None
+
+    def completion_tokens(self, prompt: str, max_tokens: int | None) -> list[str]:
+        words = canned_completion(prompt, self.config).split(" ")
+        if max_tokens:
+            words = words[:max_tokens]
+        # Tokens as streamed: every word after the first carries its space.
+        return words[:1] + [f" {word}" for word in words[1:]]
+
+    async def wait_first_token(self):
+        await asyncio.sleep(self._first_token_latency(self._rng))
+
+    async def wait_next_token(self):
+        if self.config.tokens_per_second > 0:
+            await asyncio.sleep(1 / self.config.tokens_per_second)
+
+    async def wait_embedding(self):
+        await asyncio.sleep(self._embedding_latency(self._rng))
+
+    async def stream_tokens(self, tokens: list[str]) -> AsyncIterator[str]:
+        await self.wait_first_token()
+        for i, token in enumerate(tokens):
+            if i:
+                await self.wait_next_token()
+            yield token
+
+    async def generate(self, tokens: list[str]) -> str:
+        await self.wait_first_token()
+        if self.config.tokens_per_second > 0:
+            await asyncio.sleep(max(len(tokens) - 1, 0) / self.config.tokens_per_second)
+        return "".join(tokens)
+
+
+def _sse(data: dict | str) -> str:
+    return f"data: {data if isinstance(data, str) else json.dumps(data)}\n\n"
+
+
+def _openai_error(status: int) -> ORJSONResponse:
+    headers = {"Retry-After": "1"} if status == 429 else None
+    return ORJSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Injected error {status}", "type": "emulator_error", "code": status}},
+        headers=headers,
+    )
+
+
+def _google_error(status: int) -> ORJSONResponse:
+    return ORJSONResponse(
+        status_code=status,
+        content={"error": {"code": status, "message": f"Injected error {status}", "status": _GOOGLE_STATUSES.get(status, "UNKNOWN")}},
+    )
+
+
+def _gemini_prompt(body: dict) -> str:
+    return "\n".join(
+        part.get("text", "") for content in body.get("contents", []) for part in content.get("parts", [])
+    )
+
+
+def _gemini_embedding(request: dict) -> dict:
+    text = " ".join(part.get("text", "") for part in request.get("content", {}).get("parts", []))
+    dimensions = request.get("outputDimensionality") or GEMINI_EMBEDDING_DIMENSIONS
+    return {"values": hash_embedding(text, dimensions)}
+
+
+def create_app(config: EmulatorConfig | None = None) -> FastAPI:
+    emulator = ProviderEmulator(config or EmulatorConfig.from_env())
+    app = FastAPI(title="Provider emulator", docs_url=None, redoc_url=None)
+    app.state.emulator = emulator
+
+    # --- OpenAI-compatible (OpenAI, DeepSeek) ---
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _openai_error(status)
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        tokens = emulator.completion_tokens(prompt, body.get("max_tokens"))
+        completion_id = f"chatcmpl-{hashlib.blake2b(prompt.encode(), digest_size=8).hexdigest()}"
+        created = int(time.time())
+        model = body.get("model", "emulator")
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": len(tokens),
+            "total_tokens": _estimate_tokens(prompt) + len(tokens),
+        }
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            return _sse({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            })
+
+        if body.get("stream"):
+            async def events():
+                yield chunk({"role": "assistant", "content": ""})
+                async for token in emulator.stream_tokens(tokens):
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                yield _sse("[DONE]")
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        content = await emulator.generate(tokens)
+        return {
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _openai_error(status)
+        texts = body.get("input", [])
+        texts = [texts] if isinstance(texts, str) else texts
+        dimensions = body.get("dimensions") or FULL_EMBEDDING_DIMENSIONS
+        await emulator.wait_embedding()
+        data = []
+        for i, text in enumerate(texts):
+            vector = hash_embedding(text, dimensions)
+            if body.get("encoding_format") == "base64":
+                vector = base64.b64encode(array.array("f", vector).tobytes()).decode()
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        tokens = sum(_estimate_tokens(text) for text in texts)
+        return {
+            "object": "list", "data": data, "model": body.get("model", "emulator"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    # --- Gemini REST (google-generativeai with transport="rest") ---
+
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate_content(model: str, request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _google_error(status)
+        prompt = _gemini_prompt(body)
+        max_tokens = body.get("generationConfig", {}).get("maxOutputTokens")
+        tokens = emulator.completion_tokens(prompt, max_tokens)
+        text = await emulator.generate(tokens)
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {
+                "promptTokenCount": _estimate_tokens(prompt),
+                "candidatesTokenCount": len(tokens),
+                "totalTokenCount": _estimate_tokens(prompt) + len(tokens),
+            },
+        }
+
+    @app.post("/v1beta/models/{model}:streamGenerateContent")
+    async def stream_generate_content(model: str, request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _google_error(status)
+        prompt = _gemini_prompt(body)
+        tokens = emulator.completion_tokens(prompt, body.get("generationConfig", {}).get("maxOutputTokens"))
+        sse = request.query_params.get("alt") == "sse"
+
+        async def events():
+            # Without alt=sse the SDK expects one JSON array, streamed.
+            if not sse:
+                yield "["
+            first = True
+            async for token in emulator.stream_tokens(tokens):
+                chunk = {"candidates": [{"content": {"parts": [{"text": token}], "role": "model"}, "index": 0}]}
+                yield _sse(chunk) if sse else ("" if first else ",") + json.dumps(chunk)
+                first = False
+            if not sse:
+                yield "]"
+
+        return StreamingResponse(events(), media_type="text/event-stream" if sse else "application/json")
+
+    @app.post("/v1beta/models/{model}:embedContent")
+    async def embed_content(model: str, request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _google_error(status)
+        await emulator.wait_embedding()
+        return {"embedding": _gemini_embedding(body)}
+
+    @app.post("/v1beta/models/{model}:batchEmbedContents")
+    async def batch_embed_contents(model: str, request: Request):
+        body = await request.json()
+        status = emulator.injected_error()
+        if status:
+            return _google_error(status)
+        await emulator.wait_embedding()
+        return {"embeddings": [_gemini_embedding(item) for item in body.get("requests", [])]}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--latency", help="Time to first token, e.g. fixed:200, uniform:100,400, lognormal:300,0.6")
+    parser.add_argument("--tokens-per-second", type=float)
+    parser.add_argument("--embedding-latency")
+    parser.add_argument("--error-rate", type=float, help="Share of requests failed with an injected error")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = EmulatorConfig.from_env()
+    for name in ("seed", "latency", "tokens_per_second", "embedding_latency", "error_rate"):
+        if getattr(args, name) is not None:
+            setattr(config, name, getattr(args, name))
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
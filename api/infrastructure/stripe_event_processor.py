@@ -0,0 +1,115 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from core.use_cases.apply_stripe_event import StripeEventDeferred
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# In-process attempts per event before it is left for the replay job.
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "5"))
+# Delay before the first retry; doubled on every further attempt.
+STRIPE_EVENT_RETRY_SECONDS = float(os.getenv("STRIPE_EVENT_RETRY_SECONDS", "1"))
+
+
+class StripeEventProcessor:
+    """
+    Applies stored Stripe webhook events in the background.
+
+    Events sharing an ordering key (a subscription) run one at a time in
+    submission order; different subscriptions run concurrently. Failures are
+    retried with exponential backoff, and the outcome is recorded in the
+    stripe_webhook_events table. An event waiting for another (an update
+    before its checkout) leaves the chain and rejoins it at the back after
+    the backoff, so the event it waits for can run meanwhile.
+    """
+
+    def __init__(
+        self,
+        apply_event: Callable[[dict], Awaitable[None]],
+        db_adapter: SupabaseAdapter,
+        max_attempts: int = STRIPE_EVENT_MAX_ATTEMPTS,
+        retry_delay: float = STRIPE_EVENT_RETRY_SECONDS,
+    ):
+        self._apply_event = apply_event
+        self.db_adapter = db_adapter
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Last task scheduled for each ordering key, and deferred events
+        # waiting to rejoin their chain.
+        self._tails: dict[str, asyncio.Task] = {}
+        self._deferred: set[asyncio.Task] = set()
+
+    def submit(self, event: dict, key: str, attempts: int = 0) -> asyncio.Task:
+        """Schedules an event after every event already submitted with the same key."""
+        previous = self._tails.get(key)
+        task = asyncio.ensure_future(self._run_after(previous, event, key, attempts))
+        self._tails[key] = task
+
+        def forget(done: asyncio.Task):
+            if self._tails.get(key) is done:
+                del self._tails[key]
+
+        task.add_done_callback(forget)
+        return task
+
+    async def _run_after(self, previous: asyncio.Task | None, event: dict, key: str, attempts: int):
+        if previous is not None:
+            await asyncio.wait([previous])
+        return await self._process(event, key, attempts)
+
+    async def _process(self, event: dict, key: str, attempts: int = 0) -> bool:
+        """
+        Applies one event, retrying on failure. Returns True once applied,
+        False when it failed or was deferred.
+        """
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            attempts += 1
+            try:
+                await self._apply_event(event)
+            except StripeEventDeferred as e:
+                error = str(e)
+                if attempts >= self.max_attempts:
+                    break
+                logger.info("Deferring Stripe event %s (%s): %s", event["id"], event["type"], e)
+                self._defer(event, key, attempts)
+                return False
+            except Exception as e:
+                error = str(e)
+                logger.warning(
+                    "Stripe event %s (%s) failed on attempt %d: %s", event["id"], event["type"], attempts, e
+                )
+                continue
+            await self._mark(event["id"], "processed", attempts)
+            return True
+
+        logger.error("Giving up on Stripe event %s after %d attempts: %s", event["id"], attempts, error)
+        await self._mark(event["id"], "failed", attempts, error)
+        return False
+
+    def _defer(self, event: dict, key: str, attempts: int):
+        async def rejoin():
+            await asyncio.sleep(self.retry_delay * 2 ** (attempts - 1))
+            self.submit(event, key, attempts)
+
+        task = asyncio.ensure_future(rejoin())
+        self._deferred.add(task)
+        task.add_done_callback(self._deferred.discard)
+
+    async def _mark(self, event_id: str, status: str, attempts: int, error: str | None = None):
+        try:
+            await self.db_adapter.mark_stripe_event(event_id, status, attempts, error)
+        except Exception as e:
+            # The event stays unprocessed in the store and will be replayed.
+            logger.error("Error recording status of Stripe event %s: %s", event_id, e)
+
+    async def drain(self):
+        """Waits for every submitted event to finish; used on shutdown."""
+        while self._tails or self._deferred:
+            await asyncio.gather(*self._tails.values(), *self._deferred, return_exceptions=True)
@@ -0,0 +1,99 @@
+import os
+import time
+import logging
+from typing import Awaitable, Callable
+
+import stripe
+from prometheus_client import Counter, Histogram
+
+
+logger = logging.getLogger(__name__)
+
+# Per-request timeout and automatic retries of failed requests. Stripe
+# attaches an idempotency key to retried POSTs, so retrying is safe.
+STRIPE_TIMEOUT_SECONDS = float(os.getenv("STRIPE_TIMEOUT_SECONDS", "10"))
+STRIPE_MAX_RETRIES = int(os.getenv("STRIPE_MAX_RETRIES", "2"))
+# How long a user's Stripe customer ID is cached. A customer ID never changes
+# once assigned, so only the time until a new one is seen matters.
+STRIPE_CUSTOMER_CACHE_TTL = float(os.getenv("STRIPE_CUSTOMER_CACHE_TTL_SECONDS", "300"))
+
+STRIPE_REQUESTS = Counter(
+    "stripe_requests_total", "Stripe API requests.", ["operation", "outcome"]
+)
+STRIPE_REQUEST_SECONDS = Histogram(
+    "stripe_request_duration_seconds", "Stripe API request latency, retries included.", ["operation"]
+)
+
+
+class StripeGateway:
+    """
+    Async access to the Stripe API.
+
+    Requests go through Stripe's async client over one pooled keep-alive
+    httpx connection, so they never block the event loop.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        timeout: float = STRIPE_TIMEOUT_SECONDS,
+        max_retries: int = STRIPE_MAX_RETRIES,
+        customer_cache_ttl: float = STRIPE_CUSTOMER_CACHE_TTL,
+    ):
+        self._http_client = stripe.HTTPXClient(timeout=timeout)
+        self.client = stripe.StripeClient(
+            api_key, http_client=self._http_client, max_network_retries=max_retries
+        )
+        self.customer_cache_ttl = customer_cache_ttl
+        # user_id -> (customer_id, expires_at)
+        self._customer_ids: dict[str, tuple[str, float]] = {}
+
+    async def _call(self, operation: str, request: Awaitable):
+        started = time.perf_counter()
+        try:
+            result = await request
+        except Exception:
+            STRIPE_REQUESTS.labels(operation, "error").inc()
+            raise
+        finally:
+            STRIPE_REQUEST_SECONDS.labels(operation).observe(time.perf_counter() - started)
+        STRIPE_REQUESTS.labels(operation, "ok").inc()
+        return result
+
+    async def create_checkout_session(self, params: dict):
+        return await self._call(
+            "checkout_session_create", self.client.checkout.sessions.create_async(params)
+        )
+
+    async def create_billing_portal_session(self, customer_id: str, return_url: str):
+        return await self._call(
+            "billing_portal_session_create",
+            self.client.billing_portal.sessions.create_async(
+                {"customer": customer_id, "return_url": return_url}
+            ),
+        )
+
+    async def retrieve_subscription(self, subscription_id: str):
+        return await self._call(
+            "subscription_retrieve", self.client.subscriptions.retrieve_async(subscription_id)
+        )
+
+    async def get_customer_id(
+        self, user_id: str, lookup: Callable[[str], Awaitable[str | None]]
+    ) -> str | None:
+        """
+        Returns the user's Stripe customer ID, calling `lookup` on a cache miss.
+        Users without a customer ID are not cached, so a new one shows up at once.
+        """
+        cached = self._customer_ids.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        customer_id = await lookup(user_id)
+        if customer_id:
+            self._customer_ids[user_id] = (customer_id, time.monotonic() + self.customer_cache_ttl)
+        else:
+            self._customer_ids.pop(user_id, None)
+        return customer_id
+
+    async def aclose(self):
+        await self._http_client.close_async()
@@ -1,11 +1,42 @@
 import os
 import asyncio
 import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator
 from supabase import create_client, Client
 
+from core.embeddings import (
+    EMBEDDING_MIGRATION_MODE,
+    FULL_EMBEDDING_DIMENSIONS,
+    reduce_embedding,
+)
+from core.pagination import encode_cursor, keyset_filter
+from infrastructure.cassette import cassette
+
 
 logger = logging.getLogger(__name__)
 
+# Default retrieval strategy for find_relevant_chunks:
+#   exact     - match_document_chunks (or its reduced variant, see core.embeddings)
+#   quantized - binary-quantized candidate scan plus exact rerank
+#   hybrid    - full-text and vector search merged with reciprocal-rank fusion
+RAG_SEARCH_MODE = os.getenv("RAG_SEARCH_MODE", "exact")
+# Candidates fetched per requested match in quantized mode.
+QUANTIZED_OVERSAMPLE = int(os.getenv("RAG_QUANTIZED_OVERSAMPLE", "10"))
+# Full-vector matching RPC: v1 is the original global-index match_document_chunks,
+# v2 the tenant-aware HNSW version from migration 013. v2 is opt-in: enable it
+# once the migration is applied, as a missing RPC leaves retrieval empty.
+RAG_MATCH_RPC_VERSIONS = ("v1", "v2")
+RAG_MATCH_RPC_VERSION = os.getenv("RAG_MATCH_RPC_VERSION", "v1")
+if RAG_MATCH_RPC_VERSION not in RAG_MATCH_RPC_VERSIONS:
+    raise RuntimeError(f"RAG_MATCH_RPC_VERSION must be one of {', '.join(RAG_MATCH_RPC_VERSIONS)}")
+# Default HNSW ef_search for v2; unset means the database default.
+HNSW_EF_SEARCH = int(os.getenv("RAG_HNSW_EF_SEARCH", "0")) or None
+# Inclusive upper bounds of the response-time histogram buckets kept by the
+# quality rollup (response_time_bucket, migration 028); the last histogram
+# entry counts everything slower.
+RESPONSE_TIME_BUCKETS_MS = [500, 1000, 2000, 5000, 10000, 30000]
+
 
 class SupabaseAdapter:
     def __init__(self, url: str | None = None, key: str | None = None):
@@ -16,6 +47,11 @@ class SupabaseAdapter:
                 "SUPABASE_URL and SUPABASE_ANON_KEY must be set in environment."
             )
         self.client: Client = create_client(url, key)
+        if cassette:
+            # Queries and RPCs all go through the PostgREST session.
+            session = self.client.postgrest.session
+            session._transport = cassette.sync_transport(session._transport)
+
     async def _execute(self, query):
         return await asyncio.to_thread(query.execute)
 
@@ -140,6 +176,16 @@ class SupabaseAdapter:
             logger.error("Error creating document record for user %s: %s", user_id, e)
             return None
 
+    async def set_document_segments(self, document_id: str, segment_count: int):
+        """
+        Records how many queue segments a document was split into, completing
+        it if the embedding worker already stored them all.
+        """
+        query = self.client.rpc(
+            "complete_document_segments", {"p_document_id": document_id, "p_segment_count": segment_count}
+        )
+        await self._execute(query)
+
     async def get_documents_for_user(self, user_id: str):
         """
         Retrieves all document records for a given user.
@@ -192,19 +238,21 @@ class SupabaseAdapter:
         user_id: str,
         user_message: str,
         bot_response: str,
+        response_time_ms: int | None = None,
     ):
         """
         Logs a conversation to the 'conversations' table in Supabase.
         """
         try:
-            query = self.client.table("conversations").insert(
-                {
-                    "agent_id": agent_id,
-                    "user_id": user_id,
-                    "user_message": user_message,
-                    "bot_response": bot_response,
-                }
-            )
+            row = {
+                "agent_id": agent_id,
+                "user_id": user_id,
+                "user_message": user_message,
+                "bot_response": bot_response,
+            }
+            if response_time_ms is not None:
+                row["response_time_ms"] = response_time_ms
+            query = self.client.table("conversations").insert(row)
             data = await self._execute(query)
             return data
         except Exception as e:
@@ -212,19 +260,172 @@ class SupabaseAdapter:
             return None
 
     async def find_relevant_chunks(
-        self, user_id: str, query_embedding: list[float], match_threshold: float = 0.5, match_count: int = 5
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        match_threshold: float = 0.5,
+        match_count: int = 5,
+        search_mode: str | None = None,
+        oversample: int | None = None,
+        agent_id: str | None = None,
+        ef_search: int | None = None,
+        query_text: str | None = None,
     ):
         """
         Performs a similarity search on the 'document_chunks' table for a specific user.
+        `search_mode` overrides RAG_SEARCH_MODE for this call. In exact mode, which
+        embedding column is searched depends on EMBEDDING_MIGRATION_MODE.
+        `agent_id` and `ef_search` apply to the v2 full-vector RPC.
+        Hybrid mode also needs the raw `query_text` for the full-text side.
+        """
+        search_mode = search_mode or RAG_SEARCH_MODE
+        if search_mode == "hybrid":
+            if query_text and len(query_embedding) == FULL_EMBEDDING_DIMENSIONS:
+                params = {"p_agent_id": agent_id, "ef_search": ef_search or HNSW_EF_SEARCH}
+                return await self._match_chunks(
+                    "match_document_chunks_hybrid", user_id,
+                    query_embedding, match_threshold, match_count,
+                    query_text=query_text,
+                    **{key: value for key, value in params.items() if value is not None},
+                )
+            logger.warning("Hybrid search needs query text and a full query embedding; using exact search.")
+
+        if search_mode == "quantized":
+            # The rerank needs the full vector; reduced-only queries fall through.
+            if len(query_embedding) == FULL_EMBEDDING_DIMENSIONS:
+                return await self._match_chunks(
+                    "match_document_chunks_quantized", user_id,
+                    query_embedding, match_threshold, match_count,
+                    oversample=oversample or QUANTIZED_OVERSAMPLE,
+                )
+            logger.warning("Quantized search needs a full query embedding; using exact search.")
+
+        if EMBEDDING_MIGRATION_MODE == "reduced":
+            return await self._match_chunks(
+                "match_document_chunks_reduced", user_id,
+                reduce_embedding(query_embedding), match_threshold, match_count,
+            )
+
+        if EMBEDDING_MIGRATION_MODE == "dual_read":
+            full, reduced = await asyncio.gather(
+                self._match_full(
+                    user_id, query_embedding, match_threshold, match_count,
+                    agent_id, ef_search,
+                ),
+                self._match_chunks(
+                    "match_document_chunks_reduced", user_id,
+                    reduce_embedding(query_embedding), match_threshold, match_count,
+                ),
+            )
+            if full:
+                full_ids = {chunk["id"] for chunk in full}
+                overlap = len(full_ids & {chunk["id"] for chunk in reduced})
+                logger.info(
+                    "Reduced-embedding recall@%d for user %s: %.2f",
+                    match_count, user_id, overlap / len(full_ids),
+                )
+            return full
+
+        return await self._match_full(
+            user_id, query_embedding, match_threshold, match_count,
+            agent_id, ef_search,
+        )
+
+    def multi_query_supported(self, search_mode: str | None = None) -> bool:
+        """
+        Whether find_relevant_chunks_multi can serve `search_mode`. The multi
+        RPC fuses full-vector HNSW and full-text rankings, i.e. hybrid search
+        on 3072-dim embeddings through the v2 index.
+        """
+        return (
+            (search_mode or RAG_SEARCH_MODE) == "hybrid"
+            and EMBEDDING_MIGRATION_MODE != "reduced"
+            and RAG_MATCH_RPC_VERSION == "v2"
+        )
+
+    async def find_relevant_chunks_multi(
+        self,
+        user_id: str,
+        query_embeddings: list[list[float]],
+        match_threshold: float = 0.5,
+        match_count: int = 5,
+        query_texts: list[str] | None = None,
+        agent_id: str | None = None,
+        ef_search: int | None = None,
+    ):
         """
+        Searches with several query embeddings in one RPC call. Per-query vector
+        rankings and a full-text ranking over `query_texts` are fused and
+        deduplicated in the database. Without full embeddings, only the first
+        query is searched, through find_relevant_chunks in hybrid mode.
+        """
+        embeddings = [e for e in query_embeddings if len(e) == FULL_EMBEDDING_DIMENSIONS]
+        if len(embeddings) < len(query_embeddings):
+            logger.warning("Multi-query search needs full query embeddings; searching the first query only.")
+            if not query_embeddings:
+                return []
+            return await self.find_relevant_chunks(
+                user_id, query_embeddings[0], match_threshold, match_count,
+                search_mode="hybrid", agent_id=agent_id, ef_search=ef_search,
+                query_text=(query_texts or [None])[0],
+            )
+        params = {"p_agent_id": agent_id, "ef_search": ef_search or HNSW_EF_SEARCH}
+        try:
+            query = self.client.rpc(
+                "match_document_chunks_multi",
+                {
+                    "p_user_id": user_id,
+                    "query_embeddings": embeddings,
+                    "query_text": " ".join(query_texts or []),
+                    "match_threshold": match_threshold,
+                    "match_count": match_count,
+                    **{key: value for key, value in params.items() if value is not None},
+                },
+            )
+            response = await self._execute(query)
+            return response.data
+        except Exception as e:
+            logger.error("Error performing multi-query search in Supabase: %s", e)
+            return []
+
+    async def _match_full(
+        self,
+        user_id: str,
+        query_embedding: list[float],
+        match_threshold: float,
+        match_count: int,
+        agent_id: str | None = None,
+        ef_search: int | None = None,
+    ):
+        """Full-vector match through the RPC version selected by RAG_MATCH_RPC_VERSION."""
+        if RAG_MATCH_RPC_VERSION == "v1":
+            return await self._match_chunks(
+                "match_document_chunks", user_id, query_embedding, match_threshold, match_count
+            )
+        params = {"p_agent_id": agent_id, "ef_search": ef_search or HNSW_EF_SEARCH}
+        return await self._match_chunks(
+            "match_document_chunks_v2", user_id, query_embedding, match_threshold, match_count,
+            **{key: value for key, value in params.items() if value is not None},
+        )
+
+    async def _match_chunks(
+        self,
+        rpc_name: str,
+        user_id: str,
+        query_embedding: list[float],
+        match_threshold: float,
+        match_count: int,
+        **params,
+    ):
         try:
             query = self.client.rpc(
-                "match_document_chunks",
+                rpc_name,
                 {
                     "p_user_id": user_id,
                     "query_embedding": query_embedding,
                     "match_threshold": match_threshold,
                     "match_count": match_count,
+                    **params,
                 },
             )
             response = await self._execute(query)
@@ -233,6 +434,18 @@ class SupabaseAdapter:
             logger.error("Error performing similarity search in Supabase: %s", e)
             return []
 
+    async def backfill_reduced_embeddings(self, batch_size: int = 1000) -> int:
+        """Fills embedding_reduced for one batch of existing chunks. Returns rows updated."""
+        query = self.client.rpc("backfill_reduced_embeddings", {"batch_size": batch_size})
+        response = await self._execute(query)
+        return response.data or 0
+
+    async def backfill_quantized_embeddings(self, batch_size: int = 1000) -> int:
+        """Fills embedding_binary for one batch of existing chunks. Returns rows updated."""
+        query = self.client.rpc("backfill_quantized_embeddings", {"batch_size": batch_size})
+        response = await self._execute(query)
+        return response.data or 0
+
     async def delete_document(self, document_id: str) -> bool:
         """Deletes a document record by id."""
         try:
@@ -245,6 +458,61 @@ class SupabaseAdapter:
 
     # === Billing and Subscription Methods ===
 
+    async def list_plans(self) -> list[dict]:
+        """Lists all available subscription plans."""
+        response = await self._execute(self.client.table("plans").select("*"))
+        return response.data or []
+
+    async def get_rate_limits(self, user_id: str) -> dict | None:
+        """Returns the rate limits of the user's active plan, or None without one."""
+        query = (
+            self.client.table("subscriptions")
+            .select("plans(rate_limit_per_minute, rate_limit_burst, agent_rate_limit_per_minute, agent_rate_limit_burst)")
+            .eq("user_id", user_id)
+            .eq("status", "active")
+            .limit(1)
+        )
+        response = await self._execute(query)
+        if not response.data:
+            return None
+        return response.data[0].get("plans")
+
+    async def get_recently_active_user_ids(self, since: str, limit: int) -> list[str]:
+        """Users with conversations since `since` (ISO timestamp), most recent first."""
+        query = (
+            self.client.table("conversations")
+            .select("user_id")
+            .gte("created_at", since)
+            .order("created_at", desc=True)
+            .limit(limit * 20)
+        )
+        response = await self._execute(query)
+        return list(dict.fromkeys(row["user_id"] for row in response.data or []))[:limit]
+
+    async def get_plan_tier(self, user_id: str) -> str | None:
+        """Returns the plan ID of the user's active subscription, or None without one."""
+        query = (
+            self.client.table("subscriptions")
+            .select("plan_id")
+            .eq("user_id", user_id)
+            .eq("status", "active")
+            .limit(1)
+        )
+        response = await self._execute(query)
+        return response.data[0]["plan_id"] if response.data else None
+
+    async def sync_rate_limit_usage(
+        self, instance_id: str, consumed: dict[str, int]
+    ) -> dict[tuple[str, str], int]:
+        """
+        Adds this instance's consumed tokens per bucket to the shared counters
+        and returns the counters of the other instances, keyed by
+        (bucket, instance).
+        """
+        query = self.client.rpc("sync_rate_limit_usage", {"p_instance_id": instance_id, "p_consumed": consumed})
+        response = await self._execute(query)
+        return {(row["bucket_key"], row["instance_id"]): row["consumed"] for row in response.data or []}
+
     async def get_stripe_customer_id(self, user_id: str) -> str | None:
         """Retrieves the Stripe customer ID for a given user."""
         try:
@@ -273,11 +541,29 @@ class SupabaseAdapter:
         except Exception:
             return None
 
-    async def create_subscription(self, user_id: str, plan_id: str, status: str, stripe_subscription_id: str, stripe_customer_id: str, current_period_start: str, current_period_end: str, cancel_at_period_end: bool):
-        """Creates or updates a subscription record for a user."""
+    async def create_subscription(self, user_id: str, plan_id: str, status: str, stripe_subscription_id: str, stripe_customer_id: str, current_period_start: str, current_period_end: str, cancel_at_period_end: bool, event_created: int | None = None):
+        """
+        Creates or updates a subscription record for a user. With the Stripe
+        `event_created`, a subscription already updated by a newer event is
+        left as is.
+        """
         try:
+            if event_created is not None:
+                query = self.client.rpc("upsert_checkout_subscription", {
+                    "p_user_id": user_id,
+                    "p_plan_id": plan_id,
+                    "p_status": status,
+                    "p_stripe_subscription_id": stripe_subscription_id,
+                    "p_stripe_customer_id": stripe_customer_id,
+                    "p_current_period_start": current_period_start,
+                    "p_current_period_end": current_period_end,
+                    "p_cancel_at_period_end": cancel_at_period_end,
+                    "p_event_created": event_created,
+                })
+                response = await self._execute(query)
+                return response.data[0] if response.data else None
             # Upsert logic: update if subscription exists, otherwise insert.
-            query = self.client.table("subscriptions").upsert({
+            row = {
                 "user_id": user_id,
                 "plan_id": plan_id,
                 "status": status,
@@ -286,7 +572,8 @@ class SupabaseAdapter:
                 "current_period_start": current_period_start,
                 "current_period_end": current_period_end,
                 "cancel_at_period_end": cancel_at_period_end,
-            }, on_conflict="stripe_subscription_id")
+            }
+            query = self.client.table("subscriptions").upsert(row, on_conflict="stripe_subscription_id")
             response = await self._execute(query)
             return response.data[0] if response.data else None
         except Exception as e:
@@ -312,72 +599,191 @@ class SupabaseAdapter:
             logger.error(f"Error updating subscription {stripe_subscription_id}: {e}")
             return None
 
-    async def get_quality_metrics(self, user_id: str):
-        """Fetch quality metrics for a user."""
-        try:
-            query = (
-                self.client.table("quality_metrics")
-                .select("conversations_reviewed, avg_response_time_sec, csat")
-                .eq("user_id", user_id)
-                .limit(1)
-                .single()
-            )
-            response = await self._execute(query)
-            data = response.data or {}
-        except Exception as e:
-            logger.error("Error fetching quality metrics for user %s: %s", user_id, e)
-            data = {}
-        return {
+    async def apply_subscription_event(
+        self,
+        stripe_subscription_id: str,
+        new_status: str,
+        cancel_at_period_end: bool,
+        current_period_start: str | None,
+        current_period_end: str | None,
+        event_created: int,
+    ) -> str:
+        """
+        Applies a subscription event unless a newer one was already applied.
+        Returns 'applied', 'stale' or 'missing'; database errors propagate.
+        """
+        query = self.client.rpc("apply_subscription_event", {
+            "p_stripe_subscription_id": stripe_subscription_id,
+            "p_status": new_status,
+            "p_cancel_at_period_end": cancel_at_period_end,
+            "p_current_period_start": current_period_start,
+            "p_current_period_end": current_period_end,
+            "p_event_created": event_created,
+        })
+        response = await self._execute(query)
+        return response.data
+
+    # === Stripe webhook events ===
+
+    async def record_stripe_event(self, event: dict, ordering_key: str) -> bool:
+        """
+        Stores a verified webhook event keyed by its Stripe ID.
+        Returns False if the event was already stored (a Stripe retry).
+        """
+        query = self.client.table("stripe_webhook_events").upsert(
+            {
+                "id": event["id"],
+                "type": event["type"],
+                "ordering_key": ordering_key,
+                "stripe_created": event["created"],
+                "payload": event,
+            },
+            on_conflict="id",
+            ignore_duplicates=True,
+        )
+        response = await self._execute(query)
+        return bool(response.data)
+
+    async def mark_stripe_event(self, event_id: str, status: str, attempts: int, error: str | None = None):
+        """Records the outcome of processing a webhook event."""
+        update = {"status": status, "attempts": attempts, "last_error": error}
+        if status == "processed":
+            update["processed_at"] = datetime.now(timezone.utc).isoformat()
+        query = self.client.table("stripe_webhook_events").update(update).eq("id", event_id)
+        await self._execute(query)
+
+    async def get_unprocessed_stripe_events(self, received_before: str, limit: int = 100) -> list[dict]:
+        """Events not yet processed, oldest first, received before the given ISO timestamp."""
+        query = (
+            self.client.table("stripe_webhook_events")
+            .select("id, attempts, payload")
+            .neq("status", "processed")
+            .lt("received_at", received_before)
+            .order("stripe_created")
+            .order("id")
+            .limit(limit)
+        )
+        response = await self._execute(query)
+        return response.data or []
+
+    async def get_quality_metrics(self, user_id: str, agent_id: str | None = None):
+        """
+        Fetch quality metrics for a user, or for one of their agents.
+        Reads a single precomputed rollup row; see rollup_quality_metrics.
+        Without a row yet the metrics are zero; database errors propagate.
+        """
+        table = "quality_metrics_agent" if agent_id else "quality_metrics"
+        count_column = "conversations_count" if agent_id else "conversations_reviewed"
+        query = (
+            self.client.table(table)
+            .select(f"{count_column}, avg_response_time_sec, csat, response_time_histogram")
+            .eq("user_id", user_id)
+        )
+        if agent_id:
+            query = query.eq("agent_id", agent_id)
+        response = await self._execute(query.limit(1))
+        data = response.data[0] if response.data else {}
+        histogram = data.get("response_time_histogram") or [0] * (len(RESPONSE_TIME_BUCKETS_MS) + 1)
+        metrics = {
             "user_id": user_id,
-            "conversations_reviewed": data.get("conversations_reviewed", 0),
+            "conversations_reviewed": data.get(count_column, 0),
             "avg_response_time_sec": data.get("avg_response_time_sec", 0),
             "csat": data.get("csat", 0.0),
+            "response_time_buckets": [
+                {"le_ms": bound, "count": count}
+                for bound, count in zip([*RESPONSE_TIME_BUCKETS_MS, None], histogram)
+            ],
         }
+        if agent_id:
+            metrics["agent_id"] = agent_id
+        return metrics
+
+    async def rollup_quality_metrics(self, batch_size: int = 5000, settle_seconds: int = 60) -> int:
+        """Folds one batch of new conversations into the quality rollups. Returns rows folded."""
+        query = self.client.rpc(
+            "rollup_quality_metrics",
+            {"batch_size": batch_size, "settle_interval": f"{settle_seconds} seconds"},
+        )
+        response = await self._execute(query)
+        return response.data or 0
+
+    # === Reports (keyset-paginated) ===
+
+    async def fetch_page(
+        self,
+        table: str,
+        filters: dict,
+        limit: int = 100,
+        cursor: tuple[str, str] | None = None,
+        columns: list[str] | None = None,
+    ) -> tuple[list[dict], str | None]:
+        """
+        Fetches one page of `table` ordered by (created_at, id) descending.
+        Returns the rows and the cursor for the next page (None on the last page).
+        """
+        query = (
+            self.client.table(table)
+            .select(", ".join(columns) if columns else "*")
+        )
+        for column, value in filters.items():
+            query = query.eq(column, value)
+        if cursor:
+            query = query.or_(keyset_filter(cursor))
+        # One extra row tells us whether another page exists.
+        query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+
+        response = await self._execute(query)
+        rows = response.data or []
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    async def iter_rows(
+        self,
+        table: str,
+        filters: dict,
+        columns: list[str] | None = None,
+        page_size: int = 500,
+    ) -> AsyncIterator[dict]:
+        """Yields every matching row, fetching pages lazily so memory stays bounded."""
+        cursor = None
+        while True:
+            rows, next_cursor = await self.fetch_page(table, filters, page_size, cursor, columns)
+            for row in rows:
+                yield row
+            if not next_cursor:
+                return
+            cursor = (rows[-1]["created_at"], str(rows[-1]["id"]))
+
+    async def _get_report_page(self, table: str, user_id: str, limit, cursor, columns):
+        # Errors propagate: an empty page would be cached as if it were real.
+        return await self.fetch_page(table, {"user_id": user_id}, limit, cursor, columns)
+
+    async def get_opportunity_briefs(
+        self, user_id: str, limit: int = 100, cursor: tuple[str, str] | None = None, columns: list[str] | None = None
+    ):
+        """Fetch a page of opportunity briefs for a user."""
+        data, next_cursor = await self._get_report_page("opportunity_briefs", user_id, limit, cursor, columns)
+        return {"user_id": user_id, "opportunities": data, "next_cursor": next_cursor}
+
+    async def insert_performance_logs(self, rows: list[dict]) -> int:
+        """Writes a batch of per-turn timing rows in a single insert."""
+        query = self.client.table("performance_logs").insert(rows, returning="minimal")
+        await self._execute(query)
+        return len(rows)
+
+    async def get_performance_log(
+        self, user_id: str, limit: int = 100, cursor: tuple[str, str] | None = None, columns: list[str] | None = None
+    ):
+        """Fetch a page of performance logs for a user."""
+        data, next_cursor = await self._get_report_page("performance_logs", user_id, limit, cursor, columns)
+        return {"user_id": user_id, "logs": data, "next_cursor": next_cursor}
 
-    async def get_opportunity_briefs(self, user_id: str):
-        """Fetch opportunity briefs for a user."""
-        try:
-            query = (
-                self.client.table("opportunity_briefs")
-                .select("*")
-                .eq("user_id", user_id)
-            )
-            response = await self._execute(query)
-            data = response.data or []
-        except Exception as e:
-            logger.error("Error fetching opportunity briefs for user %s: %s", user_id, e)
-            data = []
-        return {"user_id": user_id, "opportunities": data}
-
-    async def get_performance_log(self, user_id: str):
-        """Fetch performance logs for a user."""
-        try:
-            query = (
-                self.client.table("performance_logs")
-                .select("*")
-                .eq("user_id", user_id)
-            )
-            response = await self._execute(query)
-            data = response.data or []
-        except Exception as e:
-            logger.error("Error fetching performance log for user %s: %s", user_id, e)
-            data = []
-        return {"user_id": user_id, "logs": data}
-
-    async def get_executive_summaries(self, user_id: str):
-        """Fetch executive summaries for a user."""
-        try:
-            query = (
-                self.client.table("executive_summaries")
-                .select("*")
-                .eq("user_id", user_id)
-            )
-            response = await self._execute(query)
-            data = response.data or []
-        except Exception as e:
-            logger.error("Error fetching executive summaries for user %s: %s", user_id, e)
-            data = []
-        return {"user_id": user_id, "summaries": data}
+    async def get_executive_summaries(
+        self, user_id: str, limit: int = 100, cursor: tuple[str, str] | None = None, columns: list[str] | None = None
+    ):
+        """Fetch a page of executive summaries for a user."""
+        data, next_cursor = await self._get_report_page("executive_summaries", user_id, limit, cursor, columns)
+        return {"user_id": user_id, "summaries": data, "next_cursor": next_cursor}
 
     # === Usage and Quota Methods ===
 
@@ -414,6 +820,112 @@ class SupabaseAdapter:
             logger.error(f"RPC error decrementing credits for user {user_id}: {e}")
             return False
 
+    # === Message outbox ===
+
+    async def enqueue_message(self, user_id: str, payload: dict) -> bool:
+        """
+        Debits one message credit and stores the message in the outbox in a
+        single transaction. Returns False, storing nothing, when the user has
+        no credits left or no active subscription. Raises on RPC errors.
+        """
+        query = self.client.rpc("enqueue_message", {"p_user_id": user_id, "p_payload": payload})
+        result = await self._execute(query)
+        return bool(result.data and result.data[0].get("success"))
+
+    async def enqueue_messages(self, payloads: list[dict]) -> list[bool]:
+        """
+        Batch counterpart of `enqueue_message` for payloads carrying a
+        `userId`. Each user's messages are accepted in order while their
+        credits last; returns whether each payload was accepted.
+        """
+        messages = [{"user_id": payload["userId"], "payload": payload} for payload in payloads]
+        query = self.client.rpc("enqueue_messages_batch", {"p_messages": messages})
+        result = await self._execute(query)
+        accepted = {row["message_index"]: row["accepted"] for row in result.data or []}
+        return [bool(accepted.get(index)) for index in range(len(payloads))]
+
+    async def claim_outbox_messages(self, limit: int, lease_seconds: int) -> list[dict]:
+        """Leases up to `limit` outbox rows for publishing."""
+        query = self.client.rpc("claim_outbox_messages", {"p_limit": limit, "p_lease_seconds": lease_seconds})
+        result = await self._execute(query)
+        return result.data or []
+
+    async def reschedule_outbox_messages(self, ids: list[int], delay_seconds: float, error: str):
+        """Makes outbox rows publishable again after `delay_seconds`."""
+        available_at = (datetime.now(timezone.utc) + timedelta(seconds=delay_seconds)).isoformat()
+        query = (
+            self.client.table("message_outbox")
+            .update({"available_at": available_at, "last_error": error})
+            .in_("id", ids)
+        )
+        await self._execute(query)
+
+    async def delete_outbox_messages(self, ids: list[int]):
+        query = self.client.table("message_outbox").delete().in_("id", ids)
+        await self._execute(query)
+
+    # === Ingest idempotency ===
+
+    async def claim_ingest_requests(self, message_ids: list[str], lease_seconds: float) -> dict[str, dict]:
+        """
+        Claims gateway message IDs for processing. Returns the existing record
+        of every ID that was seen before; IDs missing from the result were
+        claimed by this call, including claims left unsettled for longer
+        than the lease.
+        """
+        query = self.client.rpc(
+            "claim_ingest_requests", {"p_message_ids": message_ids, "p_lease": f"{lease_seconds} seconds"}
+        )
+        response = await self._execute(query)
+        claimed = set(response.data or [])
+        seen = [message_id for message_id in message_ids if message_id not in claimed]
+        if not seen:
+            return {}
+        query = (
+            self.client.table("ingest_requests")
+            .select("message_id, status, response_status, response_body")
+            .in_("message_id", seen)
+        )
+        response = await self._execute(query)
+        existing = {row["message_id"]: row for row in response.data or []}
+        # A row can vanish if its claim was released in between; report it as in flight.
+        return {message_id: existing.get(message_id, {"status": "processing"}) for message_id in seen}
+
+    async def complete_ingest_requests(self, responses: dict[str, tuple[int, dict]]):
+        """Stores the (status_code, body) sent for each claimed message ID."""
+        rows = [
+            {"message_id": message_id, "status": "completed", "response_status": status_code, "response_body": body}
+            for message_id, (status_code, body) in responses.items()
+        ]
+        query = self.client.table("ingest_requests").upsert(rows, on_conflict="message_id")
+        await self._execute(query)
+
+    async def release_ingest_requests(self, message_ids: list[str]):
+        """Drops claims so that retries of these messages are processed again."""
+        query = self.client.table("ingest_requests").delete().in_("message_id", message_ids)
+        await self._execute(query)
+
+    async def claim_chat_turn(self, message_id: str, lease_seconds: float) -> bool:
+        """
+        Claims a queued chat message for answering. False means it was already
+        answered, or is being answered under a claim younger than the lease.
+        """
+        query = self.client.rpc(
+            "claim_chat_turn", {"p_message_id": message_id, "p_lease": f"{lease_seconds} seconds"}
+        )
+        response = await self._execute(query)
+        return bool(response.data)
+
+    async def complete_chat_turn(self, message_id: str):
+        """Marks a claimed chat message as answered, so redeliveries are skipped."""
+        query = self.client.table("chat_turns").update({"status": "completed"}).eq("message_id", message_id)
+        await self._execute(query)
+
+    async def release_chat_turn(self, message_id: str):
+        """Drops a claim so that the retry of this message is answered."""
+        query = self.client.table("chat_turns").delete().eq("message_id", message_id)
+        await self._execute(query)
+
     async def update_user_profile(self, user_id: str, updates: dict) -> bool:
         """Updates a user's profile."""
         try:
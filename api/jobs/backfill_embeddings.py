@@ -0,0 +1,69 @@
+"""
+Backfills derived embedding columns on existing document_chunks rows.
+
+New rows are kept in sync by database triggers; this job only catches up
+rows written before the corresponding migration. It works in small batches
+so it can run against a live database.
+
+Usage (from the api/ directory):
+    python -m jobs.backfill_embeddings --column all --batch-size 1000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+# Derived column -> adapter method that backfills one batch of it.
+BACKFILLS = {
+    "reduced": "backfill_reduced_embeddings",
+    "quantized": "backfill_quantized_embeddings",
+}
+
+
+async def backfill(
+    adapter: SupabaseAdapter, column: str = "reduced", batch_size: int = 1000, pause: float = 0.0
+) -> int:
+    """Runs a backfill RPC until no rows are left. Returns the total rows updated."""
+    run_batch = getattr(adapter, BACKFILLS[column])
+    total = 0
+    started = time.monotonic()
+    while True:
+        updated = await run_batch(batch_size)
+        if not updated:
+            break
+        total += updated
+        logger.info(
+            "Backfilled %d %s embeddings (%d total, %.0f rows/s).",
+            updated, column, total, total / max(time.monotonic() - started, 1e-9),
+        )
+        if pause:
+            await asyncio.sleep(pause)
+    logger.info("%s embedding backfill complete: %d rows.", column.capitalize(), total)
+    return total
+
+
+async def backfill_all(adapter: SupabaseAdapter, columns: list[str], batch_size: int, pause: float):
+    for column in columns:
+        await backfill(adapter, column, batch_size, pause)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--column", choices=[*BACKFILLS, "all"], default="all")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    columns = list(BACKFILLS) if args.column == "all" else [args.column]
+    asyncio.run(backfill_all(SupabaseAdapter(), columns, args.batch_size, args.pause))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Runs the chat pipeline: consumes ingested WhatsApp messages from the queue
+and answers them with ProcessChatMessage. Run as many instances as needed;
+each leases its own messages.
+
+Usage (from the api/ directory, with the usual API environment variables):
+    python -m jobs.chat_consumer --concurrency 16 --metrics-port 9102
+
+Text messages are read from the chat queue (CLOUDFLARE_CHAT_QUEUE_ID), which
+must have an HTTP pull consumer; audio stays on the transcription queue. With
+--local, the consumer instead runs its own outbox relay, sending text into an
+in-memory queue, for development against a single API (started with
+OUTBOX_RELAY_ENABLED=false).
+
+SIGTERM and SIGINT stop pulling, finish the messages in progress and exit;
+unfinished messages are delivered again once their lease runs out.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from prometheus_client import start_http_server
+
+from core.use_cases.process_chat_message import ProcessChatMessage
+from dependencies import (
+    ai_router,
+    chat_queue_adapter,
+    cloudflare_queue_adapter,
+    performance_log_writer,
+    supabase_adapter,
+    transport_manager,
+)
+from infrastructure.chat_consumer import CONSUMER_CONCURRENCY, ChatConsumer, CloudflarePullBackend, LocalQueue
+from infrastructure.outbox_relay import OutboxRelay, route_by_media
+
+
+logger = logging.getLogger(__name__)
+
+
+async def run(concurrency: int, local: bool):
+    use_case = ProcessChatMessage(
+        router=ai_router, db_adapter=supabase_adapter, performance_log=performance_log_writer
+    )
+    relay = None
+    if local:
+        backend = LocalQueue()
+        relay = OutboxRelay(supabase_adapter, route_by_media(cloudflare_queue_adapter.publish_messages, backend.publish))
+        relay.start()
+    else:
+        backend = CloudflarePullBackend(chat_queue_adapter)
+    consumer = ChatConsumer(
+        backend,
+        use_case,
+        supabase_adapter,
+        cloudflare_queue_adapter.publish_messages,
+        concurrency=concurrency,
+    )
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, consumer.stop)
+
+    logger.info(f"Chat consumer started ({'local queue' if local else 'Cloudflare queue'}, concurrency {concurrency}).")
+    try:
+        await consumer.run()
+    finally:
+        if relay is not None:
+            await relay.stop()
+        await performance_log_writer.flush()
+        await transport_manager.aclose()
+    logger.info("Chat consumer stopped.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=CONSUMER_CONCURRENCY, help="Messages processed at once")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--local", action="store_true", help="Use an in-memory queue fed from the outbox")
+    args = parser.parse_args()
+    if not args.local and chat_queue_adapter is None:
+        parser.error("CLOUDFLARE_CHAT_QUEUE_ID must be set (or use --local)")
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    asyncio.run(run(args.concurrency, args.local))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Replays Stripe webhook events that were stored but never applied.
+
+The webhook acknowledges an event as soon as it is stored and applies it in
+the background. If that processing gave up, or the process stopped before it
+finished, the event stays unprocessed in stripe_webhook_events. This job
+applies those events again, oldest first and in order per subscription.
+
+Usage (from the api/ directory):
+    python -m jobs.replay_stripe_events --min-age 300 --limit 500
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from core.config import get_settings
+from core.use_cases.apply_stripe_event import ApplyStripeEvent, ordering_key
+from infrastructure.stripe_event_processor import StripeEventProcessor
+from infrastructure.stripe_gateway import StripeGateway
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+async def replay(adapter: SupabaseAdapter, processor: StripeEventProcessor, min_age: float = 300, limit: int = 500) -> int:
+    """
+    Applies unprocessed events received more than `min_age` seconds ago, so
+    events still being handled by a webhook instance are left alone.
+    Returns the number of events applied.
+    """
+    received_before = (datetime.now(timezone.utc) - timedelta(seconds=min_age)).isoformat()
+    rows = await adapter.get_unprocessed_stripe_events(received_before, limit)
+    tasks = [
+        processor.submit(row["payload"], ordering_key(row["payload"]), row["attempts"])
+        for row in rows
+    ]
+    results = await asyncio.gather(*tasks)
+    applied = sum(1 for result in results if result)
+    logger.info("Replayed %d of %d unprocessed Stripe events.", applied, len(rows))
+    return applied
+
+
+async def run(min_age: float, limit: int):
+    adapter = SupabaseAdapter()
+    gateway = StripeGateway(api_key=get_settings().stripe_api_key)
+    processor = StripeEventProcessor(ApplyStripeEvent(adapter, gateway).execute, adapter)
+    try:
+        await replay(adapter, processor, min_age, limit)
+    finally:
+        await gateway.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-age", type=float, default=300, help="Only replay events older than this, in seconds")
+    parser.add_argument("--limit", type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(run(args.min_age, args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Folds new conversations into the quality_metrics rollups.
+
+Each run resumes from the watermark stored in rollup_watermarks and only
+reads conversations created after it, so the cost of a run is proportional
+to the new turns, never to the size of the conversations table. Schedule it
+as often as metrics should refresh (e.g. every minute).
+
+Usage (from the api/ directory):
+    python -m jobs.rollup_quality_metrics --batch-size 5000
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+
+logger = logging.getLogger(__name__)
+
+
+async def rollup(
+    adapter: SupabaseAdapter, batch_size: int = 5000, settle_seconds: int = 60, pause: float = 0.0
+) -> int:
+    """Runs the rollup RPC until it catches up with the watermark. Returns the total rows folded."""
+    total = 0
+    started = time.monotonic()
+    while True:
+        folded = await adapter.rollup_quality_metrics(batch_size, settle_seconds)
+        total += folded
+        if folded:
+            logger.info(
+                "Folded %d conversations into quality metrics (%d total, %.0f rows/s).",
+                folded, total, total / max(time.monotonic() - started, 1e-9),
+            )
+        if folded < batch_size:
+            break
+        if pause:
+            await asyncio.sleep(pause)
+    logger.info("Quality metrics rollup complete: %d rows.", total)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument(
+        "--settle-seconds", type=int, default=60,
+        help="Leave conversations younger than this for the next run",
+    )
+    parser.add_argument("--pause", type=float, default=0.0, help="Seconds to sleep between batches")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(rollup(SupabaseAdapter(), args.batch_size, args.settle_seconds, args.pause))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from fastapi import FastAPI
+
+from core.http_cache import PUBLIC_CACHE_TTL_SECONDS, PUBLIC_SCOPE, prime
+from dependencies import (
+    admission_controller,
+    llm_scheduler,
+    outbox_relay,
+    pdf_extractor,
+    performance_log_writer,
+    response_cache,
+    stripe_event_processor,
+    stripe_gateway,
+    supabase_adapter,
+    transport_manager,
+)
+from infrastructure.outbox_relay import OUTBOX_RELAY_ENABLED
+
+
+logger = logging.getLogger(__name__)
+
+# Off in tests, which must not open outbound connections at startup.
+STARTUP_WARM_UP = os.getenv("STARTUP_WARM_UP", "true").lower() == "true"
+# Warm-up is best effort: past this, the instance reports ready regardless.
+STARTUP_WARM_UP_TIMEOUT_SECONDS = float(os.getenv("STARTUP_WARM_UP_TIMEOUT_SECONDS", "10"))
+# Users whose plan limits and tier are loaded at startup: those with the most
+# recent conversations in the last day.
+WARM_UP_ACTIVE_USERS = int(os.getenv("WARM_UP_ACTIVE_USERS", "200"))
+# Time allowed to drain background work on shutdown. Keep it below the
+# platform's grace period (e.g. the SIGTERM-to-SIGKILL delay).
+SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("SHUTDOWN_TIMEOUT_SECONDS", "25"))
+
+PLANS_PATH = "/api/v1/plans"
+
+STARTING, READY, DRAINING = "starting", "ready", "draining"
+
+
+async def _prime_plans():
+    # Also the first round trip to Supabase, which opens its connection.
+    plans = await supabase_adapter.list_plans()
+    prime(response_cache, PUBLIC_SCOPE, PLANS_PATH, plans, PUBLIC_CACHE_TTL_SECONDS)
+
+
+async def _prime_active_users():
+    since = (datetime.now(timezone.utc) - timedelta(days=1)).isoformat()
+    user_ids = await supabase_adapter.get_recently_active_user_ids(since, WARM_UP_ACTIVE_USERS)
+    await asyncio.gather(admission_controller.prime(user_ids), llm_scheduler.prime(user_ids))
+
+
+async def warm_up(timeout: float = STARTUP_WARM_UP_TIMEOUT_SECONDS):
+    """
+    Opens connections to every upstream and loads the data the first requests
+    need. Each step fails on its own; failures are logged and left to the
+    first request that needs them.
+    """
+    steps = {
+        "connections": transport_manager.warm_up(),
+        "plans": _prime_plans(),
+        "active users": _prime_active_users(),
+    }
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*steps.values(), return_exceptions=True), timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"Startup warm-up did not finish within {timeout}s; continuing.")
+        return
+    for name, result in zip(steps, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Startup warm-up of {name} failed: {result}")
+
+
+async def drain(timeout: float = SHUTDOWN_TIMEOUT_SECONDS):
+    """
+    Finishes background work within `timeout`: publishes what is left in the
+    outbox, applies pending Stripe events and writes buffered logs. Clients
+    and worker processes are closed afterwards in any case.
+    """
+
+    async def finish_work():
+        await admission_controller.stop()
+        if OUTBOX_RELAY_ENABLED:
+            await outbox_relay.stop()
+        await stripe_event_processor.drain()
+        await performance_log_writer.flush()
+
+    try:
+        await asyncio.wait_for(finish_work(), timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Shutdown drain did not finish within {timeout}s; pending work is left for other instances.")
+    except Exception as e:
+        logger.error(f"Error draining background work on shutdown: {e}")
+
+    results = await asyncio.gather(
+        stripe_gateway.aclose(),
+        transport_manager.aclose(),
+        asyncio.to_thread(pdf_extractor.shutdown),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"Error closing resources on shutdown: {result}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Runs the process: warms up, starts the background workers and reports
+    ready; on shutdown, reports draining and drains within the deadline.
+    `app.state.runtime_status` backs the readiness probe.
+    """
+    app.state.runtime_status = STARTING
+    if STARTUP_WARM_UP:
+        await warm_up()
+    # The relay publishes what ingest writes to the outbox.
+    if OUTBOX_RELAY_ENABLED:
+        outbox_relay.start()
+    # Syncs rate limit buckets across instances, when configured.
+    admission_controller.start()
+    app.state.runtime_status = READY
+    yield
+    app.state.runtime_status = DRAINING
+    await drain()
@@ -1,9 +1,12 @@
+import math
+import time
 import logging
 
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from prometheus_fastapi_instrumentator import Instrumentator
 
 # === Imports del proyecto ===
 from v1 import (
@@ -15,8 +18,19 @@ from v1 import (
     reports,
     admin,
 )
-from core.config import get_settings
-from dependencies import supabase_adapter, ai_router, cloudflare_queue_adapter
+from core.admission import RATE_LIMIT_ENABLED, AdmissionMiddleware, throttled_response
+from core.compression import CompressionMiddleware
+from core.config import METRICS_TOKEN, get_settings
+from dependencies import (
+    supabase_adapter,
+    ai_router,
+    admission_controller,
+    ingest_deduplicator,
+    outbox_relay,
+    rate_limit_identity,
+    require_metrics_token,
+)
+from lifecycle import READY, lifespan
 
 # --------------------------
 #      Configuración
@@ -26,6 +40,9 @@ from logtail import LogtailHandler
 
 settings = get_settings()
 
+# Máximo de mensajes por llamada al endpoint por lotes (Cloudflare Queues acepta 100 por publicación).
+INGEST_BATCH_MAX_MESSAGES = int(os.getenv("INGEST_BATCH_MAX_MESSAGES", "100"))
+
 # --- Logging Configuration ---
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -63,6 +80,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     openapi_url="/openapi.json",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # --------------------------
@@ -79,7 +98,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
     logger.warning(f"Validation error: {error_messages}")
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={"detail": "Validation failed", "errors": error_messages},
     )
@@ -88,7 +107,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 async def generic_exception_handler(request: Request, exc: Exception):
     """Captura todas las excepciones no controladas para dar una respuesta genérica."""
     logger.error(f"Unhandled exception for {request.method} {request.url}: {exc}", exc_info=True)
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"detail": "An unexpected internal server error occurred."},
     )
@@ -109,6 +128,13 @@ allowed_origins = [o.strip() for o in settings.frontend_origins.split(",") if o.
 if not allowed_origins:
     raise RuntimeError("FRONTEND_ORIGINS environment variable must be set")
 
+# Compresión gzip/brotli negociada para respuestas grandes (listados, reportes, exports)
+app.add_middleware(CompressionMiddleware)
+
+# Rate limiting por tenant según su plan (las respuestas 429 conservan las cabeceras CORS)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(AdmissionMiddleware, controller=admission_controller, identify=rate_limit_identity)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
@@ -125,12 +151,8 @@ logger.info("🤖 Main API starting...")
 app.state.supabase_adapter = supabase_adapter
 app.state.ai_router = ai_router
 
-# Instanciar casos de uso
-# La lógica de process_chat_message ya no se ejecuta directamente en la API.
-# Se activará en los workers después de la transcripción y el embedding.
-# process_chat_message_use_case = ProcessChatMessage(
-#     router=ai_router, db_adapter=supabase_adapter
-# )
+# La lógica de process_chat_message no se ejecuta en la API: la ejecuta el
+# consumidor de la cola (python -m jobs.chat_consumer), que escala por separado.
 
 
 # --------------------------
@@ -142,41 +164,178 @@ async def handle_whatsapp_message(request: Request):
     Este endpoint recibe los mensajes del gateway de WhatsApp,
     valida el payload, comprueba la cuota de créditos y lo encola
     para el worker de transcripción.
+
+    El gateway reintenta los envíos que expiran; un mensaje con un `messageId`
+    ya procesado recibe la respuesta original sin volver a cobrarse ni encolarse.
     """
+    received = time.perf_counter()
     message_payload = await request.json()
     logger.info(f"Received message from WhatsApp Gateway: {message_payload}")
 
     user_id = message_payload.get("userId")
     if not user_id:
         logger.warning("Message payload missing 'userId'.")
-        return JSONResponse(status_code=400, content={"detail": "Missing 'userId' in payload"})
+        return ORJSONResponse(status_code=400, content={"detail": "Missing 'userId' in payload"})
+
+    # Control de admisión por usuario y agente, antes de gastar base de datos o LLM.
+    retry_after = await admission_controller.admit(user_id, message_payload.get("agentId"), source="ingest")
+    if retry_after > 0:
+        logger.warning(f"Rate limit exceeded for user {user_id}; retry after {retry_after:.1f}s.")
+        return throttled_response(retry_after)
+
+    # Mensajes de gateways antiguos sin `messageId` se procesan sin deduplicar.
+    message_id = message_payload.get("messageId")
+    if not message_id:
+        status_code, content = await _ingest_message(message_payload, received)
+        return ORJSONResponse(status_code=status_code, content=content)
+
+    try:
+        replays = await ingest_deduplicator.claim([message_id])
+    except Exception as e:
+        logger.error(f"Could not claim message {message_id} for user {user_id}: {e}")
+        return ORJSONResponse(status_code=500, content={"detail": "Internal error during deduplication."})
+    if message_id in replays:
+        logger.info(f"Duplicate delivery of message {message_id} for user {user_id}; replaying response.")
+        status_code, content = replays[message_id]
+        return ORJSONResponse(status_code=status_code, content=content)
+
+    status_code, content = await _ingest_message(message_payload, received)
+    await _settle_claims({message_id: (status_code, content)})
+    return ORJSONResponse(status_code=status_code, content=content)
+
+
+@app.post("/api/v1/messages/whatsapp/batch")
+async def handle_whatsapp_batch(request: Request):
+    """
+    Variante por lotes del endpoint anterior: recibe `{"messages": [...]}`,
+    cobra los créditos de todos los usuarios con una sola llamada RPC y encola
+    los mensajes aceptados con una sola publicación. Devuelve, en el mismo
+    orden, el status y el body que el endpoint individual habría respondido
+    para cada mensaje.
+    """
+    received = time.perf_counter()
+    batch = await request.json()
+    messages = batch.get("messages") if isinstance(batch, dict) else None
+    if not isinstance(messages, list) or not messages:
+        return ORJSONResponse(status_code=400, content={"detail": "Payload must contain a non-empty 'messages' list"})
+    if len(messages) > INGEST_BATCH_MAX_MESSAGES:
+        return ORJSONResponse(
+            status_code=413,
+            content={"detail": f"A batch may contain at most {INGEST_BATCH_MAX_MESSAGES} messages"},
+        )
+    logger.info(f"Received a batch of {len(messages)} messages from WhatsApp Gateway.")
+
+    results: list[tuple[int, dict] | None] = [None] * len(messages)
+    pending = []
+    # messageId -> posición de su primera aparición; las repeticiones reciben el mismo resultado.
+    first_seen: dict[str, int] = {}
+    repeats = []
+    for index, message in enumerate(messages):
+        if not isinstance(message, dict) or not message.get("userId"):
+            results[index] = (400, {"detail": "Missing 'userId' in payload"})
+            continue
+        message_id = message.get("messageId")
+        if message_id in first_seen:
+            repeats.append((index, first_seen[message_id]))
+            continue
+        retry_after = await admission_controller.admit(message["userId"], message.get("agentId"), source="ingest")
+        if retry_after > 0:
+            results[index] = (429, {"detail": "Too many requests. Please slow down.", "retryAfter": math.ceil(retry_after)})
+            continue
+        if message_id:
+            first_seen[message_id] = index
+        pending.append(index)
+
+    if first_seen:
+        try:
+            replays = await ingest_deduplicator.claim(list(first_seen))
+        except Exception as e:
+            logger.error(f"Could not claim a batch of {len(first_seen)} messages: {e}")
+            return ORJSONResponse(status_code=500, content={"detail": "Internal error during deduplication."})
+        for message_id, replay in replays.items():
+            results[first_seen[message_id]] = replay
+        pending = [index for index in pending if results[index] is None]
+
+    if pending:
+        outcomes = await _ingest_messages([messages[index] for index in pending], received)
+        for index, outcome in zip(pending, outcomes):
+            results[index] = outcome
+        await _settle_claims({
+            messages[index]["messageId"]: results[index] for index in pending if messages[index].get("messageId")
+        })
+
+    for index, first in repeats:
+        results[index] = results[first]
+
+    return ORJSONResponse(content={
+        "results": [
+            {
+                "messageId": message.get("messageId") if isinstance(message, dict) else None,
+                "statusCode": status_code,
+                "body": content,
+            }
+            for message, (status_code, content) in zip(messages, results)
+        ]
+    })
+
+
+async def _settle_claims(responses: dict[str, tuple[int, dict]]):
+    """Guarda las respuestas de los mensajes reclamados, o los libera si fallaron."""
+    if not responses:
+        return
+    try:
+        await ingest_deduplicator.settle(responses)
+    except Exception as e:
+        logger.error(f"Could not record the outcome of messages {list(responses)}: {e}")
+
+
+async def _ingest_message(message_payload: dict, received: float) -> tuple[int, dict]:
+    """
+    Cobra el crédito del mensaje y lo deja en el outbox en una sola transacción;
+    el relay lo publica en la cola. Devuelve (status_code, body).
+    """
+    user_id = message_payload["userId"]
 
-    # Comprobar y decrementar créditos
     # Nota: Este endpoint no está protegido por JWT, confía en el `userId`
     # enviado por el gateway de WhatsApp. Se asume que el gateway es un servicio de confianza.
+    # Se marca el instante de ingesta para medir la espera en cola del turno.
+    _stamp_ingest(message_payload, received)
     try:
-        # Decrement credits first. If this fails, the message is not queued.
-        success = await supabase_adapter.decrement_message_credits(user_id)
-        if not success:
-            logger.warning(f"Credit check failed for user {user_id}. Quota likely exhausted.")
-            return JSONResponse(
-                status_code=429,
-                content={"detail": "Message credit quota exhausted or user has no active subscription."}
-            )
+        success = await supabase_adapter.enqueue_message(user_id, message_payload)
     except Exception as e:
-        logger.error(f"An unexpected error occurred during credit check for user {user_id}: {e}")
-        return JSONResponse(status_code=500, content={"detail": "Internal error during credit check."})
+        logger.error(f"An unexpected error occurred while enqueuing the message of user {user_id}: {e}")
+        return 500, {"detail": "Internal error during credit check."}
+    if not success:
+        logger.warning(f"Credit check failed for user {user_id}. Quota likely exhausted.")
+        return 429, {"detail": "Message credit quota exhausted or user has no active subscription."}
+
+    outbox_relay.notify()
+    return 202, {"status": "accepted"}
+
 
-    # Si el débito de créditos fue exitoso, encolar el mensaje
+async def _ingest_messages(message_payloads: list[dict], received: float) -> list[tuple[int, dict]]:
+    """Equivalente por lotes de `_ingest_message`, con una sola llamada RPC."""
+    for payload in message_payloads:
+        _stamp_ingest(payload, received)
     try:
-        await cloudflare_queue_adapter.publish_message(message_payload)
+        accepted = await supabase_adapter.enqueue_messages(message_payloads)
     except Exception as e:
-        logger.error(f"Failed to enqueue message for user {user_id} after credit decrement: {e}")
-        # Idealmente, aquí se debería revertir el débito de crédito, pero es complejo.
-        # Por ahora, se registra el error grave. El usuario pierde un crédito.
-        return JSONResponse(status_code=500, content={"detail": "Failed to process message after credit check."})
+        logger.error(f"An unexpected error occurred while enqueuing a batch of {len(message_payloads)} messages: {e}")
+        return [(500, {"detail": "Internal error during credit check."})] * len(message_payloads)
 
-    return JSONResponse(status_code=202, content={"status": "accepted"})
+    if any(accepted):
+        outbox_relay.notify()
+    # Cada usuario recibe tantos mensajes aceptados como créditos le quedaban, en orden de llegada.
+    return [
+        (202, {"status": "accepted"}) if ok
+        else (429, {"detail": "Message credit quota exhausted or user has no active subscription."})
+        for ok in accepted
+    ]
+
+
+def _stamp_ingest(message_payload: dict, received: float):
+    message_payload["ingestMs"] = round((time.perf_counter() - received) * 1000)
+    message_payload["ingestedAt"] = round(time.time() * 1000)
 
 
 # --------------------------
@@ -191,12 +350,36 @@ app.include_router(reports.router, prefix="/api/v1") # Enabled for testing
 app.include_router(admin.router, prefix="/api/v1")
 
 
+# --------------------------
+#   Metrics
+# --------------------------
+# Request metrics plus those registered by the adapters (e.g. stripe_*).
+# Only scrapers presenting METRICS_TOKEN may read them; without a token
+# /metrics is not served.
+instrumentator = Instrumentator().instrument(app)
+if METRICS_TOKEN:
+    instrumentator.expose(app, include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+
+
 # --------------------------
 #   Health Checks
 # --------------------------
 @app.get("/health")
 async def health():
-    return JSONResponse({"status": "ok"})
+    return ORJSONResponse({"status": "ok"})
+
+
+@app.get("/health/ready")
+async def readiness(request: Request):
+    """
+    Readiness: 200 once warm-up finished, 503 while starting or draining, so
+    the load balancer only routes traffic to instances that can serve it.
+    `/health` stays a liveness check.
+    """
+    runtime_status = getattr(request.app.state, "runtime_status", None)
+    if runtime_status == READY:
+        return ORJSONResponse({"status": runtime_status})
+    return ORJSONResponse(status_code=503, content={"status": runtime_status or "starting"})
 
 
 @app.get("/health/deep")
@@ -215,9 +398,9 @@ async def deep_health(request: Request):
         errors.append(f"Database: {e}")
 
     if db_ok:
-        return JSONResponse({"status": "healthy", "database": True})
+        return ORJSONResponse({"status": "healthy", "database": True})
     else:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=503,
             content={"status": "unhealthy", "database": False, "errors": errors},
         )
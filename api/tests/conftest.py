@@ -22,6 +22,23 @@ os.environ.setdefault("CLOUDFLARE_QUEUE_ID", "test_queue_id")
 os.environ.setdefault("STRIPE_API_KEY", "sk_test_1234567890")
 os.environ.setdefault("STRIPE_WEBHOOK_SECRET", "whsec_test_1234567890")
 
+# The outbox relay would poll the (unreachable) test database in the background.
+os.environ.setdefault("OUTBOX_RELAY_ENABLED", "false")
+# Tests send many requests as the same user; rate limiting has its own tests.
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+# No outbound connections are opened at startup in tests.
+os.environ.setdefault("STARTUP_WARM_UP", "false")
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Cached responses must not leak from one test into another."""
+    from dependencies import ingest_deduplicator, response_cache
+
+    response_cache.clear()
+    ingest_deduplicator.clear()
+    yield
+
 
 @pytest.fixture(scope="module")
 def client():
@@ -0,0 +1,71 @@
+import gzip
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from main import app
+from dependencies import get_supabase_adapter, require_admin_role
+from core.pagination import decode_cursor
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+CONVERSATIONS = [
+    {
+        "id": f"00000000-0000-4000-8000-00000000000{i}",
+        "user_id": "00000000-0000-4000-8000-0000000000aa",
+        "agent_id": "00000000-0000-4000-8000-0000000000bb",
+        "created_at": f"2025-01-0{9 - i}T00:00:00+00:00",
+        "ended_at": None,
+    }
+    for i in range(3)
+]
+
+
+@pytest.fixture
+def adapter():
+    adapter = SupabaseAdapter.__new__(SupabaseAdapter)
+    adapter.client = MagicMock()
+    adapter._execute = AsyncMock()
+    return adapter
+
+
+@pytest.fixture
+def api(client, adapter):
+    app.dependency_overrides[require_admin_role] = lambda: None
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    yield client
+    app.dependency_overrides = {}
+
+
+def test_list_conversations_is_keyset_paginated(api, adapter):
+    adapter._execute.return_value = MagicMock(data=CONVERSATIONS)
+
+    response = api.get("/api/v1/admin/conversations?limit=2")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["items"]) == 2
+    assert decode_cursor(body["next_cursor"])[1] == CONVERSATIONS[1]["id"]
+
+
+def test_export_conversations_csv_gzip(api, adapter):
+    """The export streams every row as CSV inside a gzip file."""
+    adapter._execute.return_value = MagicMock(data=CONVERSATIONS)
+
+    response = api.get("/api/v1/admin/export/conversations?format=csv&gzip=true")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert 'filename="conversations.csv.gz"' in response.headers["content-disposition"]
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert lines[0] == "id,user_id,agent_id,created_at,ended_at"
+    assert len(lines) == 1 + len(CONVERSATIONS)
+
+
+def test_export_agents_ndjson(api, adapter):
+    agents = [{"id": "a1", "name": "Agent", "created_at": "2025-01-01T00:00:00+00:00"}]
+    adapter._execute.return_value = MagicMock(data=agents)
+
+    response = api.get("/api/v1/admin/export/agents")
+
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == agents
@@ -0,0 +1,126 @@
+import pytest
+from unittest.mock import AsyncMock
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.admission import DEFAULT_RATE_LIMITS, AdmissionController, AdmissionMiddleware
+from dependencies import admission_controller
+
+LIMITS = {
+    "rate_limit_per_minute": 60,
+    "rate_limit_burst": 2,
+    "agent_rate_limit_per_minute": 60,
+    "agent_rate_limit_burst": 1,
+}
+
+
+def _controller(load_limits=None, **kwargs):
+    return AdmissionController(load_limits or AsyncMock(return_value=LIMITS), enabled=True, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_burst_is_admitted_then_throttled():
+    controller = _controller()
+
+    assert await controller.admit("user-1") == 0
+    assert await controller.admit("user-1") == 0
+    retry_after = await controller.admit("user-1")
+
+    # One token per second at 60 per minute.
+    assert 0 < retry_after <= 1
+    # Other tenants are unaffected.
+    assert await controller.admit("user-2") == 0
+
+
+@pytest.mark.asyncio
+async def test_agent_bucket_limits_a_single_agent():
+    controller = _controller()
+
+    assert await controller.admit("user-1", "agent-a") == 0
+    assert await controller.admit("user-1", "agent-a") > 0
+    assert await controller.admit("user-1", "agent-b") == 0
+
+
+@pytest.mark.asyncio
+async def test_plan_limits_are_cached_and_default_on_errors():
+    load_limits = AsyncMock(side_effect=Exception("db down"))
+    controller = _controller(load_limits)
+
+    for _ in range(DEFAULT_RATE_LIMITS["rate_limit_burst"]):
+        assert await controller.admit("user-1") == 0
+    assert await controller.admit("user-1") > 0
+    load_limits.assert_awaited_once_with("user-1")
+
+
+@pytest.mark.asyncio
+async def test_sync_debits_tokens_consumed_by_other_instances():
+    sync_usage = AsyncMock(return_value={("user:user-1", "b"): 5})
+    controller = _controller(sync_usage=sync_usage)
+    assert await controller.admit("user-1") == 0
+
+    await controller.sync()  # First sight of the other instance's counter.
+    sync_usage.assert_awaited_once_with(controller.instance_id, {"user:user-1": 1})
+    sync_usage.return_value = {("user:user-1", "b"): 6}
+    await controller.sync()
+
+    assert await controller.admit("user-1") > 0
+
+
+@pytest.mark.asyncio
+async def test_sync_only_debits_growth_when_an_idle_instance_returns():
+    sync_usage = AsyncMock(return_value={("user:user-1", "b"): 100, ("user:user-1", "c"): 50})
+    controller = _controller(sync_usage=sync_usage)
+    assert await controller.admit("user-1") == 0
+    await controller.sync()
+    bucket = controller._buckets["user:user-1"]
+    tokens = bucket.tokens
+
+    # Instance c's row ages out of the query, then c consumes one more token.
+    sync_usage.return_value = {("user:user-1", "b"): 100}
+    await controller.sync()
+    assert bucket.tokens == tokens
+    sync_usage.return_value = {("user:user-1", "b"): 100, ("user:user-1", "c"): 51}
+    await controller.sync()
+
+    assert bucket.tokens == tokens - 1
+
+
+def test_middleware_throttles_authenticated_users():
+    app = FastAPI()
+
+    @app.get("/things")
+    async def things():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    def identify(headers):
+        return headers.get("x-user")
+
+    app.add_middleware(AdmissionMiddleware, controller=_controller(), identify=identify)
+    client = TestClient(app)
+
+    assert client.get("/things", headers={"x-user": "u1"}).status_code == 200
+    assert client.get("/things", headers={"x-user": "u1"}).status_code == 200
+    throttled = client.get("/things", headers={"x-user": "u1"})
+    assert throttled.status_code == 429
+    assert throttled.headers["Retry-After"] == "1"
+    # Probes and anonymous requests are not throttled.
+    assert client.get("/health", headers={"x-user": "u1"}).status_code == 200
+    assert client.get("/things").status_code == 200
+
+
+def test_whatsapp_ingest_is_throttled_before_any_database_call(client, mocker):
+    mocker.patch.object(admission_controller, "admit", new_callable=AsyncMock, return_value=2.5)
+    claim = mocker.patch("main.ingest_deduplicator.claim", new_callable=AsyncMock)
+
+    response = client.post(
+        "/api/v1/messages/whatsapp", json={"messageId": "m1", "userId": "12345", "agentId": "a1"}
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    admission_controller.admit.assert_awaited_once_with("12345", "a1", source="ingest")
+    claim.assert_not_awaited()
@@ -0,0 +1,120 @@
+import pytest
+from functools import partial
+from unittest.mock import AsyncMock, MagicMock
+
+from core import ai_router
+from core.ai_router import AIRouter
+from core.query_expansion import expand_query
+from infrastructure import supabase_adapter
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+USER_ID = "test-user-id"
+
+
+@pytest.fixture
+def router():
+    embedding_adapter = MagicMock()
+    embedding_adapter.get_embedding = AsyncMock(return_value=[0.1] * 3072)
+    embedding_adapter.supabase_adapter.find_relevant_chunks = AsyncMock(
+        return_value=[{"content": "SKU AB-1234 cuesta 10 USD"}]
+    )
+    gemini_adapter = MagicMock()
+    gemini_adapter.generate_response = AsyncMock(return_value="respuesta")
+    return AIRouter(
+        gemini_adapter=gemini_adapter,
+        deepseek_v2_adapter=MagicMock(),
+        deepseek_chat_adapter=MagicMock(),
+        openai_embedding_adapter=embedding_adapter,
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_uses_hybrid_retrieval(router, mocker):
+    """Chat RAG passes the raw query to hybrid retrieval and puts chunks in the prompt."""
+    mocker.patch.object(ai_router, "CHAT_SEARCH_MODE", "hybrid")
+    mocker.patch.object(ai_router, "QUERY_EXPANSION", False)
+
+    response = await router.route_query(
+        user_id=USER_ID, query="precio AB-1234", history=[], task="chat", agent_id="agent-1"
+    )
+
+    assert response == "respuesta"
+    kwargs = router.supabase_adapter.find_relevant_chunks.call_args.kwargs
+    assert kwargs["search_mode"] == "hybrid"
+    assert kwargs["query_text"] == "precio AB-1234"
+    assert kwargs["agent_id"] == "agent-1"
+    prompt = router.gemini_adapter.generate_response.call_args.kwargs["prompt"]
+    assert "SKU AB-1234 cuesta 10 USD" in prompt
+
+
+@pytest.mark.asyncio
+async def test_chat_query_expansion_uses_one_embedding_request_and_one_rpc(router, mocker):
+    """Expanded variants are embedded in a single batch and searched in a single RPC."""
+    mocker.patch.object(ai_router, "QUERY_EXPANSION", True)
+    embedder = router.openai_embedding_adapter
+    embedder.get_embeddings = AsyncMock(return_value=[[0.1] * 3072] * 3)
+    router.supabase_adapter.find_relevant_chunks_multi = AsyncMock(
+        return_value=[{"content": "Camiseta azul talla M"}]
+    )
+    history = [
+        {"role": "user", "parts": [{"text": "Tienen la camiseta CAM-200?"}]},
+        {"role": "model", "parts": [{"text": "Sí, en rojo."}]},
+    ]
+
+    await router.route_query(
+        user_id=USER_ID, query="¿y en azul talla M?", history=history, task="chat"
+    )
+
+    variants = embedder.get_embeddings.call_args.args[0]
+    assert variants[0] == "¿y en azul talla M?"
+    assert "Tienen la camiseta CAM-200? ¿y en azul talla M?" in variants
+    embedder.get_embedding.assert_not_called()
+    router.supabase_adapter.find_relevant_chunks_multi.assert_called_once()
+    assert router.supabase_adapter.find_relevant_chunks_multi.call_args.kwargs["query_texts"] == variants
+
+
+@pytest.mark.asyncio
+async def test_reduced_embeddings_skip_expansion_and_keep_the_chat_search_mode(router, mocker):
+    """The multi-query RPC needs full vectors; reduced mode searches the query alone."""
+    mocker.patch.object(ai_router, "QUERY_EXPANSION", True)
+    mocker.patch.object(ai_router, "CHAT_SEARCH_MODE", "hybrid")
+    mocker.patch.object(supabase_adapter, "EMBEDDING_MIGRATION_MODE", "reduced")
+    adapter = router.supabase_adapter
+    adapter.multi_query_supported = partial(SupabaseAdapter.multi_query_supported, adapter)
+    adapter.find_relevant_chunks_multi = AsyncMock()
+    history = [{"role": "user", "parts": [{"text": "Tienen la camiseta CAM-200?"}]}]
+
+    await router.route_query(user_id=USER_ID, query="¿y en azul?", history=history, task="chat")
+
+    adapter.find_relevant_chunks_multi.assert_not_called()
+    kwargs = adapter.find_relevant_chunks.call_args.kwargs
+    assert kwargs["search_mode"] == "hybrid"
+    assert kwargs["query_text"] == "¿y en azul?"
+    prompt = router.gemini_adapter.generate_response.call_args.kwargs["prompt"]
+    assert "SKU AB-1234 cuesta 10 USD" in prompt
+
+
+@pytest.mark.asyncio
+async def test_queries_run_through_the_scheduler(router):
+    """With a scheduler, the whole turn runs as one unit of the tenant's work."""
+    async def run(tenant_id, work, deadline):
+        return await work()
+
+    scheduler = MagicMock()
+    scheduler.run = AsyncMock(side_effect=run)
+    router.scheduler = scheduler
+
+    response = await router.route_query(
+        user_id=USER_ID, query="hola", history=[], task="general", deadline=123.0
+    )
+
+    assert response == "respuesta"
+    assert scheduler.run.call_args.args[0] == USER_ID
+    assert scheduler.run.call_args.args[2] == 123.0
+
+
+def test_expand_query_keyword_variant():
+    """Codes and prices are kept in the keyword variant, stopwords dropped."""
+    variants = expand_query("cuánto cuesta el SKU AB-1234 de 500ml?")
+
+    assert variants == ["cuánto cuesta el SKU AB-1234 de 500ml?", "SKU AB-1234 500ml"]
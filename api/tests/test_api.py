@@ -1,6 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock
 
 # The import path is now relative to the `api` directory
 from main import app, supabase_adapter
@@ -46,10 +46,10 @@ def test_deep_health_check_db_fail(client, mocker):
     }
 
 
-@patch("main.cloudflare_queue_adapter.publish_message", new_callable=AsyncMock)
-def test_handle_whatsapp_message_success(mock_publish, client, mocker):
+def test_handle_whatsapp_message_success(client, mocker):
     """Tests the WhatsApp message handler endpoint for a successful case."""
-    mocker.patch.object(supabase_adapter, "decrement_message_credits", new_callable=AsyncMock, return_value=True)
+    mock_enqueue = mocker.patch.object(supabase_adapter, "enqueue_message", new_callable=AsyncMock, return_value=True)
+    mock_notify = mocker.patch("main.outbox_relay.notify")
 
     payload = {
         "userId": "12345",
@@ -62,26 +62,30 @@ def test_handle_whatsapp_message_success(mock_publish, client, mocker):
 
     assert response.status_code == 202
     assert response.json() == {"status": "accepted"}
-    supabase_adapter.decrement_message_credits.assert_called_once_with("12345")
-    mock_publish.assert_called_once_with(payload)
-
-
-@patch("main.cloudflare_queue_adapter.publish_message", new_callable=AsyncMock)
-def test_handle_whatsapp_message_queue_fails(mock_publish, client, mocker):
-    """Tests the WhatsApp message handler when the queue publish fails."""
-    mocker.patch.object(supabase_adapter, "decrement_message_credits", new_callable=AsyncMock, return_value=True)
-    mock_publish.side_effect = Exception("Queue is down")
+    mock_enqueue.assert_called_once()
+    user_id, enqueued = mock_enqueue.call_args.args
+    assert user_id == "12345"
+    # The payload goes to the outbox as-is, stamped with its ingest timing.
+    assert enqueued.items() >= payload.items()
+    assert enqueued["ingestMs"] >= 0
+    assert enqueued["ingestedAt"] > 0
+    mock_notify.assert_called_once()
+
+
+def test_handle_whatsapp_message_enqueue_fails(client, mocker):
+    """Tests the WhatsApp message handler when the credit debit and outbox write fails."""
+    mocker.patch.object(supabase_adapter, "enqueue_message", new_callable=AsyncMock, side_effect=Exception("DB is down"))
     payload = {"userId": "12345", "body": "test"}
 
     response = client.post("/api/v1/messages/whatsapp", json=payload)
 
     assert response.status_code == 500
-    assert response.json() == {"detail": "Failed to process message after credit check."}
+    assert response.json() == {"detail": "Internal error during credit check."}
 
 
 def test_handle_whatsapp_message_no_credits(client, mocker):
     """Tests the WhatsApp message handler when the user is out of credits."""
-    mocker.patch.object(supabase_adapter, "decrement_message_credits", new_callable=AsyncMock, return_value=False)
+    mocker.patch.object(supabase_adapter, "enqueue_message", new_callable=AsyncMock, return_value=False)
     payload = {"userId": "12345", "body": "test"}
 
     response = client.post("/api/v1/messages/whatsapp", json=payload)
@@ -97,3 +101,24 @@ def test_handle_whatsapp_message_invalid_payload(client):
 
     assert response.status_code == 400
     assert response.json() == {"detail": "Missing 'userId' in payload"}
+
+
+def test_metrics_are_not_public(client):
+    """Without METRICS_TOKEN configured, /metrics is not served."""
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_token_is_required(mocker):
+    from fastapi import HTTPException
+    from starlette.requests import Request
+    from dependencies import require_metrics_token
+
+    mocker.patch("dependencies.METRICS_TOKEN", "scrape-secret")
+
+    def request(authorization):
+        return Request({"type": "http", "headers": [(b"authorization", authorization.encode())]})
+
+    require_metrics_token(request("Bearer scrape-secret"))
+    with pytest.raises(HTTPException) as exc:
+        require_metrics_token(request("Bearer wrong"))
+    assert exc.value.status_code == 401
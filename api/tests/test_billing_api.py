@@ -129,3 +129,53 @@ def test_stripe_webhook_invalid_signature(client, mock_stripe):
     mock_stripe.Webhook.construct_event.side_effect = ValueError("Invalid signature")
     response = client.post("/api/v1/webhook", content="{}", headers={"stripe-signature": "invalid"})
     assert response.status_code == 400
+
+
+@pytest.fixture
+def gateway_api(client):
+    from main import app
+    from dependencies import get_current_user_id, get_stripe_gateway, get_supabase_adapter
+    from infrastructure.stripe_gateway import StripeGateway
+
+    adapter = MagicMock(spec=SupabaseAdapter)
+    adapter.get_stripe_customer_id = AsyncMock(return_value=STRIPE_CUSTOMER_ID)
+    gateway = StripeGateway(api_key="sk_test_1234567890")
+    gateway.client = MagicMock()
+    gateway.client.checkout.sessions.create_async = AsyncMock(
+        return_value=MagicMock(id="cs_123", url="https://checkout.stripe.com/session")
+    )
+    app.dependency_overrides[get_current_user_id] = lambda: USER_ID
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    app.dependency_overrides[get_stripe_gateway] = lambda: gateway
+    yield client, adapter, gateway
+    app.dependency_overrides = {}
+
+
+def test_checkout_session_uses_async_gateway_and_cached_customer(gateway_api):
+    """Checkout goes through the async Stripe client; the customer ID is looked up once."""
+    client, adapter, gateway = gateway_api
+    payload = {"price_id": "price_123", "plan_id": "pro"}
+
+    for _ in range(2):
+        response = client.post("/api/v1/create-checkout-session", json=payload)
+        assert response.status_code == 200
+        assert response.json() == {"sessionId": "cs_123", "url": "https://checkout.stripe.com/session"}
+
+    adapter.get_stripe_customer_id.assert_awaited_once_with(USER_ID)
+    params = gateway.client.checkout.sessions.create_async.call_args.args[0]
+    assert params["customer"] == STRIPE_CUSTOMER_ID
+
+
+@pytest.mark.asyncio
+async def test_gateway_counts_failed_requests():
+    from infrastructure.stripe_gateway import STRIPE_REQUESTS, StripeGateway
+
+    gateway = StripeGateway(api_key="sk_test_1234567890")
+    gateway.client = MagicMock()
+    gateway.client.subscriptions.retrieve_async = AsyncMock(side_effect=RuntimeError("timeout"))
+    errors = STRIPE_REQUESTS.labels("subscription_retrieve", "error")
+    before = errors._value.get()
+
+    with pytest.raises(RuntimeError):
+        await gateway.retrieve_subscription("sub_123")
+    assert errors._value.get() == before + 1
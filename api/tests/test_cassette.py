@@ -0,0 +1,92 @@
+import gzip
+import time
+import httpx
+import pytest
+
+from infrastructure.cassette import Cassette, CassetteMiss, gemini_response
+
+
+def upstream(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json={"echo": request.content.decode(), "path": request.url.path})
+
+
+def replayer(path, latency_scale=0.0) -> Cassette:
+    return Cassette(str(path), "replay", latency_scale=latency_scale)
+
+
+@pytest.mark.asyncio
+async def test_http_calls_replay_offline(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+    recorder = Cassette(str(path), "record")
+    async with httpx.AsyncClient(transport=recorder.async_transport(httpx.MockTransport(upstream))) as client:
+        recorded = await client.post(
+            "https://api.openai.com/v1/embeddings", content=b"hola", headers={"Authorization": "Bearer sk-secret"}
+        )
+    recorder.save()
+
+    offline = httpx.MockTransport(lambda request: pytest.fail("replay must not call upstream"))
+    async with httpx.AsyncClient(transport=replayer(path).async_transport(offline)) as client:
+        replayed = await client.post("https://api.openai.com/v1/embeddings", content=b"hola")
+
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded.json()
+    with gzip.open(path, "rt") as fh:
+        assert "sk-secret" not in fh.read()
+
+
+@pytest.mark.asyncio
+async def test_unmatched_bodies_fall_back_to_the_same_endpoint_in_order(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+    recorder = Cassette(str(path), "record")
+    async with httpx.AsyncClient(transport=recorder.async_transport(httpx.MockTransport(upstream))) as client:
+        await client.post("https://api.deepseek.com/v1/chat/completions", content=b"first")
+        await client.post("https://api.deepseek.com/v1/chat/completions", content=b"second")
+    recorder.save()
+
+    async with httpx.AsyncClient(transport=replayer(path).async_transport(httpx.MockTransport(upstream))) as client:
+        bodies = [
+            (await client.post("https://api.deepseek.com/v1/chat/completions", content=b"other")).json()["echo"]
+            for _ in range(3)
+        ]
+        with pytest.raises(CassetteMiss):
+            await client.get("https://api.deepseek.com/v1/models")
+
+    # Exhausted recordings are reused from the start.
+    assert bodies == ["first", "second", "first"]
+
+
+def test_sync_replay_scales_recorded_latency(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+
+    def slow(request):
+        time.sleep(0.2)
+        return upstream(request)
+
+    recorder = Cassette(str(path), "record")
+    with httpx.Client(transport=recorder.sync_transport(httpx.MockTransport(slow))) as client:
+        client.get("http://localhost/rest/v1/plans?select=*")
+    recorder.save()
+
+    with httpx.Client(transport=replayer(path, latency_scale=0.5).sync_transport(httpx.MockTransport(upstream))) as client:
+        started = time.perf_counter()
+        response = client.get("http://localhost/rest/v1/plans?select=*")
+        elapsed = time.perf_counter() - started
+
+    assert response.json()["path"] == "/rest/v1/plans"
+    assert 0.08 < elapsed < 0.2
+
+
+def test_sdk_calls_replay_their_results(tmp_path):
+    path = tmp_path / "calls.jsonl.gz"
+    recorder = Cassette(str(path), "record")
+    generate = recorder.wrap(
+        "gemini.generate_content", lambda prompt: gemini_response({"text": f"re: {prompt}"}),
+        dump=lambda response: {"text": response.text}, load=gemini_response,
+    )
+    generate("hola")
+    recorder.save()
+
+    replayed = replayer(path).wrap("gemini.generate_content", lambda prompt: pytest.fail("not offline"),
+                                   load=gemini_response)
+
+    assert replayed("hola").text == "re: hola"
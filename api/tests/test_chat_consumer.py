@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from core.fair_scheduler import DeadlineExceeded
+from infrastructure.chat_consumer import ChatConsumer, CloudflarePullBackend, LocalQueue
+
+
+def _message(user_id="user-1", text="hola", **extra):
+    return {"userId": user_id, "agentId": "default", "body": text, **extra}
+
+
+@pytest.fixture
+def use_case():
+    use_case = MagicMock()
+    use_case.execute = AsyncMock(return_value="respuesta")
+    return use_case
+
+
+@pytest.fixture
+def db():
+    """Adapter whose chat turn claims behave like the chat_turns table."""
+    db = MagicMock()
+    db.turns = {}
+
+    async def claim(message_id, lease_seconds):
+        if message_id in db.turns:
+            return False
+        db.turns[message_id] = "processing"
+        return True
+
+    async def complete(message_id):
+        db.turns[message_id] = "completed"
+
+    async def release(message_id):
+        db.turns.pop(message_id, None)
+
+    db.get_agent_for_user = AsyncMock(return_value=None)
+    db.claim_chat_turn = AsyncMock(side_effect=claim)
+    db.complete_chat_turn = AsyncMock(side_effect=complete)
+    db.release_chat_turn = AsyncMock(side_effect=release)
+    return db
+
+
+@pytest.mark.asyncio
+async def test_messages_of_an_agent_share_its_config_and_keep_their_order(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message(text="uno"), _message("user-2", "otro"), _message(text="dos")])
+    db.get_agent_for_user.side_effect = lambda user_id: {"id": f"agent-{user_id}"}
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock())
+
+    assert await consumer.consume_once() == 3
+    await asyncio.gather(*consumer._tasks)
+
+    assert db.get_agent_for_user.await_count == 2
+    calls = [call.kwargs for call in use_case.execute.await_args_list if call.kwargs["user_id"] == "user-1"]
+    assert [call["user_query"] for call in calls] == ["uno", "dos"]
+    assert calls[0]["agent"] == {"id": "agent-user-1"}
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_are_retried_with_backoff_then_dropped(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message()])
+    use_case.execute.side_effect = Exception("LLM down")
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock(), max_attempts=2)
+
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+    # Retried after 1s: not available yet.
+    assert await queue.pull(10, 60) == []
+    assert len(queue) == 1
+
+    await asyncio.sleep(1)
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    assert use_case.execute.await_count == 2
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_expired_messages_are_acknowledged(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message()])
+    use_case.execute.side_effect = DeadlineExceeded("too late")
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock())
+
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    use_case.execute.assert_awaited_once()
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_audio_messages_are_forwarded_not_dropped(use_case, db):
+    queue = LocalQueue()
+    audio = _message("user-2", "", mediaKey="user-2/a.ogg")
+    await queue.publish([audio])
+    forward_audio = AsyncMock(side_effect=[Exception("queue down"), None])
+    consumer = ChatConsumer(queue, use_case, db, forward_audio)
+
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+    # Forwarding failed: the message stays queued for a retry.
+    assert len(queue) == 1
+
+    await asyncio.sleep(1)
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    assert forward_audio.await_args_list[-1].args == ([audio],)
+    use_case.execute.assert_not_awaited()
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_a_message_delivered_twice_is_answered_once(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message(messageId="wamid.1")])
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock())
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    # The relay republishes it, e.g. after a partly failed publish.
+    await queue.publish([_message(messageId="wamid.1")])
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    use_case.execute.assert_awaited_once()
+    assert db.turns == {"wamid.1": "completed"}
+    assert len(queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_a_failed_turn_releases_its_claim_for_the_retry(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message(messageId="wamid.1")])
+    use_case.execute.side_effect = [Exception("LLM down"), "respuesta"]
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock())
+
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+    assert db.turns == {}
+
+    await asyncio.sleep(1)
+    await consumer.consume_once()
+    await asyncio.gather(*consumer._tasks)
+
+    assert use_case.execute.await_count == 2
+    assert db.turns == {"wamid.1": "completed"}
+
+
+@pytest.mark.asyncio
+async def test_pulls_stop_at_the_concurrency_limit(use_case, db):
+    queue = LocalQueue()
+    await queue.publish([_message(f"user-{i}") for i in range(5)])
+    release = asyncio.Event()
+
+    async def execute(**kwargs):
+        await release.wait()
+
+    use_case.execute.side_effect = execute
+    consumer = ChatConsumer(queue, use_case, db, AsyncMock(), concurrency=2, poll_interval=0.01)
+
+    runner = asyncio.ensure_future(consumer.run())
+    await asyncio.sleep(0.05)
+    assert consumer._in_flight == 2
+
+    consumer.stop()
+    release.set()
+    await asyncio.wait_for(runner, 1)
+    # Stopping finishes leased messages and leaves the rest in the queue.
+    assert use_case.execute.await_count == 2
+    assert len(queue) == 3
+
+
+@pytest.mark.asyncio
+async def test_cloudflare_backend_parses_pulled_messages():
+    adapter = MagicMock()
+    adapter.pull_messages = AsyncMock(return_value={
+        "message_backlog_count": 7,
+        "messages": [{"id": "m1", "body": '{"userId": "user-1"}', "attempts": 2, "lease_id": "l1", "timestamp_ms": 1000}],
+    })
+    adapter.ack_messages = AsyncMock()
+    backend = CloudflarePullBackend(adapter)
+
+    [message] = await backend.pull(10, 300)
+    await backend.settle([], {message: 4})
+
+    assert message.body == {"userId": "user-1"}
+    assert message.attempts == 2
+    adapter.pull_messages.assert_awaited_once_with(10, 300)
+    adapter.ack_messages.assert_awaited_once_with([], {"l1": 4})
@@ -0,0 +1,95 @@
+import gzip
+
+import brotli
+import orjson
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
+from fastapi.testclient import TestClient
+
+from core.compression import CompressionMiddleware, choose_encoding
+from core.http_cache import PUBLIC_SCOPE, ResponseCache, cached_json
+
+ROWS = [{"id": i, "content": "Producto de ejemplo con descripción " * 4} for i in range(200)]
+
+
+@pytest.fixture(scope="module")
+def compressed_client():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/big")
+    async def big():
+        return ROWS
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    cache = ResponseCache()
+
+    @app.get("/cached")
+    async def cached(request: Request):
+        async def load():
+            return ROWS
+        return await cached_json(request, cache, PUBLIC_SCOPE, load)
+
+    @app.get("/archive")
+    async def archive():
+        return Response(gzip.compress(orjson.dumps(ROWS)), media_type="application/gzip")
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip;q=0.5", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_large_response_is_brotli_compressed(compressed_client):
+    response = compressed_client.get("/big", headers={"Accept-Encoding": "br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert int(response.headers["content-length"]) < len(orjson.dumps(ROWS)) / 5
+    # httpx may or may not decode brotli itself, depending on installed extras.
+    body = response.content if response.content.startswith(b"[") else brotli.decompress(response.content)
+    assert orjson.loads(body) == ROWS
+
+
+def test_small_response_is_not_compressed(compressed_client):
+    response = compressed_client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+
+    assert "content-encoding" not in response.headers
+
+
+def test_already_compressed_body_passes_through(compressed_client):
+    response = compressed_client.get("/archive", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert orjson.loads(gzip.decompress(response.content)) == ROWS
+
+
+def test_each_encoding_gets_its_own_etag(compressed_client):
+    """gzip, br and identity bodies differ, so they must not share a strong ETag."""
+    plain = compressed_client.get("/cached", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    gzipped = compressed_client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    brotli_etag = compressed_client.get("/cached", headers={"Accept-Encoding": "br"}).headers["etag"]
+
+    assert gzipped.headers["etag"] == plain[:-1] + '-gzip"'
+    assert brotli_etag == plain[:-1] + '-br"'
+    assert "Accept-Encoding" in gzipped.headers["vary"]
+
+
+def test_revalidation_with_an_encoded_etag_keeps_it(compressed_client):
+    etag = compressed_client.get("/cached", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    response = compressed_client.get("/cached", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
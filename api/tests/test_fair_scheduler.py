@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+from unittest.mock import AsyncMock
+
+from core.fair_scheduler import DeadlineExceeded, FairScheduler, parse_weights
+
+TIERS = {"free-a": "free", "free-c": "free", "pro-b": "pro"}
+
+
+def _scheduler(max_concurrency=1):
+    return FairScheduler(
+        tier_of=AsyncMock(side_effect=TIERS.get),
+        max_concurrency=max_concurrency,
+        weights={"free": 1, "pro": 4},
+    )
+
+
+async def _run_all(scheduler, submissions):
+    """Blocks the only slot, queues `submissions` in order and returns the dispatch order."""
+    order = []
+    gate = asyncio.Event()
+    blocker = asyncio.create_task(scheduler.run("free-a", gate.wait))
+    await asyncio.sleep(0)
+
+    async def job(name):
+        order.append(name)
+
+    tasks = []
+    for tenant, name in submissions:
+        tasks.append(asyncio.create_task(scheduler.run(tenant, lambda name=name: job(name))))
+        await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(blocker, *tasks)
+    return order
+
+
+@pytest.mark.asyncio
+async def test_higher_tier_is_not_starved_by_a_flooding_tenant():
+    submissions = [("free-a", f"a{i}") for i in range(1, 5)] + [("pro-b", "b1"), ("pro-b", "b2")]
+
+    order = await _run_all(_scheduler(), submissions)
+
+    assert order == ["b1", "b2", "a1", "a2", "a3", "a4"]
+
+
+@pytest.mark.asyncio
+async def test_tenants_of_the_same_tier_take_turns():
+    submissions = [("free-a", "a1"), ("free-a", "a2"), ("free-a", "a3"), ("free-c", "c1"), ("free-c", "c2")]
+
+    order = await _run_all(_scheduler(), submissions)
+
+    assert order == ["a1", "c1", "a2", "c2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_work_expiring_in_the_queue_is_dropped():
+    scheduler = _scheduler()
+    gate = asyncio.Event()
+    blocker = asyncio.create_task(scheduler.run("free-a", gate.wait))
+    await asyncio.sleep(0)
+    work = AsyncMock()
+
+    with pytest.raises(DeadlineExceeded):
+        await scheduler.run("pro-b", work, deadline=time.time() + 0.01)
+
+    gate.set()
+    await blocker
+    work.assert_not_awaited()
+    # The slot is free again for the next caller.
+    assert await scheduler.run("free-c", AsyncMock(return_value="ok")) == "ok"
+
+
+@pytest.mark.asyncio
+async def test_expired_work_is_never_queued():
+    work = AsyncMock()
+
+    with pytest.raises(DeadlineExceeded):
+        await _scheduler().run("free-a", work, deadline=time.time() - 1)
+
+    work.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_unknown_tenants_and_lookup_errors_fall_back_to_the_default_tier():
+    scheduler = FairScheduler(tier_of=AsyncMock(side_effect=Exception("db down")))
+
+    assert await scheduler.tier("user-1") == "free"
+
+
+def test_parse_weights():
+    assert parse_weights("free:1, pro:4,") == {"free": 1.0, "pro": 4.0}
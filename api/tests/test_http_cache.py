@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from main import app
+from dependencies import get_current_user_id, get_supabase_adapter, response_cache
+from core.http_cache import etag_matches
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+TEST_USER_ID = "test-user-123"
+METRICS = {"user_id": TEST_USER_ID, "conversations_reviewed": 3, "avg_response_time_sec": 1.2, "csat": 4.0}
+
+
+@pytest.fixture
+def adapter():
+    adapter = MagicMock(spec=SupabaseAdapter)
+    adapter.get_quality_metrics = AsyncMock(return_value=METRICS)
+    adapter.list_plans = AsyncMock(return_value=[{"id": "pro", "name": "Pro Plan"}])
+    return adapter
+
+
+@pytest.fixture
+def api(client, adapter):
+    app.dependency_overrides[get_current_user_id] = lambda: TEST_USER_ID
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    yield client
+    app.dependency_overrides = {}
+
+
+def test_etag_matches_weak_and_listed_tags():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')
+    assert etag_matches('"abc-gzip"', '"abc"')
+    assert etag_matches('W/"abc-br"', '"abc"')
+
+
+def test_unchanged_poll_gets_304_without_querying(api, adapter):
+    """A poll with the current ETag is answered from the server cache with a 304."""
+    first = api.get("/api/v1/quality/metrics")
+    etag = first.headers["etag"]
+
+    second = api.get("/api/v1/quality/metrics", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200 and first.json() == METRICS
+    assert first.headers["cache-control"] == "private, no-cache"
+    assert second.status_code == 304
+    assert second.content == b""
+    assert adapter.get_quality_metrics.await_count == 1
+
+
+def test_invalidate_retires_tenant_entries(api, adapter):
+    api.get("/api/v1/quality/metrics")
+    response_cache.invalidate(TEST_USER_ID)
+    adapter.get_quality_metrics.return_value = {**METRICS, "conversations_reviewed": 4}
+
+    response = api.get("/api/v1/quality/metrics")
+
+    assert response.json()["conversations_reviewed"] == 4
+    assert adapter.get_quality_metrics.await_count == 2
+
+
+def test_failed_metrics_are_not_cached(api, adapter):
+    adapter.get_quality_metrics.side_effect = [Exception("timeout"), METRICS]
+
+    failed = api.get("/api/v1/quality/metrics")
+    retried = api.get("/api/v1/quality/metrics")
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200 and retried.json() == METRICS
+
+
+def test_plans_are_publicly_cacheable(api):
+    response = api.get("/api/v1/plans")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert "authorization" not in response.headers.get("vary", "").lower()
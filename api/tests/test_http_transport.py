@@ -0,0 +1,73 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from prometheus_client import REGISTRY
+
+from infrastructure.http_transport import CachingNetworkBackend, HttpTransportManager
+
+
+def test_clients_are_shared_per_host():
+    manager = HttpTransportManager()
+
+    openai = manager.client("https://api.openai.com/v1")
+
+    assert manager.client("https://api.openai.com/v1/embeddings") is openai
+    assert manager.client("https://api.deepseek.com/v1") is not openai
+
+
+def test_pools_are_http2_with_the_configured_limits():
+    manager = HttpTransportManager(max_connections=7, max_keepalive_connections=3, keepalive_expiry=30)
+    manager.client("https://api.cloudflare.com/client/v4")
+
+    pool = manager._clients["api.cloudflare.com"][2].pool
+    assert pool._http2 is True
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 3
+    assert pool._keepalive_expiry == 30
+    assert pool._network_backend is manager.network_backend
+
+
+def test_pool_utilization_is_exported():
+    manager = HttpTransportManager(max_connections=9)
+    manager.client("https://pool-metrics.example.com")
+
+    assert manager.pool_stats() == {"pool-metrics.example.com": {"open": 0, "idle": 0, "active": 0}}
+    assert REGISTRY.get_sample_value("http_pool_max_connections", {"host": "pool-metrics.example.com"}) == 9
+    assert REGISTRY.get_sample_value(
+        "http_pool_connections", {"host": "pool-metrics.example.com", "state": "idle"}
+    ) == 0
+
+
+@pytest.mark.asyncio
+async def test_warm_up_tolerates_unreachable_hosts():
+    manager = HttpTransportManager()
+    client = manager.client("https://api.openai.com/v1")
+    client.head = AsyncMock(side_effect=Exception("unreachable"))
+
+    await manager.warm_up()
+
+    client.head.assert_awaited_once()
+    await manager.aclose()
+
+
+@pytest.mark.asyncio
+async def test_dns_lookups_are_cached_until_a_connect_fails(mocker):
+    backend = MagicMock()
+    backend.connect_tcp = AsyncMock()
+    getaddrinfo = AsyncMock(return_value=[(2, 1, 6, "", ("203.0.113.7", 443))])
+    loop = MagicMock(getaddrinfo=getaddrinfo)
+    mocker.patch("infrastructure.http_transport.asyncio.get_running_loop", return_value=loop)
+    dns = CachingNetworkBackend(ttl=60, backend=backend)
+
+    await dns.connect_tcp("api.openai.com", 443)
+    await dns.connect_tcp("api.openai.com", 443)
+
+    assert getaddrinfo.await_count == 1
+    assert backend.connect_tcp.call_args.args[:2] == ("203.0.113.7", 443)
+
+    backend.connect_tcp.side_effect = OSError("connection refused")
+    with pytest.raises(OSError):
+        await dns.connect_tcp("api.openai.com", 443)
+    backend.connect_tcp.side_effect = None
+    await dns.connect_tcp("api.openai.com", 443)
+
+    assert getaddrinfo.await_count == 2
@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from core.idempotency import INGEST_CLAIM_LEASE_SECONDS
+from dependencies import supabase_adapter
+
+URL = "/api/v1/messages/whatsapp/batch"
+
+
+@pytest.fixture
+def ingest(mocker):
+    """Mocks the batched outbox write, the relay and the idempotency store."""
+    mocks = MagicMock()
+    mocks.enqueue = mocker.patch.object(
+        supabase_adapter,
+        "enqueue_messages",
+        new_callable=AsyncMock,
+        side_effect=lambda payloads: [True] * len(payloads),
+    )
+    mocks.notify = mocker.patch("main.outbox_relay.notify")
+    mocks.claim = mocker.patch.object(
+        supabase_adapter, "claim_ingest_requests", new_callable=AsyncMock, return_value={}
+    )
+    mocks.complete = mocker.patch.object(supabase_adapter, "complete_ingest_requests", new_callable=AsyncMock)
+    mocks.release = mocker.patch.object(supabase_adapter, "release_ingest_requests", new_callable=AsyncMock)
+    return mocks
+
+
+def _message(message_id, user_id="user-a", body="Hola"):
+    return {"messageId": message_id, "userId": user_id, "body": body}
+
+
+def _status_codes(response):
+    return [result["statusCode"] for result in response.json()["results"]]
+
+
+def test_batch_is_enqueued_in_one_call(client, ingest):
+    messages = [_message("m1"), _message("m2", "user-b"), _message("m3")]
+
+    response = client.post(URL, json={"messages": messages})
+
+    assert response.status_code == 200
+    assert _status_codes(response) == [202, 202, 202]
+    assert [r["messageId"] for r in response.json()["results"]] == ["m1", "m2", "m3"]
+    ingest.claim.assert_awaited_once_with(["m1", "m2", "m3"], INGEST_CLAIM_LEASE_SECONDS)
+    ingest.enqueue.assert_awaited_once()
+    enqueued = ingest.enqueue.call_args.args[0]
+    assert [p["messageId"] for p in enqueued] == ["m1", "m2", "m3"]
+    assert all(p["ingestedAt"] > 0 for p in enqueued)
+    ingest.notify.assert_called_once()
+    ingest.complete.assert_awaited_once()
+
+
+def test_batch_rejects_messages_beyond_the_granted_credits(client, ingest):
+    ingest.enqueue.side_effect = None
+    ingest.enqueue.return_value = [True, False]
+
+    response = client.post(URL, json={"messages": [_message("m1"), _message("m2")]})
+
+    assert _status_codes(response) == [202, 429]
+
+
+def test_batch_reports_invalid_messages_individually(client, ingest):
+    response = client.post(URL, json={"messages": [{"body": "no user"}, _message("m1")]})
+
+    assert _status_codes(response) == [400, 202]
+    assert [p["messageId"] for p in ingest.enqueue.call_args.args[0]] == ["m1"]
+
+
+def test_batch_replays_duplicates_without_debiting_them(client, ingest):
+    ingest.claim.return_value = {
+        "m1": {"status": "completed", "response_status": 202, "response_body": {"status": "accepted"}}
+    }
+
+    response = client.post(URL, json={"messages": [_message("m1"), _message("m2"), _message("m2")]})
+
+    assert _status_codes(response) == [202, 202, 202]
+    ingest.claim.assert_awaited_once_with(["m1", "m2"], INGEST_CLAIM_LEASE_SECONDS)
+    assert [p["messageId"] for p in ingest.enqueue.call_args.args[0]] == ["m2"]
+
+
+def test_batch_enqueue_failure_releases_the_messages(client, ingest):
+    ingest.enqueue.side_effect = Exception("DB is down")
+
+    response = client.post(URL, json={"messages": [_message("m1"), _message("m2")]})
+
+    assert _status_codes(response) == [500, 500]
+    ingest.release.assert_awaited_once_with(["m1", "m2"])
+    ingest.complete.assert_not_awaited()
+
+
+def test_batch_rejects_empty_and_oversized_batches(client, ingest, mocker):
+    assert client.post(URL, json={"messages": []}).status_code == 400
+
+    mocker.patch("main.INGEST_BATCH_MAX_MESSAGES", 1)
+    response = client.post(URL, json={"messages": [_message("m1"), _message("m2")]})
+
+    assert response.status_code == 413
+    ingest.enqueue.assert_not_awaited()
@@ -0,0 +1,99 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from core.idempotency import IN_FLIGHT_RESPONSE, INGEST_CLAIM_LEASE_SECONDS, IngestDeduplicator
+from dependencies import supabase_adapter
+
+URL = "/api/v1/messages/whatsapp"
+PAYLOAD = {"messageId": "false_123@c.us_ABC", "userId": "12345", "body": "Hola"}
+
+
+@pytest.fixture
+def ingest(mocker):
+    """Mocks the outbox write and the durable idempotency store."""
+    mocks = MagicMock()
+    mocks.enqueue = mocker.patch.object(supabase_adapter, "enqueue_message", new_callable=AsyncMock, return_value=True)
+    mocks.claim = mocker.patch.object(
+        supabase_adapter, "claim_ingest_requests", new_callable=AsyncMock, return_value={}
+    )
+    mocks.complete = mocker.patch.object(supabase_adapter, "complete_ingest_requests", new_callable=AsyncMock)
+    mocks.release = mocker.patch.object(supabase_adapter, "release_ingest_requests", new_callable=AsyncMock)
+    return mocks
+
+
+def test_duplicate_delivery_replays_the_original_response(client, ingest):
+    first = client.post(URL, json=PAYLOAD)
+    second = client.post(URL, json=PAYLOAD)
+
+    assert first.status_code == second.status_code == 202
+    assert second.json() == first.json() == {"status": "accepted"}
+    ingest.enqueue.assert_awaited_once()
+    # The replay is served from memory without another database claim.
+    ingest.claim.assert_awaited_once_with([PAYLOAD["messageId"]], INGEST_CLAIM_LEASE_SECONDS)
+    ingest.complete.assert_awaited_once_with({PAYLOAD["messageId"]: (202, {"status": "accepted"})})
+
+
+def test_duplicate_seen_by_another_instance_is_replayed_from_the_database(client, ingest):
+    ingest.claim.return_value = {
+        PAYLOAD["messageId"]: {
+            "status": "completed",
+            "response_status": 429,
+            "response_body": {"detail": "Message credit quota exhausted or user has no active subscription."},
+        }
+    }
+
+    response = client.post(URL, json=PAYLOAD)
+
+    assert response.status_code == 429
+    ingest.enqueue.assert_not_awaited()
+
+
+def test_duplicate_of_a_message_in_flight_is_rejected(client, ingest):
+    ingest.claim.return_value = {PAYLOAD["messageId"]: {"status": "processing"}}
+
+    response = client.post(URL, json=PAYLOAD)
+
+    assert response.status_code == 409
+    ingest.enqueue.assert_not_awaited()
+
+
+def test_failed_message_is_released_for_retry(client, ingest):
+    ingest.enqueue.side_effect = Exception("DB is down")
+
+    response = client.post(URL, json=PAYLOAD)
+
+    assert response.status_code == 500
+    ingest.release.assert_awaited_once_with([PAYLOAD["messageId"]])
+    ingest.complete.assert_not_awaited()
+
+
+def test_claim_failure_does_not_debit_credits(client, ingest):
+    ingest.claim.side_effect = Exception("db down")
+
+    response = client.post(URL, json=PAYLOAD)
+
+    assert response.status_code == 500
+    ingest.enqueue.assert_not_awaited()
+
+
+def test_message_without_id_is_processed_without_deduplication(client, ingest):
+    payload = {"userId": "12345", "body": "Hola"}
+
+    client.post(URL, json=payload)
+    client.post(URL, json=payload)
+
+    assert ingest.enqueue.await_count == 2
+    ingest.claim.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_replayed_responses_expire_from_memory():
+    db = MagicMock()
+    db.claim_ingest_requests = AsyncMock(return_value={"m1": {"status": "processing"}})
+    db.complete_ingest_requests = AsyncMock()
+    deduplicator = IngestDeduplicator(db, ttl=0)
+
+    await deduplicator.settle({"m1": (202, {"status": "accepted"})})
+
+    assert await deduplicator.claim(["m1"]) == {"m1": IN_FLIGHT_RESPONSE}
+    db.claim_ingest_requests.assert_awaited_once_with(["m1"], INGEST_CLAIM_LEASE_SECONDS)
@@ -0,0 +1,86 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from main import app
+from dependencies import get_current_user_id, get_supabase_adapter
+from infrastructure.pdf_extractor import PdfExtractionError
+
+TEST_USER_ID = "test-user-123"
+
+
+class FakeExtractor:
+    def __init__(self, pages=(), error=None):
+        self.pages = pages
+        self.error = error
+
+    async def iter_pages(self, file_content):
+        for page in self.pages:
+            yield page
+        if self.error:
+            raise self.error
+
+
+@pytest.fixture
+def adapter():
+    adapter = MagicMock()
+    adapter.get_agent_for_user = AsyncMock(return_value={"id": "agent-1"})
+    adapter.create_document_record = AsyncMock(return_value={"id": "doc-1"})
+    adapter.set_document_segments = AsyncMock()
+    adapter.delete_document = AsyncMock(return_value=True)
+    return adapter
+
+
+@pytest.fixture
+def queue(mocker):
+    queue = MagicMock()
+    queue.publish_message = AsyncMock()
+    mocker.patch("v1.knowledge.cloudflare_queue_adapter", queue)
+    return queue
+
+
+@pytest.fixture
+def api(client, adapter):
+    app.dependency_overrides[get_current_user_id] = lambda: TEST_USER_ID
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    yield client
+    app.dependency_overrides = {}
+
+
+def upload_pdf(api):
+    return api.post("/api/v1/knowledge/upload", files={"file": ("manual.pdf", b"%PDF-1.4", "application/pdf")})
+
+
+def test_pdf_upload_publishes_one_segment_per_page_range(api, adapter, queue, mocker):
+    mocker.patch("v1.knowledge.PDF_SEGMENT_MAX_CHARS", 10)
+    mocker.patch("v1.knowledge.pdf_extractor", FakeExtractor([(1, "uno"), (2, "dos"), (3, "x" * 12), (4, " ")]))
+
+    response = upload_pdf(api)
+
+    assert response.status_code == 200
+    assert response.json()["segments"] == 2
+    payloads = [call.args[0] for call in queue.publish_message.await_args_list]
+    assert payloads == [
+        {"document_id": "doc-1", "user_id": TEST_USER_ID, "text": "uno\n\ndos", "pages": [1, 2]},
+        {"document_id": "doc-1", "user_id": TEST_USER_ID, "text": "x" * 12, "pages": [3, 3]},
+    ]
+    adapter.set_document_segments.assert_awaited_once_with("doc-1", 2)
+
+
+def test_unreadable_pdf_deletes_the_document(api, adapter, queue, mocker):
+    mocker.patch("v1.knowledge.pdf_extractor", FakeExtractor(error=PdfExtractionError("encrypted")))
+
+    response = upload_pdf(api)
+
+    assert response.status_code == 422
+    adapter.delete_document.assert_awaited_once_with("doc-1")
+    adapter.set_document_segments.assert_not_awaited()
+
+
+def test_plain_text_upload_is_a_single_segment(api, adapter, queue):
+    response = api.post("/api/v1/knowledge/upload", files={"file": ("faq.txt", b"hola", "text/plain")})
+
+    assert response.status_code == 200
+    queue.publish_message.assert_awaited_once_with(
+        {"document_id": "doc-1", "user_id": TEST_USER_ID, "text": "hola", "pages": [1, 1]}
+    )
+    adapter.set_document_segments.assert_awaited_once_with("doc-1", 1)
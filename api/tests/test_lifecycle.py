@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import lifecycle
+from core.http_cache import PUBLIC_SCOPE
+from dependencies import response_cache
+
+
+async def _hang():
+    await asyncio.sleep(10)
+
+
+@pytest.fixture
+def deps(mocker):
+    """Replaces the singletons the lifecycle drives with mocks."""
+    names = [
+        "admission_controller",
+        "llm_scheduler",
+        "outbox_relay",
+        "performance_log_writer",
+        "stripe_event_processor",
+        "stripe_gateway",
+        "supabase_adapter",
+        "transport_manager",
+    ]
+    mocks = {name: mocker.patch(f"lifecycle.{name}", AsyncMock()) for name in names}
+    mocks["pdf_extractor"] = mocker.patch("lifecycle.pdf_extractor", MagicMock())
+    mocks["supabase_adapter"].list_plans.return_value = [{"id": "pro"}]
+    mocks["supabase_adapter"].get_recently_active_user_ids.return_value = ["user-1", "user-2"]
+    return mocks
+
+
+@pytest.mark.asyncio
+async def test_warm_up_opens_connections_and_primes_caches(deps):
+    await lifecycle.warm_up()
+
+    deps["transport_manager"].warm_up.assert_awaited_once()
+    assert response_cache.get(PUBLIC_SCOPE, "/api/v1/plans?") is not None
+    deps["admission_controller"].prime.assert_awaited_once_with(["user-1", "user-2"])
+    deps["llm_scheduler"].prime.assert_awaited_once_with(["user-1", "user-2"])
+
+
+@pytest.mark.asyncio
+async def test_warm_up_failures_and_timeouts_are_not_fatal(deps):
+    deps["supabase_adapter"].list_plans.side_effect = Exception("db down")
+    deps["transport_manager"].warm_up.side_effect = _hang
+
+    await lifecycle.warm_up(timeout=0.05)
+
+    assert response_cache.get(PUBLIC_SCOPE, "/api/v1/plans?") is None
+
+
+@pytest.mark.asyncio
+async def test_drain_flushes_work_then_closes_resources(deps, mocker):
+    mocker.patch("lifecycle.OUTBOX_RELAY_ENABLED", True)
+
+    await lifecycle.drain()
+
+    deps["admission_controller"].stop.assert_awaited_once()
+    deps["outbox_relay"].stop.assert_awaited_once()
+    deps["stripe_event_processor"].drain.assert_awaited_once()
+    deps["performance_log_writer"].flush.assert_awaited_once()
+    deps["stripe_gateway"].aclose.assert_awaited_once()
+    deps["transport_manager"].aclose.assert_awaited_once()
+    deps["pdf_extractor"].shutdown.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_drain_closes_resources_when_the_deadline_passes(deps):
+    deps["stripe_event_processor"].drain.side_effect = _hang
+
+    await lifecycle.drain(timeout=0.05)
+
+    deps["performance_log_writer"].flush.assert_not_awaited()
+    deps["transport_manager"].aclose.assert_awaited_once()
+    deps["pdf_extractor"].shutdown.assert_called_once()
+
+
+def test_readiness_is_separate_from_liveness(client):
+    assert client.get("/health/ready").json() == {"status": "ready"}
+
+    client.app.state.runtime_status = lifecycle.DRAINING
+    try:
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "draining"}
+        assert client.get("/health").status_code == 200
+    finally:
+        client.app.state.runtime_status = lifecycle.READY
@@ -0,0 +1,72 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from infrastructure import openai_adapter
+from infrastructure.openai_adapter import OpenAIEmbeddingAdapter
+
+
+def fake_response(inputs: list[str]):
+    """Mimics the OpenAI embeddings response: one item per input, with its index."""
+    return MagicMock(data=[
+        MagicMock(index=i, embedding=[float(len(text)), 1.0])
+        for i, text in enumerate(inputs)
+    ])
+
+
+@pytest.fixture
+def adapter():
+    adapter = OpenAIEmbeddingAdapter(
+        api_key="test", supabase_adapter=MagicMock(), gemini_adapter=MagicMock()
+    )
+    adapter.client = MagicMock()
+    adapter.client.embeddings.create = AsyncMock(
+        side_effect=lambda input, **kwargs: fake_response(input)
+    )
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_concurrent_get_embedding_calls_share_one_request(adapter):
+    """Concurrent single-text calls are packed into a single API request."""
+    texts = ["a", "bb", "ccc"]
+
+    results = await asyncio.gather(*(adapter.get_embedding(t) for t in texts))
+
+    adapter.client.embeddings.create.assert_called_once()
+    assert adapter.client.embeddings.create.call_args.kwargs["input"] == texts
+    assert results == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+
+
+@pytest.mark.asyncio
+async def test_get_embeddings_respects_item_limit(adapter, monkeypatch):
+    """Inputs beyond the per-request item limit go into additional requests."""
+    monkeypatch.setattr(openai_adapter, "EMBEDDING_MAX_BATCH_ITEMS", 2)
+
+    results = await adapter.get_embeddings(["a", "b", "c", "d", "e"])
+
+    assert adapter.client.embeddings.create.call_count == 3
+    assert len(results) == 5
+
+
+@pytest.mark.asyncio
+async def test_get_embeddings_splits_oversize_input(adapter, monkeypatch):
+    """An input over the per-input limit is split and recombined into one unit vector."""
+    monkeypatch.setattr(openai_adapter, "EMBEDDING_MAX_INPUT_TOKENS", 4)
+
+    results = await adapter.get_embeddings(["short", "x" * 20])
+
+    sent = adapter.client.embeddings.create.call_args.kwargs["input"]
+    assert sent == ["short", "x" * 9, "x" * 9, "xx"]
+    assert results[0] == [5.0, 1.0]
+    assert sum(v * v for v in results[1]) == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_get_embeddings_failed_request_returns_empty(adapter):
+    """A failed request yields empty embeddings, like get_embedding."""
+    adapter.client.embeddings.create.side_effect = Exception("API down")
+
+    results = await adapter.get_embeddings(["a", "b"])
+
+    assert results == [[], []]
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from infrastructure.outbox_relay import OutboxRelay, route_by_media
+
+
+def _rows(*ids, attempts=1):
+    return [{"id": i, "attempts": attempts, "payload": {"messageId": f"m{i}"}} for i in ids]
+
+
+@pytest.fixture
+def db():
+    adapter = MagicMock()
+    adapter.claim_outbox_messages = AsyncMock(return_value=[])
+    adapter.delete_outbox_messages = AsyncMock()
+    adapter.reschedule_outbox_messages = AsyncMock()
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_a_batch_in_order_and_deletes_it(db):
+    db.claim_outbox_messages.return_value = _rows(2, 1)
+    publish = AsyncMock()
+    relay = OutboxRelay(db, publish, batch_size=10, lease_seconds=30)
+
+    assert await relay.relay_once() == 2
+
+    db.claim_outbox_messages.assert_awaited_once_with(10, 30)
+    publish.assert_awaited_once_with([{"messageId": "m1"}, {"messageId": "m2"}])
+    db.delete_outbox_messages.assert_awaited_once_with([1, 2])
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_rescheduled_with_backoff(db):
+    db.claim_outbox_messages.return_value = _rows(1, 2, attempts=4)
+    relay = OutboxRelay(db, AsyncMock(side_effect=Exception("Queue is down")), max_retry_delay=5)
+
+    assert await relay.relay_once() == 0
+
+    db.reschedule_outbox_messages.assert_awaited_once_with([1, 2], 5, "Queue is down")
+    db.delete_outbox_messages.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_notify_wakes_the_relay_before_the_poll_interval(db):
+    publish = AsyncMock()
+    relay = OutboxRelay(db, publish, poll_interval=60)
+    relay.start()
+    await asyncio.sleep(0)  # First, empty poll.
+
+    db.claim_outbox_messages.return_value = _rows(1)
+    relay.notify()
+    await asyncio.sleep(0.01)
+    db.claim_outbox_messages.return_value = []
+    await relay.stop()
+
+    publish.assert_awaited_once_with([{"messageId": "m1"}])
+
+
+@pytest.mark.asyncio
+async def test_audio_and_text_messages_go_to_their_own_queues():
+    publish_audio, publish_text = AsyncMock(), AsyncMock()
+    audio = {"messageId": "a", "mediaKey": "user-1/a.ogg"}
+    text = {"messageId": "t", "body": "hola"}
+
+    await route_by_media(publish_audio, publish_text)([text, audio])
+    await route_by_media(publish_audio, publish_text)([text])
+
+    publish_audio.assert_awaited_once_with([audio])
+    assert publish_text.await_args_list[0].args == ([text],)
+    assert publish_text.await_count == 2
@@ -0,0 +1,73 @@
+import pytest
+
+from infrastructure.pdf_extractor import PdfTextExtractor, PdfExtractionError
+
+
+def build_pdf(pages: list[str]) -> bytes:
+    """Builds a minimal, valid PDF with one line of Helvetica text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages tree, filled in once the page ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    extractor = PdfTextExtractor(max_workers=2, timeout=30, pages_per_task=2)
+    yield extractor
+    extractor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_streams_pages_in_order(extractor):
+    """Pages come back 1-based and in order even when split across tasks."""
+    pdf = build_pdf([f"Page number {i}" for i in range(1, 6)])
+
+    pages = [page async for page in extractor.iter_pages(pdf)]
+
+    assert [number for number, _ in pages] == [1, 2, 3, 4, 5]
+    assert [text.strip() for _, text in pages] == [f"Page number {i}" for i in range(1, 6)]
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_invalid_pdf(extractor):
+    """Garbage input is reported as a PdfExtractionError."""
+    with pytest.raises(PdfExtractionError):
+        await extractor.extract_text(b"this is not a pdf")
+
+
+@pytest.mark.asyncio
+async def test_iter_pages_timeout():
+    """A file that exceeds its time budget raises and recycles the pool."""
+    extractor = PdfTextExtractor(max_workers=1, timeout=0.0001)
+    try:
+        with pytest.raises(PdfExtractionError, match="timed out"):
+            await extractor.extract_text(build_pdf(["slow"]))
+        assert extractor._executor is None
+    finally:
+        extractor.shutdown()
@@ -0,0 +1,84 @@
+import time
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from core.timing import timed_phase
+from core.use_cases.process_chat_message import ProcessChatMessage
+from infrastructure.performance_log_writer import PerformanceLogWriter
+
+AGENT = {"id": "agent-1", "base_prompt": "Be nice."}
+
+
+class FakeRouter:
+    async def route_query(self, **kwargs):
+        with timed_phase("retrieval_ms"):
+            await asyncio.sleep(0.01)
+        with timed_phase("generation_ms"):
+            await asyncio.sleep(0.02)
+        return "Hello!"
+
+
+@pytest.fixture
+def db_adapter():
+    adapter = MagicMock()
+    adapter.get_agent_for_user = AsyncMock(return_value=AGENT)
+    adapter.get_conversation_history = AsyncMock(return_value=[])
+    adapter.log_conversation = AsyncMock()
+    return adapter
+
+
+@pytest.mark.asyncio
+async def test_execute_records_turn_timings(db_adapter):
+    """Each turn yields one timing row covering every pipeline stage."""
+    performance_log = MagicMock()
+    use_case = ProcessChatMessage(FakeRouter(), db_adapter, performance_log)
+
+    reply = await use_case.execute(
+        "user-1", "Hi", ingested_at_ms=time.time() * 1000 - 250, ingest_ms=12
+    )
+
+    assert reply == "Hello!"
+    row = performance_log.record.call_args.args[0]
+    assert row["user_id"] == "user-1" and row["agent_id"] == "agent-1"
+    assert row["ingest_ms"] == 12
+    assert row["queue_wait_ms"] >= 250
+    assert row["retrieval_ms"] >= 10
+    assert row["generation_ms"] >= 20
+    assert row["total_ms"] >= row["ingest_ms"] + row["queue_wait_ms"] + 30
+    assert db_adapter.log_conversation.call_args.kwargs["response_time_ms"] >= 30
+
+
+@pytest.mark.asyncio
+async def test_execute_reuses_a_preloaded_agent(db_adapter):
+    use_case = ProcessChatMessage(FakeRouter(), db_adapter)
+
+    assert await use_case.execute("user-1", "Hi", agent=AGENT) == "Hello!"
+
+    db_adapter.get_agent_for_user.assert_not_awaited()
+    assert db_adapter.log_conversation.call_args.kwargs["agent_id"] == "agent-1"
+
+
+@pytest.mark.asyncio
+async def test_writer_flushes_full_batches_in_one_call():
+    write_many = AsyncMock(side_effect=lambda rows: len(rows))
+    writer = PerformanceLogWriter(write_many, batch_size=2, flush_interval=60)
+
+    for i in range(5):
+        writer.record({"total_ms": i})
+    await writer.flush()
+
+    assert [len(call.args[0]) for call in write_many.call_args_list] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_writer_keeps_rows_when_a_write_fails():
+    write_many = AsyncMock(side_effect=[RuntimeError("db down"), 1])
+    writer = PerformanceLogWriter(write_many, batch_size=1, flush_interval=60)
+
+    writer.record({"total_ms": 1})
+    await asyncio.sleep(0)  # let the failed write run
+    await writer.flush()
+
+    assert write_many.await_count == 2
+    assert write_many.call_args.args[0] == [{"total_ms": 1}]
@@ -0,0 +1,99 @@
+import httpx
+import pytest
+from unittest.mock import MagicMock
+
+from infrastructure.deepseek_adapter import DeepSeekChatAdapter
+from infrastructure.openai_adapter import OpenAIEmbeddingAdapter
+from infrastructure.provider_emulator import EmulatorConfig, create_app, hash_embedding, parse_latency
+
+
+def emulator_client(**config) -> httpx.AsyncClient:
+    config.setdefault("latency", "fixed:0")
+    config.setdefault("embedding_latency", "fixed:0")
+    config.setdefault("tokens_per_second", 0)
+    app = create_app(EmulatorConfig(**config))
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://emulator")
+
+
+def test_hash_embeddings_are_deterministic_unit_vectors():
+    vector = hash_embedding("hola mundo")
+
+    assert vector == hash_embedding("hola mundo")
+    assert len(vector) == 3072
+    assert sum(x * x for x in vector) == pytest.approx(1.0)
+    # Reduced sizes are truncations, as with text-embedding-3.
+    reduced = hash_embedding("hola mundo", 1024)
+    assert len(reduced) == 1024
+    assert reduced[0] * vector[1] == pytest.approx(reduced[1] * vector[0])
+
+
+def test_hash_embeddings_of_texts_sharing_words_are_closer():
+    def cosine(a, b):
+        return sum(x * y for x, y in zip(a, b))
+
+    base = hash_embedding("precio del plan pro")
+    assert cosine(base, hash_embedding("precio del plan gratis")) > cosine(base, hash_embedding("agenda una reunión"))
+
+
+def test_invalid_latency_spec_is_rejected():
+    with pytest.raises(ValueError):
+        parse_latency("normal:100")
+
+
+@pytest.mark.asyncio
+async def test_adapters_run_against_the_emulator():
+    http_client = emulator_client(completions={"precio": "El plan pro cuesta 29 USD."})
+    chat = DeepSeekChatAdapter(api_key="test", http_client=http_client)
+    embedder = OpenAIEmbeddingAdapter(
+        api_key="test", supabase_adapter=MagicMock(), gemini_adapter=MagicMock(), http_client=http_client
+    )
+
+    assert await chat.generate_response("¿Cuál es el precio?", []) == "El plan pro cuesta 29 USD."
+    embeddings = await embedder.get_embeddings(["hola", "adiós"])
+    assert embeddings[0] == pytest.approx(hash_embedding("hola"))
+    assert embeddings[1] == pytest.approx(hash_embedding("adiós"))
+
+
+@pytest.mark.asyncio
+async def test_chat_completions_stream_canned_tokens():
+    async with emulator_client(completion_tokens=10) as client:
+        async with client.stream(
+            "POST", "/v1/chat/completions",
+            json={"model": "deepseek-chat", "messages": [{"role": "user", "content": "hola"}], "stream": True, "max_tokens": 4},
+        ) as response:
+            events = [line async for line in response.aiter_lines() if line.startswith("data: ")]
+        full = await client.post(
+            "/v1/chat/completions", json={"model": "deepseek-chat", "messages": [{"role": "user", "content": "hola"}]}
+        )
+
+    assert events[-1] == "data: [DONE]"
+    # Role chunk, four tokens, finish chunk and [DONE].
+    assert len(events) == 7
+    assert full.json()["usage"]["completion_tokens"] == 10
+
+
+@pytest.mark.asyncio
+async def test_injected_errors_use_the_provider_error_format():
+    async with emulator_client(error_rate=1.0, error_statuses=(429,)) as client:
+        openai = await client.post("/v1/embeddings", json={"input": "hola", "model": "m"})
+        gemini = await client.post("/v1beta/models/gemini-1.5-flash:generateContent", json={"contents": []})
+
+    assert openai.status_code == 429
+    assert openai.headers["Retry-After"] == "1"
+    assert gemini.json()["error"]["status"] == "RESOURCE_EXHAUSTED"
+
+
+@pytest.mark.asyncio
+async def test_gemini_endpoints():
+    async with emulator_client() as client:
+        generated = await client.post(
+            "/v1beta/models/gemini-1.5-flash:generateContent",
+            json={"contents": [{"role": "user", "parts": [{"text": "hola"}]}]},
+        )
+        embedded = await client.post(
+            "/v1beta/models/embedding-001:embedContent",
+            json={"model": "models/embedding-001", "content": {"parts": [{"text": "hola"}]}},
+        )
+
+    assert generated.json()["candidates"][0]["content"]["parts"][0]["text"]
+    assert embedded.json()["embedding"]["values"] == pytest.approx(hash_embedding("hola", 768))
@@ -0,0 +1,103 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from main import app
+from dependencies import get_current_user_id, get_supabase_adapter
+from core.pagination import decode_cursor, encode_cursor, parse_fields
+from infrastructure.supabase_adapter import SupabaseAdapter
+
+TEST_USER_ID = "test-user-123"
+ROWS = [
+    {"id": f"00000000-0000-4000-8000-00000000000{i}", "created_at": f"2025-01-0{9 - i}T00:00:00+00:00", "latency_ms": i}
+    for i in range(5)
+]
+
+
+@pytest.fixture
+def adapter():
+    adapter = SupabaseAdapter.__new__(SupabaseAdapter)
+    adapter.client = MagicMock()
+    adapter._execute = AsyncMock()
+    return adapter
+
+
+@pytest.fixture
+def api(client, adapter):
+    app.dependency_overrides[get_current_user_id] = lambda: TEST_USER_ID
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    yield client
+    app.dependency_overrides = {}
+
+
+def test_cursor_round_trip():
+    """A cursor encodes the (created_at, id) of the last row of a page."""
+    cursor = encode_cursor(ROWS[2])
+
+    assert decode_cursor(cursor) == (ROWS[2]["created_at"], ROWS[2]["id"])
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_cursor_rejects_values_that_are_not_a_timestamp_and_uuid():
+    """Cursor values are interpolated into a PostgREST filter, so they are validated."""
+    injected = {"created_at": '2025-01-01",id.gt."0', "id": ROWS[0]["id"]}
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(injected))
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor({"created_at": ROWS[0]["created_at"], "id": "log-0),or(id.gt.0"}))
+
+
+def test_parse_fields_always_includes_cursor_columns():
+    assert parse_fields("latency_ms") == ["created_at", "id", "latency_ms"]
+    with pytest.raises(ValueError):
+        parse_fields("latency_ms,*")
+
+
+def test_performance_log_page_returns_next_cursor(api, adapter):
+    """One extra row is fetched to know whether a next page exists."""
+    adapter._execute.return_value = MagicMock(data=ROWS[:3])
+
+    response = api.get("/api/v1/reports/performance-log?limit=2&fields=latency_ms")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [row["id"] for row in body["logs"]] == [ROWS[0]["id"], ROWS[1]["id"]]
+    assert decode_cursor(body["next_cursor"]) == (ROWS[1]["created_at"], ROWS[1]["id"])
+    adapter.client.table.return_value.select.assert_called_once_with("created_at, id, latency_ms")
+
+
+def test_performance_log_invalid_cursor(api):
+    response = api.get("/api/v1/reports/performance-log?cursor=garbage")
+
+    assert response.status_code == 400
+
+
+def test_performance_log_stream_pages_lazily(api, adapter, monkeypatch):
+    """The NDJSON stream walks every page until the last one."""
+    monkeypatch.setattr("v1.reports.STREAM_PAGE_SIZE", 2)
+    adapter._execute.side_effect = [
+        MagicMock(data=ROWS[0:3]),  # two rows plus the lookahead row
+        MagicMock(data=ROWS[2:5]),
+        MagicMock(data=ROWS[4:]),
+    ]
+
+    response = api.get("/api/v1/reports/performance-log/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in lines] == [row["id"] for row in ROWS]
+    assert adapter._execute.call_count == 3
+
+
+def test_failed_page_is_an_error_and_not_cached(api, adapter):
+    """A database error is a 500, and the next request queries again."""
+    adapter._execute.side_effect = [Exception("connection reset"), MagicMock(data=ROWS[:1])]
+
+    failed = api.get("/api/v1/reports/performance-log")
+    retried = api.get("/api/v1/reports/performance-log")
+
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert [row["id"] for row in retried.json()["logs"]] == [ROWS[0]["id"]]
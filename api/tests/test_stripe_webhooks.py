@@ -0,0 +1,140 @@
+import json
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from main import app
+from dependencies import get_stripe_event_processor, get_supabase_adapter
+from core.use_cases.apply_stripe_event import ApplyStripeEvent, StripeEventDeferred, StripeEventError, ordering_key
+from infrastructure.stripe_event_processor import StripeEventProcessor
+
+EVENT = {
+    "id": "evt_1",
+    "type": "customer.subscription.updated",
+    "created": 1700000000,
+    "data": {"object": {
+        "id": "sub_123",
+        "status": "active",
+        "cancel_at_period_end": False,
+        "current_period_start": 1700000000,
+        "current_period_end": 1702592000,
+    }},
+}
+
+
+@pytest.fixture
+def adapter():
+    adapter = MagicMock()
+    adapter.record_stripe_event = AsyncMock(return_value=True)
+    adapter.mark_stripe_event = AsyncMock()
+    return adapter
+
+
+@pytest.fixture
+def processor():
+    return MagicMock(spec=StripeEventProcessor)
+
+
+@pytest.fixture
+def api(client, adapter, processor, mocker):
+    mocker.patch("v1.billing.stripe.Webhook.construct_event")
+    app.dependency_overrides[get_supabase_adapter] = lambda: adapter
+    app.dependency_overrides[get_stripe_event_processor] = lambda: processor
+    yield client
+    app.dependency_overrides = {}
+
+
+def test_webhook_stores_event_and_acknowledges(api, adapter, processor):
+    response = api.post("/api/v1/webhook", content=json.dumps(EVENT), headers={"stripe-signature": "sig"})
+
+    assert response.status_code == 200
+    adapter.record_stripe_event.assert_awaited_once_with(EVENT, "sub_123")
+    processor.submit.assert_called_once_with(EVENT, "sub_123")
+
+
+def test_webhook_ignores_redelivered_event(api, adapter, processor):
+    """A Stripe retry of a stored event is acknowledged but not applied again."""
+    adapter.record_stripe_event.return_value = False
+
+    response = api.post("/api/v1/webhook", content=json.dumps(EVENT), headers={"stripe-signature": "sig"})
+
+    assert response.status_code == 200
+    processor.submit.assert_not_called()
+
+
+def test_webhook_fails_when_event_cannot_be_stored(api, adapter, processor):
+    adapter.record_stripe_event.side_effect = Exception("db down")
+
+    response = api.post("/api/v1/webhook", content=json.dumps(EVENT), headers={"stripe-signature": "sig"})
+
+    assert response.status_code == 500
+    processor.submit.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_processor_applies_events_in_order_per_subscription(adapter):
+    applied = []
+
+    async def apply_event(event):
+        # The first event is slower; the second must still wait for it.
+        await asyncio.sleep(0.02 if event["id"] == "evt_1" else 0)
+        applied.append(event["id"])
+
+    processor = StripeEventProcessor(apply_event, adapter)
+    processor.submit(EVENT, "sub_123")
+    processor.submit({**EVENT, "id": "evt_2"}, "sub_123")
+    await processor.drain()
+
+    assert applied == ["evt_1", "evt_2"]
+    assert adapter.mark_stripe_event.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_processor_retries_then_records_success(adapter):
+    apply_event = AsyncMock(side_effect=[StripeEventError("not yet"), None])
+    processor = StripeEventProcessor(apply_event, adapter, retry_delay=0)
+
+    assert await processor.submit(EVENT, "sub_123")
+    adapter.mark_stripe_event.assert_awaited_once_with("evt_1", "processed", 2, None)
+
+
+@pytest.mark.asyncio
+async def test_apply_event_waits_for_missing_subscription(adapter):
+    """An update that arrives before its checkout event is retried later."""
+    adapter.apply_subscription_event = AsyncMock(return_value="missing")
+
+    with pytest.raises(StripeEventDeferred):
+        await ApplyStripeEvent(adapter, MagicMock()).execute(EVENT)
+    assert ordering_key(EVENT) == "sub_123"
+
+
+@pytest.mark.asyncio
+async def test_update_before_its_checkout_lets_the_checkout_run_first(adapter):
+    """A deferred update leaves the chain, so the checkout queued behind it is applied."""
+    checkout = {**EVENT, "id": "evt_checkout", "type": "checkout.session.completed"}
+    applied = []
+
+    async def apply_event(event):
+        if event["id"] == "evt_1" and "evt_checkout" not in applied:
+            raise StripeEventDeferred("Subscription sub_123 does not exist yet")
+        applied.append(event["id"])
+
+    processor = StripeEventProcessor(apply_event, adapter, retry_delay=0)
+    processor.submit(EVENT, "sub_123")
+    processor.submit(checkout, "sub_123")
+    await processor.drain()
+
+    assert applied == ["evt_checkout", "evt_1"]
+    adapter.mark_stripe_event.assert_any_await("evt_1", "processed", 2, None)
+
+
+@pytest.mark.asyncio
+async def test_deferred_event_fails_after_max_attempts(adapter):
+    apply_event = AsyncMock(side_effect=StripeEventDeferred("not yet"))
+    processor = StripeEventProcessor(apply_event, adapter, max_attempts=3, retry_delay=0)
+
+    processor.submit(EVENT, "sub_123")
+    await processor.drain()
+
+    assert apply_event.await_count == 3
+    adapter.mark_stripe_event.assert_awaited_once_with("evt_1", "failed", 3, "not yet")
@@ -82,3 +82,218 @@ async def test_decrement_message_credits_rpc_error(adapter: SupabaseAdapter):
     result = await adapter.decrement_message_credits(USER_ID)
 
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_full_mode(adapter: SupabaseAdapter, mocker):
+    """In full mode with the v1 RPC the original function gets the full query vector."""
+    mocker.patch("infrastructure.supabase_adapter.EMBEDDING_MIGRATION_MODE", "full")
+    mocker.patch("infrastructure.supabase_adapter.RAG_MATCH_RPC_VERSION", "v1")
+    adapter._execute.return_value = MagicMock(data=[{"id": "c1", "content": "x"}])
+    embedding = [0.1] * 3072
+
+    result = await adapter.find_relevant_chunks(USER_ID, embedding)
+
+    assert result == [{"id": "c1", "content": "x"}]
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "match_document_chunks"
+    assert params["query_embedding"] == embedding
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_reduced_mode(adapter: SupabaseAdapter, mocker):
+    """In reduced mode a full query vector is truncated to the reduced size."""
+    mocker.patch("infrastructure.supabase_adapter.EMBEDDING_MIGRATION_MODE", "reduced")
+    adapter._execute.return_value = MagicMock(data=[])
+
+    await adapter.find_relevant_chunks(USER_ID, [1.0] * 3072)
+
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "match_document_chunks_reduced"
+    assert len(params["query_embedding"]) == 1024
+    assert sum(x * x for x in params["query_embedding"]) == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_dual_read_serves_full_results(adapter: SupabaseAdapter, mocker):
+    """In dual_read mode both RPCs run but the full results are returned."""
+    mocker.patch("infrastructure.supabase_adapter.EMBEDDING_MIGRATION_MODE", "dual_read")
+    mocker.patch("infrastructure.supabase_adapter.RAG_MATCH_RPC_VERSION", "v1")
+    adapter._execute.side_effect = [
+        MagicMock(data=[{"id": "full"}]),
+        MagicMock(data=[{"id": "reduced"}]),
+    ]
+
+    result = await adapter.find_relevant_chunks(USER_ID, [1.0] * 3072)
+
+    assert result == [{"id": "full"}]
+    assert [c.args[0] for c in adapter.client.rpc.call_args_list] == [
+        "match_document_chunks", "match_document_chunks_reduced",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_quantized_mode(adapter: SupabaseAdapter, mocker):
+    """Quantized search calls the two-stage RPC with the oversampling factor."""
+    mocker.patch("infrastructure.supabase_adapter.EMBEDDING_MIGRATION_MODE", "full")
+    adapter._execute.return_value = MagicMock(data=[])
+
+    await adapter.find_relevant_chunks(USER_ID, [0.1] * 3072, search_mode="quantized", oversample=4)
+
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "match_document_chunks_quantized"
+    assert params["oversample"] == 4
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_v2_passes_tuning(adapter: SupabaseAdapter, mocker):
+    """The v2 RPC receives the agent filter and per-call tuning; unset values are omitted."""
+    mocker.patch("infrastructure.supabase_adapter.EMBEDDING_MIGRATION_MODE", "full")
+    mocker.patch("infrastructure.supabase_adapter.RAG_MATCH_RPC_VERSION", "v2")
+    adapter._execute.return_value = MagicMock(data=[])
+
+    await adapter.find_relevant_chunks(USER_ID, [0.1] * 3072, agent_id="agent-1", ef_search=100)
+
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "match_document_chunks_v2"
+    assert params["p_agent_id"] == "agent-1"
+    assert params["ef_search"] == 100
+
+
+@pytest.mark.asyncio
+async def test_find_relevant_chunks_hybrid_mode(adapter: SupabaseAdapter):
+    """Hybrid search sends both the query text and the embedding to the fusion RPC."""
+    adapter._execute.return_value = MagicMock(data=[{"id": "c1", "score": 0.03}])
+
+    result = await adapter.find_relevant_chunks(
+        USER_ID, [0.1] * 3072, search_mode="hybrid", query_text="precio SKU AB-1234"
+    )
+
+    assert result == [{"id": "c1", "score": 0.03}]
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "match_document_chunks_hybrid"
+    assert params["query_text"] == "precio SKU AB-1234"
+
+@pytest.mark.asyncio
+async def test_get_quality_metrics_for_agent_reads_rollup_row(adapter: SupabaseAdapter):
+    """Per-agent metrics come from a single quality_metrics_agent row."""
+    adapter._execute.return_value = MagicMock(data=[{
+        "conversations_count": 12,
+        "avg_response_time_sec": 1.5,
+        "csat": 4.5,
+        "response_time_histogram": [1, 2, 3, 4, 1, 1, 0],
+    }])
+
+    result = await adapter.get_quality_metrics(USER_ID, agent_id="agent-1")
+
+    adapter.client.table.assert_called_once_with("quality_metrics_agent")
+    assert result["conversations_reviewed"] == 12
+    assert result["agent_id"] == "agent-1"
+    assert result["response_time_buckets"][0] == {"le_ms": 500, "count": 1}
+    assert result["response_time_buckets"][-1] == {"le_ms": None, "count": 0}
+
+@pytest.mark.asyncio
+async def test_rollup_job_runs_until_caught_up(adapter: SupabaseAdapter):
+    from jobs.rollup_quality_metrics import rollup
+
+    adapter._execute.side_effect = [MagicMock(data=2), MagicMock(data=2), MagicMock(data=1)]
+
+    total = await rollup(adapter, batch_size=2)
+
+    assert total == 5
+    assert adapter._execute.call_count == 3
+    adapter.client.rpc.assert_called_with(
+        "rollup_quality_metrics", {"batch_size": 2, "settle_interval": "60 seconds"}
+    )
+
+
+@pytest.mark.asyncio
+async def test_multi_query_search_with_reduced_embeddings_falls_back_to_hybrid(adapter: SupabaseAdapter):
+    """1024-d embeddings cannot go to the multi RPC; the first query is still searched."""
+    adapter.find_relevant_chunks = AsyncMock(return_value=[{"id": "c1"}])
+
+    result = await adapter.find_relevant_chunks_multi(
+        USER_ID, [[0.1] * 1024, [0.2] * 1024], match_count=3, query_texts=["azul", "camiseta azul"]
+    )
+
+    assert result == [{"id": "c1"}]
+    adapter.find_relevant_chunks.assert_awaited_once()
+    kwargs = adapter.find_relevant_chunks.call_args.kwargs
+    assert kwargs["search_mode"] == "hybrid"
+    assert kwargs["query_text"] == "azul"
+    adapter._execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_claim_chat_turn_passes_the_lease(adapter: SupabaseAdapter):
+    """A chat turn is claimed through the RPC, leased for the visibility timeout."""
+    adapter._execute.return_value = MagicMock(data=False)
+
+    assert await adapter.claim_chat_turn("wamid.1", 300) is False
+    adapter.client.rpc.assert_called_once_with("claim_chat_turn", {"p_message_id": "wamid.1", "p_lease": "300 seconds"})
+
+
+@pytest.mark.asyncio
+async def test_claim_ingest_requests_takes_over_expired_claims(adapter: SupabaseAdapter):
+    """IDs the RPC returns are claimed; the rest report their stored record."""
+    adapter._execute.side_effect = [
+        MagicMock(data=["m1"]),
+        MagicMock(data=[{"message_id": "m2", "status": "completed", "response_status": 202, "response_body": {}}]),
+    ]
+
+    existing = await adapter.claim_ingest_requests(["m1", "m2"], 60)
+
+    adapter.client.rpc.assert_called_once_with(
+        "claim_ingest_requests", {"p_message_ids": ["m1", "m2"], "p_lease": "60 seconds"}
+    )
+    assert list(existing) == ["m2"]
+    assert existing["m2"]["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_set_document_segments_calls_the_completion_rpc(adapter: SupabaseAdapter):
+    await adapter.set_document_segments("doc-1", 3)
+
+    adapter.client.rpc.assert_called_once_with(
+        "complete_document_segments", {"p_document_id": "doc-1", "p_segment_count": 3}
+    )
+
+
+@pytest.mark.asyncio
+async def test_sync_rate_limit_usage_keys_counters_by_instance(adapter: SupabaseAdapter):
+    adapter._execute.return_value = MagicMock(data=[
+        {"bucket_key": "user:u1", "instance_id": "b", "consumed": 4},
+        {"bucket_key": "user:u1", "instance_id": "c", "consumed": 7},
+    ])
+
+    others = await adapter.sync_rate_limit_usage("a", {"user:u1": 1})
+
+    assert others == {("user:u1", "b"): 4, ("user:u1", "c"): 7}
+
+
+def test_response_time_labels_match_the_rollup_buckets():
+    """The le_ms labels must be the bounds the database buckets by."""
+    import re
+    from pathlib import Path
+    from infrastructure.supabase_adapter import RESPONSE_TIME_BUCKETS_MS
+
+    migration = Path(__file__).parents[2] / "supabase/migrations/028_inclusive_response_time_buckets.sql"
+    bucket_function = migration.read_text().split("FUNCTION public.response_time_bucket", 1)[1]
+    bounds = re.search(r"width_bucket\(response_time_ms - 1, ARRAY\[([\d, ]+)\]\)", bucket_function).group(1)
+
+    assert [int(bound) for bound in bounds.split(",")] == RESPONSE_TIME_BUCKETS_MS
+
+
+@pytest.mark.asyncio
+async def test_create_subscription_with_event_time_keeps_newer_state(adapter: SupabaseAdapter):
+    """Checkout events go through the RPC that skips subscriptions updated by newer events."""
+    adapter._execute.return_value = MagicMock(data=[{"stripe_subscription_id": "sub_1", "status": "canceled"}])
+
+    row = await adapter.create_subscription(
+        USER_ID, "pro", "active", "sub_1", "cus_1", None, None, False, event_created=1700000000
+    )
+
+    rpc_name, params = adapter.client.rpc.call_args.args
+    assert rpc_name == "upsert_checkout_subscription"
+    assert params["p_event_created"] == 1700000000
+    assert row["status"] == "canceled"
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from pydantic import BaseModel, UUID4
 import datetime
 
+from core.pagination import decode_cursor
+from core.streaming import csv_lines, gzip_chunks, ndjson_lines
 from dependencies import require_admin_role, get_supabase_adapter
 from infrastructure.supabase_adapter import SupabaseAdapter
 
@@ -11,6 +15,10 @@ router = APIRouter(
     tags=["Admin"],
     dependencies=[Depends(require_admin_role)]
 )
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 1000
+EXPORT_PAGE_SIZE = 1000
 
 # --- Pydantic Models for Admin Panel Responses ---
 
@@ -30,36 +38,115 @@ class AdminConversation(BaseModel):
     created_at: datetime.datetime
     ended_at: Optional[datetime.datetime] = None
 
+class AdminAgentPage(BaseModel):
+    """A page of agents; pass next_cursor back as `cursor` for the next page."""
+    items: List[AdminAgent]
+    next_cursor: Optional[str] = None
+
+class AdminConversationPage(BaseModel):
+    """A page of conversations; pass next_cursor back as `cursor` for the next page."""
+    items: List[AdminConversation]
+    next_cursor: Optional[str] = None
+
+
+# Exportable tables and the columns written for each.
+EXPORT_COLUMNS = {
+    "agents": list(AdminAgent.model_fields),
+    "conversations": list(AdminConversation.model_fields),
+}
+
+
+def _parse_cursor(cursor: Optional[str]):
+    try:
+        return decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 
 # --- Admin Endpoints ---
 
-@router.get("/agents", response_model=List[AdminAgent], summary="List all agents")
+@router.get("/agents", response_model=AdminAgentPage, summary="List agents")
 async def list_agents(
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     supabase: SupabaseAdapter = Depends(get_supabase_adapter)
 ):
     """
-    Retrieves a list of all agents in the system.
+    Retrieves a page of agents in the system, newest first.
     This is a protected endpoint and requires admin privileges.
     """
+    keyset = _parse_cursor(cursor)
     try:
-        response = await supabase.client.from_("agents").select("id, name, model, created_at, config").order("created_at", desc=True).execute()
-        return response.data
+        items, next_cursor = await supabase.fetch_page(
+            "agents", {}, limit, keyset, EXPORT_COLUMNS["agents"]
+        )
+        return {"items": items, "next_cursor": next_cursor}
     except Exception as e:
-        # Log the exception here if logging is set up
+        logger.error("Error fetching agents for admin: %s", e)
         raise HTTPException(status_code=500, detail=f"An error occurred while fetching agents: {str(e)}")
 
-@router.get("/conversations", response_model=List[AdminConversation], summary="List recent conversations")
+@router.get("/conversations", response_model=AdminConversationPage, summary="List recent conversations")
 async def list_conversations(
-    limit: int = 100,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     supabase: SupabaseAdapter = Depends(get_supabase_adapter)
 ):
     """
-    Retrieves a list of the most recent conversations.
+    Retrieves a page of the most recent conversations.
     This is a protected endpoint and requires admin privileges.
     """
+    keyset = _parse_cursor(cursor)
     try:
-        response = await supabase.client.from_("conversations").select("id, user_id, agent_id, created_at, ended_at").order("created_at", desc=True).limit(limit).execute()
-        return response.data
+        items, next_cursor = await supabase.fetch_page(
+            "conversations", {}, limit, keyset, EXPORT_COLUMNS["conversations"]
+        )
+        return {"items": items, "next_cursor": next_cursor}
     except Exception as e:
-        # Log the exception here
+        logger.error("Error fetching conversations for admin: %s", e)
         raise HTTPException(status_code=500, detail=f"An error occurred while fetching conversations: {str(e)}")
+
+@router.get("/export/{table}", summary="Bulk export agents or conversations")
+async def export_table(
+    table: Literal["agents", "conversations"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    user_id: Optional[UUID4] = None,
+    agent_id: Optional[UUID4] = None,
+    supabase: SupabaseAdapter = Depends(get_supabase_adapter)
+):
+    """
+    Streams every row of a table as NDJSON or CSV, optionally gzip-compressed.
+    Rows are read page by page, so memory stays bounded for any table size.
+    """
+    filters = {}
+    if user_id:
+        filters["user_id"] = str(user_id)
+    if agent_id:
+        if table != "conversations":
+            raise HTTPException(status_code=400, detail="agent_id filter only applies to conversations.")
+        filters["agent_id"] = str(agent_id)
+    columns = EXPORT_COLUMNS[table]
+
+    async def rows():
+        exported = 0
+        try:
+            async for row in supabase.iter_rows(table, filters, columns, EXPORT_PAGE_SIZE):
+                exported += 1
+                yield row
+        except Exception as e:
+            # Headers are already sent; end the stream and leave a trace.
+            logger.error("Admin export of %s aborted after %d rows: %s", table, exported, e)
+            return
+        logger.info("Admin export of %s finished: %d rows.", table, exported)
+
+    if format == "csv":
+        body, media_type = csv_lines(rows(), columns), "text/csv"
+    else:
+        body, media_type = ndjson_lines(rows()), "application/x-ndjson"
+
+    filename = f"{table}.{format}"
+    if gzip:
+        # Served as a .gz file rather than Content-Encoding, so downloads stay compressed.
+        body, media_type, filename = gzip_chunks(body), "application/gzip", f"{filename}.gz"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
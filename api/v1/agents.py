@@ -1,7 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from pydantic import BaseModel
+from core.http_cache import ResponseCache, cached_json
 from infrastructure.supabase_adapter import SupabaseAdapter
-from dependencies import get_current_user_id, get_supabase_adapter
+from dependencies import get_current_user_id, get_response_cache, get_supabase_adapter
 
 router = APIRouter()
 
@@ -13,12 +14,16 @@ class AgentConfig(BaseModel):
 
 @router.get("/agents", tags=["Agents"])
 async def list_agents_for_current_user(
+    request: Request,
     supabase_adapter: SupabaseAdapter = Depends(get_supabase_adapter),
     user_id: str = Depends(get_current_user_id),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """Return all agents for the authenticated user."""
     try:
-        return await supabase_adapter.list_agents_for_user(user_id=user_id)
+        return await cached_json(
+            request, cache, user_id, lambda: supabase_adapter.list_agents_for_user(user_id=user_id)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -27,6 +32,7 @@ async def upsert_agent_for_current_user(
     config: AgentConfig,
     supabase_adapter: SupabaseAdapter = Depends(get_supabase_adapter),
     user_id: str = Depends(get_current_user_id),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """
     Creates or updates the agent configuration for the currently authenticated user.
@@ -38,6 +44,7 @@ async def upsert_agent_for_current_user(
             product_description=config.product_description,
             base_prompt=config.base_prompt
         )
+        cache.invalidate(user_id)
         if not agent:
             raise HTTPException(status_code=500, detail="Failed to save agent configuration.")
         return agent
@@ -47,17 +54,22 @@ async def upsert_agent_for_current_user(
 
 @router.get("/agents/me", tags=["Agents"])
 async def get_agent_for_current_user(
+    request: Request,
     supabase_adapter: SupabaseAdapter = Depends(get_supabase_adapter),
     user_id: str = Depends(get_current_user_id),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """
     Retrieves the agent configuration for the currently authenticated user.
     """
-    try:
+    async def load_agent():
         agent = await supabase_adapter.get_agent_for_user(user_id=user_id)
         if not agent:
             raise HTTPException(status_code=404, detail="Agent configuration not found for this user.")
         return agent
+
+    try:
+        return await cached_json(request, cache, user_id, load_agent)
     except HTTPException:
         # Re-raise HTTPException directly to prevent it from being caught by the generic handler
         raise
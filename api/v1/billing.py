@@ -1,13 +1,31 @@
+import json
+import logging
 import stripe
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
-from datetime import datetime
 
 from core.config import get_settings, Settings
-from dependencies import get_current_user_id, get_supabase_adapter
+from core.http_cache import (
+    PUBLIC_CACHE_CONTROL,
+    PUBLIC_CACHE_TTL_SECONDS,
+    PUBLIC_SCOPE,
+    ResponseCache,
+    cached_json,
+)
+from core.use_cases.apply_stripe_event import ordering_key
+from dependencies import (
+    get_current_user_id,
+    get_response_cache,
+    get_supabase_adapter,
+    get_stripe_event_processor,
+    get_stripe_gateway,
+)
+from infrastructure.stripe_event_processor import StripeEventProcessor
+from infrastructure.stripe_gateway import StripeGateway
 from infrastructure.supabase_adapter import SupabaseAdapter
 
 router = APIRouter(tags=["Billing"])
+logger = logging.getLogger(__name__)
 
 class CheckoutSessionRequest(BaseModel):
     price_id: str # The Stripe price ID, e.g., price_12345
@@ -16,11 +34,17 @@ class CheckoutSessionRequest(BaseModel):
 # === Public Endpoint to list plans ===
 
 @router.get("/plans")
-async def list_available_plans(adapter: SupabaseAdapter = Depends(get_supabase_adapter)):
+async def list_available_plans(
+    request: Request,
+    adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
+):
     """Lists all available subscription plans from the database."""
     try:
-        plans = await adapter.client.from_("plans").select("*").execute()
-        return plans.data
+        return await cached_json(
+            request, cache, PUBLIC_SCOPE, adapter.list_plans,
+            ttl=PUBLIC_CACHE_TTL_SECONDS, cache_control=PUBLIC_CACHE_CONTROL,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to retrieve plans: {e}")
 
@@ -28,15 +52,22 @@ async def list_available_plans(adapter: SupabaseAdapter = Depends(get_supabase_a
 
 @router.get("/subscription")
 async def get_my_subscription(
+    request: Request,
     user_id: str = Depends(get_current_user_id),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """Retrieves the subscription details for the authenticated user."""
-    try:
+    async def load_subscription():
         subscription = await adapter.get_subscription_for_user(user_id=user_id)
         if not subscription:
             raise HTTPException(status_code=404, detail="No active subscription found for this user.")
         return subscription
+
+    try:
+        return await cached_json(request, cache, user_id, load_subscription)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,10 +78,11 @@ async def create_checkout_session(
     user_id: str = Depends(get_current_user_id),
     settings: Settings = Depends(get_settings),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    gateway: StripeGateway = Depends(get_stripe_gateway),
 ):
     """Creates a Stripe Checkout session for a user to subscribe to a plan."""
     try:
-        customer_id = await adapter.get_stripe_customer_id(user_id)
+        customer_id = await gateway.get_customer_id(user_id, adapter.get_stripe_customer_id)
 
         session_params = {
             "payment_method_types": ["card"],
@@ -73,7 +105,7 @@ async def create_checkout_session(
             # user_email = await adapter.get_user_email(user_id)
             # session_params["customer_email"] = user_email
 
-        checkout_session = stripe.checkout.Session.create(**session_params)
+        checkout_session = await gateway.create_checkout_session(session_params)
         return {"sessionId": checkout_session.id, "url": checkout_session.url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Stripe error: {e}")
@@ -84,15 +116,16 @@ async def create_customer_portal_session(
     user_id: str = Depends(get_current_user_id),
     settings: Settings = Depends(get_settings),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    gateway: StripeGateway = Depends(get_stripe_gateway),
 ):
     """Creates a Stripe Billing Portal session for a user to manage their subscription."""
     try:
-        customer_id = await adapter.get_stripe_customer_id(user_id)
+        customer_id = await gateway.get_customer_id(user_id, adapter.get_stripe_customer_id)
         if not customer_id:
             raise HTTPException(status_code=404, detail="User does not have a Stripe customer ID.")
 
-        portal_session = stripe.billing_portal.Session.create(
-            customer=customer_id,
+        portal_session = await gateway.create_billing_portal_session(
+            customer_id,
             return_url=f"{settings.frontend_url}/dashboard/settings/billing",
         )
         return {"url": portal_session.url}
@@ -107,13 +140,17 @@ async def stripe_webhook(
     request: Request,
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
     settings: Settings = Depends(get_settings),
+    processor: StripeEventProcessor = Depends(get_stripe_event_processor),
 ):
-    """Handles incoming webhooks from Stripe to update subscription statuses."""
+    """
+    Verifies a Stripe webhook, stores it for deduplication and acknowledges it.
+    The event is applied in the background, so Stripe gets its 200 right away.
+    """
     payload = await request.body()
     sig_header = request.headers.get("stripe-signature")
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload, sig_header, settings.stripe_webhook_secret
         )
     except ValueError as e:
@@ -123,41 +160,19 @@ async def stripe_webhook(
         # Invalid signature
         raise HTTPException(status_code=400, detail=f"Invalid signature: {e}")
 
-    # Handle the event
-    data = event["data"]["object"]
-    event_type = event["type"]
-
-    if event_type == "checkout.session.completed":
-        if data["mode"] == "subscription":
-            customer_id = data["customer"]
-            user_id = data["metadata"]["user_id"]
-            plan_id = data["metadata"]["plan_id"]
-            stripe_subscription_id = data["subscription"]
-
-            # Retrieve full subscription object to get all details
-            sub_data = stripe.Subscription.retrieve(stripe_subscription_id)
-
-            await adapter.create_subscription(
-                user_id=user_id,
-                plan_id=plan_id,
-                status=sub_data["status"],
-                stripe_subscription_id=sub_data["id"],
-                stripe_customer_id=customer_id,
-                current_period_start=datetime.utcfromtimestamp(sub_data["current_period_start"]).isoformat(),
-                current_period_end=datetime.utcfromtimestamp(sub_data["current_period_end"]).isoformat(),
-                cancel_at_period_end=sub_data["cancel_at_period_end"],
-            )
-
-    elif event_type in ["customer.subscription.updated", "customer.subscription.deleted"]:
-        await adapter.update_subscription_status(
-            stripe_subscription_id=data["id"],
-            new_status=data["status"],
-            cancel_at_period_end=data["cancel_at_period_end"],
-            current_period_start=datetime.utcfromtimestamp(data["current_period_start"]).isoformat(),
-            current_period_end=datetime.utcfromtimestamp(data["current_period_end"]).isoformat(),
-        )
+    # The signature covers the raw body, so it can be stored as-is.
+    event = json.loads(payload)
+    key = ordering_key(event)
+    try:
+        is_new = await adapter.record_stripe_event(event, key)
+    except Exception as e:
+        # Not stored: fail so that Stripe retries the delivery.
+        logger.error("Error storing Stripe event %s: %s", event.get("id"), e)
+        raise HTTPException(status_code=500, detail="Could not record webhook event.")
 
+    if is_new:
+        processor.submit(event, key)
     else:
-        print(f"Unhandled webhook event type: {event_type}")
+        logger.info("Ignoring duplicate Stripe event %s.", event["id"])
 
     return Response(status_code=200)
@@ -3,9 +3,15 @@ import logging
 
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 
-from dependencies import get_current_user_id, get_supabase_adapter, cloudflare_queue_adapter
+from dependencies import (
+    get_current_user_id,
+    get_supabase_adapter,
+    cloudflare_queue_adapter,
+    pdf_extractor,
+)
 from infrastructure.supabase_adapter import SupabaseAdapter
 from infrastructure.cloudflare_queue_adapter import CloudflareQueueAdapter
+from infrastructure.pdf_extractor import PdfTextExtractor, PdfExtractionError
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -17,6 +23,56 @@ logger = logging.getLogger(__name__)
 
 ALLOWED_CONTENT_TYPES = {"application/pdf", "text/plain", "text/markdown"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+# Cloudflare Queues caps a message at 128 KB, so PDF text is published in
+# page-aligned segments that stay well below that limit.
+PDF_SEGMENT_MAX_CHARS = 32_000
+
+
+async def _publish_pdf_segments(
+    extractor: PdfTextExtractor,
+    queue_adapter: CloudflareQueueAdapter,
+    document_id: str,
+    user_id: str,
+    file_content: bytes,
+) -> int:
+    """
+    Streams PDF pages from the extractor into page-aligned queue messages.
+    The embedding worker stores each segment as its own document_chunks rows,
+    keyed by the first page. Returns the number of segments published.
+    """
+    segments = 0
+    buffer: list[str] = []
+    buffer_chars = 0
+    first_page = None
+    last_page = None
+
+    async def flush():
+        nonlocal segments, buffer, buffer_chars, first_page
+        await queue_adapter.publish_message({
+            "document_id": document_id,
+            "user_id": user_id,
+            "text": "\n\n".join(buffer),
+            "pages": [first_page, last_page],
+        })
+        segments += 1
+        buffer, buffer_chars, first_page = [], 0, None
+
+    async for page_number, text in extractor.iter_pages(file_content):
+        text = text.strip()
+        if not text:
+            continue
+        if buffer and buffer_chars + len(text) > PDF_SEGMENT_MAX_CHARS:
+            await flush()
+        if first_page is None:
+            first_page = page_number
+        last_page = page_number
+        buffer.append(text)
+        buffer_chars += len(text)
+
+    if buffer:
+        await flush()
+    return segments
+
 
 @router.get("/knowledge/documents", tags=["Knowledge"])
 async def list_documents_for_user(
@@ -37,7 +93,8 @@ async def upload_knowledge_file(
     file: UploadFile = File(...),
     user_id: str = Depends(get_current_user_id),
     supabase_adapter: SupabaseAdapter = Depends(get_supabase_adapter),
-    queue_adapter: CloudflareQueueAdapter = Depends(lambda: cloudflare_queue_adapter)
+    queue_adapter: CloudflareQueueAdapter = Depends(lambda: cloudflare_queue_adapter),
+    extractor: PdfTextExtractor = Depends(lambda: pdf_extractor),
 ):
     """
     Uploads a knowledge document, creates a record in Supabase,
@@ -55,18 +112,10 @@ async def upload_knowledge_file(
         raise HTTPException(status_code=404, detail="No active agent found for this user.")
     agent_id = agent['id']
 
-    # In this new flow, we pass the text content directly to the embedding worker.
-    # We no longer upload the raw file to R2 from the API. The worker can decide
-    # if it needs to parse it (e.g. PDF) or just use the text.
-    # For simplicity, we assume the worker handles text content for now.
-
-    # For PDF, a more complex worker would be needed to extract text first.
-    if file.content_type == "application/pdf":
-        # This would be a more complex flow handled by a specific document processing worker
-        # For now, we'll treat it as an error or unsupported path.
-        raise HTTPException(status_code=501, detail="PDF processing not implemented in this flow.")
-
-    text_content = file_content.decode('utf-8')
+    # Plain text is passed directly to the embedding worker. PDFs are parsed
+    # here in a process pool and streamed to the queue page by page.
+    if file.content_type != "application/pdf":
+        text_content = file_content.decode('utf-8')
 
     document_record = await supabase_adapter.create_document_record(
         user_id=user_id,
@@ -78,12 +127,48 @@ async def upload_knowledge_file(
         raise HTTPException(status_code=500, detail="Failed to create document record in database.")
     document_id = document_record['id']
 
+    if file.content_type == "application/pdf":
+        try:
+            segments = await _publish_pdf_segments(
+                extractor, queue_adapter, document_id, user_id, file_content
+            )
+        except PdfExtractionError as e:
+            await supabase_adapter.delete_document(document_id)
+            logger.warning(f"Rejected PDF upload for user {user_id}: {e}")
+            raise HTTPException(status_code=422, detail="Could not extract text from PDF.")
+        except Exception as e:
+            await supabase_adapter.delete_document(document_id)
+            logger.error(f"Error publishing PDF segments to queue: {e}")
+            raise HTTPException(status_code=500, detail="Failed to queue document for processing.")
+
+        if not segments:
+            await supabase_adapter.delete_document(document_id)
+            raise HTTPException(status_code=422, detail="PDF contains no extractable text.")
+        try:
+            # The worker marks the document completed once every segment is stored.
+            await supabase_adapter.set_document_segments(document_id, segments)
+        except Exception as e:
+            await supabase_adapter.delete_document(document_id)
+            logger.error(f"Error recording the segments of document {document_id}: {e}")
+            raise HTTPException(status_code=500, detail="Failed to queue document for processing.")
+
+        return {
+            "status": "ok",
+            "message": "Document content queued for embedding.",
+            "document_id": document_id,
+            "segments": segments,
+        }
+
     try:
+        # Plain text is a single segment.
         event_payload = {
             "document_id": document_id,
+            "user_id": user_id,
             "text": text_content,
+            "pages": [1, 1],
         }
         await queue_adapter.publish_message(event_payload)
+        await supabase_adapter.set_document_segments(document_id, 1)
     except Exception as e:
         await supabase_adapter.delete_document(document_id)
         logger.error(f"Error publishing document event to queue: {e}")
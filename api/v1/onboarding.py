@@ -1,6 +1,7 @@
 import logging
 from fastapi import APIRouter, HTTPException, Depends
-from dependencies import get_current_user_id, get_supabase_adapter
+from core.http_cache import ResponseCache
+from dependencies import get_current_user_id, get_response_cache, get_supabase_adapter
 from infrastructure.supabase_adapter import SupabaseAdapter
 
 router = APIRouter()
@@ -15,6 +16,7 @@ logger = logging.getLogger(__name__)
 async def activate_agent(
     supabase_adapter: SupabaseAdapter = Depends(get_supabase_adapter),
     user_id: str = Depends(get_current_user_id),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
     """Activate the agent associated with the current user."""
     try:
@@ -24,6 +26,7 @@ async def activate_agent(
 
         agent_id = agent["id"]
         updated = await supabase_adapter.update_agent_status(agent_id, "active")
+        cache.invalidate(user_id)
         if not updated:
             raise HTTPException(
                 status_code=500, detail="Failed to update agent status"
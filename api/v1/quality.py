@@ -1,15 +1,27 @@
-from fastapi import APIRouter, Depends
+import logging
+from typing import Optional
 
-from dependencies import get_current_user_id, get_supabase_adapter
+from fastapi import APIRouter, Depends, HTTPException, Request
+
+from core.http_cache import ResponseCache, cached_json
+from dependencies import get_current_user_id, get_response_cache, get_supabase_adapter
 from infrastructure.supabase_adapter import SupabaseAdapter
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 
 @router.get("/quality/metrics", tags=["Quality"])
 async def get_quality_metrics(
+    request: Request,
+    agent_id: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    """Return quality metrics for the authenticated user."""
-    return await adapter.get_quality_metrics(user_id)
+    """Return quality metrics for the authenticated user, optionally for one agent."""
+    try:
+        return await cached_json(request, cache, user_id, lambda: adapter.get_quality_metrics(user_id, agent_id))
+    except Exception as e:
+        logger.error("Error fetching quality metrics for user %s: %s", user_id, e)
+        raise HTTPException(status_code=500, detail="Failed to retrieve quality metrics.")
@@ -1,33 +1,133 @@
-from fastapi import APIRouter, Depends
+import logging
+from typing import Optional
 
-from dependencies import get_current_user_id, get_supabase_adapter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from core.http_cache import ResponseCache, cached_json
+from core.pagination import decode_cursor, parse_fields
+from core.streaming import ndjson_lines
+from dependencies import get_current_user_id, get_response_cache, get_supabase_adapter
 from infrastructure.supabase_adapter import SupabaseAdapter
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 500
+STREAM_PAGE_SIZE = 500
+
+
+class ReportQuery:
+    """Common query parameters for paginated report endpoints."""
+
+    def __init__(
+        self,
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+        fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    ):
+        try:
+            self.cursor = decode_cursor(cursor) if cursor else None
+            self.columns = parse_fields(fields)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        self.limit = limit
+
+
+def _stream_report(adapter: SupabaseAdapter, table: str, user_id: str, columns) -> StreamingResponse:
+    async def rows():
+        try:
+            async for row in adapter.iter_rows(table, {"user_id": user_id}, columns, STREAM_PAGE_SIZE):
+                yield row
+        except Exception as e:
+            # Headers are already sent; end the stream and leave a trace.
+            logger.error("Error streaming %s for user %s: %s", table, user_id, e)
+
+    return StreamingResponse(ndjson_lines(rows()), media_type="application/x-ndjson")
+
+
+async def _cached_page(request: Request, cache: ResponseCache, user_id: str, table: str, load):
+    try:
+        return await cached_json(request, cache, user_id, load)
+    except Exception as e:
+        logger.error("Error fetching %s for user %s: %s", table, user_id, e)
+        raise HTTPException(status_code=500, detail="Failed to retrieve report.")
+
+
+def _stream_columns(fields: Optional[str]):
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/reports/opportunity-briefs", tags=["Reports"])
 async def get_opportunity_briefs(
+    request: Request,
+    params: ReportQuery = Depends(),
     user_id: str = Depends(get_current_user_id),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    """Return opportunity briefs."""
-    return await adapter.get_opportunity_briefs(user_id)
+    """Return a page of opportunity briefs."""
+    return await _cached_page(request, cache, user_id, "opportunity_briefs", lambda: adapter.get_opportunity_briefs(
+        user_id, limit=params.limit, cursor=params.cursor, columns=params.columns
+    ))
+
+
+@router.get("/reports/opportunity-briefs/stream", tags=["Reports"])
+async def stream_opportunity_briefs(
+    fields: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id),
+    adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+):
+    """Stream all opportunity briefs as NDJSON."""
+    return _stream_report(adapter, "opportunity_briefs", user_id, _stream_columns(fields))
 
 
 @router.get("/reports/performance-log", tags=["Reports"])
 async def get_performance_log(
+    request: Request,
+    params: ReportQuery = Depends(),
     user_id: str = Depends(get_current_user_id),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
 ):
-    """Return performance logs."""
-    return await adapter.get_performance_log(user_id)
+    """Return a page of performance logs."""
+    return await _cached_page(request, cache, user_id, "performance_logs", lambda: adapter.get_performance_log(
+        user_id, limit=params.limit, cursor=params.cursor, columns=params.columns
+    ))
+
+
+@router.get("/reports/performance-log/stream", tags=["Reports"])
+async def stream_performance_log(
+    fields: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id),
+    adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+):
+    """Stream all performance logs as NDJSON."""
+    return _stream_report(adapter, "performance_logs", user_id, _stream_columns(fields))
 
 
 @router.get("/reports/executive-summaries", tags=["Reports"])
 async def get_executive_summaries(
+    request: Request,
+    params: ReportQuery = Depends(),
+    user_id: str = Depends(get_current_user_id),
+    adapter: SupabaseAdapter = Depends(get_supabase_adapter),
+    cache: ResponseCache = Depends(get_response_cache),
+):
+    """Return a page of executive summaries."""
+    return await _cached_page(request, cache, user_id, "executive_summaries", lambda: adapter.get_executive_summaries(
+        user_id, limit=params.limit, cursor=params.cursor, columns=params.columns
+    ))
+
+
+@router.get("/reports/executive-summaries/stream", tags=["Reports"])
+async def stream_executive_summaries(
+    fields: Optional[str] = None,
     user_id: str = Depends(get_current_user_id),
     adapter: SupabaseAdapter = Depends(get_supabase_adapter),
 ):
-    """Return executive summaries."""
-    return await adapter.get_executive_summaries(user_id)
+    """Stream all executive summaries as NDJSON."""
+    return _stream_report(adapter, "executive_summaries", user_id, _stream_columns(fields))
@@ -160,6 +160,8 @@ client.on('message', async message => {
 
     try {
         let messagePayload = {
+            // Unique per WhatsApp message; the API uses it to drop retried deliveries.
+            messageId: message.id ? message.id._serialized : '',
             userId: message.from,
             userName: userName,
             chatId: message.from,
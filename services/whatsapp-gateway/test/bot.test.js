@@ -72,6 +72,7 @@ const messageHandler = bot.client.handlers['message'];
 
 function createMockMessage(overrides = {}) {
   const message = {
+    id: { _serialized: 'false_1234567890@c.us_3EB0C767D097B7C7' },
     from: '1234567890',
     body: 'Hello, world!',
     hasMedia: false,
@@ -96,6 +97,7 @@ test('handles a simple text message', async () => {
   assert.strictEqual(url, process.env.MAIN_API_URL);
   assert.strictEqual(payload.body, 'Hello, world!');
   assert.strictEqual(payload.userId, '1234567890');
+  assert.strictEqual(payload.messageId, 'false_1234567890@c.us_3EB0C767D097B7C7');
   assert.strictEqual(payload.mediaKey, '');
 });
 
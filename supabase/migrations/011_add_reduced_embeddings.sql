@@ -0,0 +1,113 @@
+-- 011_add_reduced_embeddings.sql
+-- Migration path off vector(3072): store a reduced-dimension copy of every
+-- chunk embedding next to the full one. text-embedding-3 vectors can be
+-- shortened by truncating and re-normalizing, so the reduced copy is derived
+-- in the database and no writer needs to change.
+--
+-- The reduced size is 1024. The API refuses to start with any other
+-- OPENAI_EMBED_DIMENSIONS; using 256 or 512 takes a new migration that
+-- changes every 1024 below, plus the matching constant in core/embeddings.py.
+
+-- 1. Reduced column. The full embedding becomes optional so that a writer may
+--    insert a pre-reduced vector into embedding_reduced alone: the trigger
+--    below only derives it when embedding is set. The embedding worker still
+--    sends the full vector, so both columns are filled.
+ALTER TABLE document_chunks
+  ADD COLUMN IF NOT EXISTS embedding_reduced vector(1024);
+
+ALTER TABLE document_chunks
+  ALTER COLUMN embedding DROP NOT NULL;
+
+COMMENT ON COLUMN document_chunks.embedding_reduced IS 'Truncated, re-normalized copy of embedding (text-embedding-3 dimensions=1024).';
+
+-- 2. Helper that shortens a text-embedding-3 vector (requires pgvector >= 0.7).
+CREATE OR REPLACE FUNCTION reduce_embedding(v vector, dims int)
+RETURNS vector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT l2_normalize(subvector(v, 1, dims));
+$$;
+
+-- 3. Dual-write: keep embedding_reduced in sync with embedding. A row
+--    written without embedding keeps the embedding_reduced it was given.
+CREATE OR REPLACE FUNCTION sync_reduced_embedding()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.embedding IS NOT NULL THEN
+    NEW.embedding_reduced := reduce_embedding(NEW.embedding, 1024);
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS document_chunks_sync_reduced_embedding ON document_chunks;
+CREATE TRIGGER document_chunks_sync_reduced_embedding
+  BEFORE INSERT OR UPDATE OF embedding ON document_chunks
+  FOR EACH ROW EXECUTE FUNCTION sync_reduced_embedding();
+
+-- 4. Backfill existing rows in small batches so the table is never locked for
+--    long. Called repeatedly by the API backfill job until it returns 0.
+CREATE OR REPLACE FUNCTION backfill_reduced_embeddings(batch_size int DEFAULT 1000)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated int;
+BEGIN
+  WITH batch AS (
+    SELECT id FROM document_chunks
+    WHERE embedding_reduced IS NULL AND embedding IS NOT NULL
+    LIMIT batch_size
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE document_chunks AS dc
+  SET embedding_reduced = reduce_embedding(dc.embedding, 1024)
+  FROM batch
+  WHERE dc.id = batch.id;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$;
+
+-- 5. Index. Unlike the 3072-dim column, 1024 dims fit pgvector's HNSW limit.
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_reduced
+  ON document_chunks USING hnsw (embedding_reduced vector_cosine_ops);
+
+-- 6. Reduced counterpart of match_document_chunks. It takes the same
+--    arguments, with a query embedding of the reduced size.
+CREATE OR REPLACE FUNCTION match_document_chunks_reduced (
+  p_user_id uuid,
+  query_embedding vector(1024),
+  match_threshold float,
+  match_count int
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  SELECT
+    dc.id,
+    dc.document_id,
+    dc.content,
+    1 - (dc.embedding_reduced <=> query_embedding) AS similarity
+  FROM
+    document_chunks AS dc
+  WHERE
+    dc.user_id = p_user_id
+    AND dc.embedding_reduced IS NOT NULL
+    AND (1 - (dc.embedding_reduced <=> query_embedding)) > match_threshold
+  ORDER BY
+    dc.embedding_reduced <=> query_embedding
+  LIMIT
+    match_count;
+END;
+$$;
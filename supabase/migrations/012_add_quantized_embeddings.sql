@@ -0,0 +1,100 @@
+-- 012_add_quantized_embeddings.sql
+-- Two-stage vector search for large knowledge bases: a cheap first pass over
+-- binary-quantized embeddings (384 bytes per chunk instead of 12 KB) fetches
+-- an oversampled candidate set, which is then reranked exactly with the full
+-- embedding. Requires pgvector >= 0.7.
+
+-- 1. Compact column next to the full embedding.
+ALTER TABLE document_chunks
+  ADD COLUMN IF NOT EXISTS embedding_binary bit(3072);
+
+COMMENT ON COLUMN document_chunks.embedding_binary IS 'binary_quantize(embedding): one bit per dimension, used for the candidate scan.';
+
+-- 2. Populate on insert/update of the full embedding.
+CREATE OR REPLACE FUNCTION sync_quantized_embedding()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.embedding IS NOT NULL THEN
+    NEW.embedding_binary := binary_quantize(NEW.embedding)::bit(3072);
+  END IF;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS document_chunks_sync_quantized_embedding ON document_chunks;
+CREATE TRIGGER document_chunks_sync_quantized_embedding
+  BEFORE INSERT OR UPDATE OF embedding ON document_chunks
+  FOR EACH ROW EXECUTE FUNCTION sync_quantized_embedding();
+
+-- 3. Batched backfill for existing rows, driven by the API backfill job.
+CREATE OR REPLACE FUNCTION backfill_quantized_embeddings(batch_size int DEFAULT 1000)
+RETURNS int
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated int;
+BEGIN
+  WITH batch AS (
+    SELECT id FROM document_chunks
+    WHERE embedding_binary IS NULL AND embedding IS NOT NULL
+    LIMIT batch_size
+    FOR UPDATE SKIP LOCKED
+  )
+  UPDATE document_chunks AS dc
+  SET embedding_binary = binary_quantize(dc.embedding)::bit(3072)
+  FROM batch
+  WHERE dc.id = batch.id;
+
+  GET DIAGNOSTICS updated = ROW_COUNT;
+  RETURN updated;
+END;
+$$;
+
+-- 4. Hamming-distance index for the candidate scan.
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_binary
+  ON document_chunks USING hnsw (embedding_binary bit_hamming_ops);
+
+-- 5. Two-stage RPC. Same arguments as match_document_chunks plus the
+--    oversampling factor for the candidate scan.
+CREATE OR REPLACE FUNCTION match_document_chunks_quantized (
+  p_user_id uuid,
+  query_embedding vector(3072),
+  match_threshold float,
+  match_count int,
+  oversample int DEFAULT 10
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT dc.id
+    FROM document_chunks AS dc
+    WHERE dc.user_id = p_user_id AND dc.embedding_binary IS NOT NULL
+    ORDER BY dc.embedding_binary <~> binary_quantize(query_embedding)::bit(3072)
+    LIMIT match_count * oversample
+  ),
+  reranked AS (
+    SELECT
+      dc.id,
+      dc.document_id,
+      dc.content,
+      1 - (dc.embedding <=> query_embedding) AS similarity
+    FROM candidates
+    JOIN document_chunks AS dc ON dc.id = candidates.id
+  )
+  SELECT r.id, r.document_id, r.content, r.similarity
+  FROM reranked AS r
+  WHERE r.similarity > match_threshold
+  ORDER BY r.similarity DESC
+  LIMIT match_count;
+END;
+$$;
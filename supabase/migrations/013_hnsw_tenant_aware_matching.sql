@@ -0,0 +1,178 @@
+-- 013_hnsw_tenant_aware_matching.sql
+-- Replaces the single global ivfflat index from 007 with HNSW and adds a
+-- tenant-aware version of match_document_chunks.
+--
+-- Why: the global ANN index is scanned first and user_id / threshold are
+-- applied afterwards, so small tenants lose recall (their rows are rarely
+-- among the global nearest neighbours) while large tenants pay for big scans.
+--
+-- Strategy, chosen per call by match_document_chunks_v2:
+--   * small tenants (<= exact_threshold chunks): exact scan through the
+--     user_id btree index. Perfect recall, and cheap at that size.
+--   * large tenants with a dedicated partial HNSW index (see
+--     create_tenant_vector_index): ANN over that tenant's rows only.
+--   * other large tenants: the global HNSW index with pgvector 0.8 iterative
+--     scans, so filtering by user_id no longer starves the result set.
+-- ef_search can be tuned per call.
+
+-- 1. Indexes. pgvector cannot index vector columns above 2000 dimensions, so
+--    the HNSW index is built over a half-precision cast of the embedding
+--    (halfvec supports up to 4000). Results are reranked with full vectors.
+DROP INDEX IF EXISTS document_chunks_embedding_idx;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_user_id
+  ON document_chunks (user_id);
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_embedding_hnsw
+  ON document_chunks USING hnsw ((embedding::halfvec(3072)) halfvec_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- 2. Tenants that get their own partial HNSW index.
+CREATE TABLE IF NOT EXISTS vector_index_tenants (
+  user_id uuid PRIMARY KEY REFERENCES auth.users(id) ON DELETE CASCADE,
+  index_name text NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+ALTER TABLE vector_index_tenants ENABLE ROW LEVEL SECURITY;
+
+COMMENT ON TABLE vector_index_tenants IS 'Tenants with a dedicated partial HNSW index on document_chunks.';
+
+-- Builds (or rebuilds) a partial HNSW index covering a single tenant. Intended
+-- for the largest knowledge bases; run it from an ops session, as building an
+-- index blocks writes to document_chunks while it runs. Like
+-- drop_tenant_vector_index, it is executable by the service role only.
+CREATE OR REPLACE FUNCTION create_tenant_vector_index(p_user_id uuid)
+RETURNS text
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  idx text := 'idx_document_chunks_hnsw_' || replace(p_user_id::text, '-', '');
+BEGIN
+  EXECUTE format(
+    'CREATE INDEX IF NOT EXISTS %I ON document_chunks '
+    'USING hnsw ((embedding::halfvec(3072)) halfvec_cosine_ops) '
+    'WITH (m = 16, ef_construction = 64) WHERE user_id = %L',
+    idx, p_user_id
+  );
+  INSERT INTO vector_index_tenants (user_id, index_name)
+  VALUES (p_user_id, idx)
+  ON CONFLICT (user_id) DO UPDATE SET index_name = excluded.index_name;
+  RETURN idx;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION drop_tenant_vector_index(p_user_id uuid)
+RETURNS void
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  idx text;
+BEGIN
+  DELETE FROM vector_index_tenants WHERE user_id = p_user_id RETURNING index_name INTO idx;
+  IF idx IS NOT NULL THEN
+    EXECUTE format('DROP INDEX IF EXISTS %I', idx);
+  END IF;
+END;
+$$;
+
+-- Functions are executable by PUBLIC by default, which PostgREST exposes to
+-- the anon and authenticated roles.
+REVOKE EXECUTE ON FUNCTION create_tenant_vector_index(uuid) FROM public, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION drop_tenant_vector_index(uuid) FROM public, anon, authenticated;
+GRANT EXECUTE ON FUNCTION create_tenant_vector_index(uuid) TO service_role;
+GRANT EXECUTE ON FUNCTION drop_tenant_vector_index(uuid) TO service_role;
+
+-- 3. Tenant-aware matching RPC. match_document_chunks is kept unchanged so the
+--    API can be rolled back and the two versions benchmarked side by side.
+--    An earlier draft also took ivfflat probes; there is no ivfflat index left.
+DROP FUNCTION IF EXISTS match_document_chunks_v2(uuid, vector, float, int, uuid, int, int, int);
+CREATE OR REPLACE FUNCTION match_document_chunks_v2 (
+  p_user_id uuid,
+  query_embedding vector(3072),
+  match_threshold float,
+  match_count int,
+  p_agent_id uuid DEFAULT NULL,
+  ef_search int DEFAULT NULL,
+  exact_threshold int DEFAULT 2000
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  tenant_rows int;
+  ann_sql text;
+BEGIN
+  -- Bounded count: stops as soon as the tenant is known to be "large".
+  SELECT count(*) INTO tenant_rows
+  FROM (
+    SELECT 1 FROM document_chunks AS dc
+    WHERE dc.user_id = p_user_id
+    LIMIT exact_threshold + 1
+  ) AS t;
+
+  IF tenant_rows <= exact_threshold THEN
+    RETURN QUERY
+    SELECT
+      dc.id,
+      dc.document_id,
+      dc.content,
+      1 - (dc.embedding <=> query_embedding) AS similarity
+    FROM document_chunks AS dc
+    WHERE
+      dc.user_id = p_user_id
+      AND dc.embedding IS NOT NULL
+      AND (p_agent_id IS NULL OR dc.document_id IN (
+        SELECT d.id FROM documents AS d WHERE d.agent_id = p_agent_id))
+      AND (1 - (dc.embedding <=> query_embedding)) > match_threshold
+    ORDER BY dc.embedding <=> query_embedding
+    LIMIT match_count;
+    RETURN;
+  END IF;
+
+  -- Per-call tuning; is_local=true scopes the settings to this transaction.
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+  -- Keep scanning the index until enough rows survive the user_id filter.
+  PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+  -- The tenant id is inlined as a literal so the planner can match a
+  -- partial per-tenant index when one exists; otherwise the global index
+  -- is used. Candidates are reranked with the full-precision vectors.
+  ann_sql := format(
+    'WITH candidates AS ('
+    '  SELECT dc.id FROM document_chunks AS dc'
+    '  WHERE dc.user_id = %L AND dc.embedding IS NOT NULL'
+    '  ORDER BY dc.embedding::halfvec(3072) <=> $1::halfvec(3072)'
+    '  LIMIT $2'
+    ') '
+    'SELECT dc.id, dc.document_id, dc.content,'
+    '       1 - (dc.embedding <=> $1) AS similarity '
+    'FROM candidates JOIN document_chunks AS dc ON dc.id = candidates.id '
+    'WHERE ($3::uuid IS NULL OR dc.document_id IN ('
+    '        SELECT d.id FROM documents AS d WHERE d.agent_id = $3))'
+    '  AND (1 - (dc.embedding <=> $1)) > $4 '
+    'ORDER BY similarity DESC '
+    'LIMIT $5',
+    p_user_id
+  );
+
+  -- An agent filter removes candidates after the scan, so fetch extra.
+  RETURN QUERY EXECUTE ann_sql
+  USING query_embedding,
+        CASE WHEN p_agent_id IS NULL THEN match_count * 2 ELSE match_count * 8 END,
+        p_agent_id,
+        match_threshold,
+        match_count;
+END;
+$$;
@@ -0,0 +1,107 @@
+-- 014_hybrid_search.sql
+-- Hybrid retrieval: full-text and vector search run together and are merged
+-- with reciprocal-rank fusion (RRF). Lexical matching catches what cosine
+-- similarity misses: SKU codes, product names and prices.
+
+-- 1. Lexical index. The 'simple' configuration does no stemming or stop-word
+--    removal, so codes such as "AB-1234" and numbers are kept verbatim.
+ALTER TABLE document_chunks
+  ADD COLUMN IF NOT EXISTS content_tsv tsvector
+  GENERATED ALWAYS AS (to_tsvector('simple', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_document_chunks_content_tsv
+  ON document_chunks USING gin (content_tsv);
+
+-- 2. Any-term query: plainto_tsquery ANDs every word, which would drop chunks
+--    that mention the SKU but not the rest of a conversational question.
+CREATE OR REPLACE FUNCTION any_term_tsquery(query_text text)
+RETURNS tsquery
+LANGUAGE sql IMMUTABLE PARALLEL SAFE
+AS $$
+  SELECT nullif(replace(plainto_tsquery('simple', query_text)::text, ' & ', ' | '), '')::tsquery;
+$$;
+
+-- 3. Hybrid RPC. Each ranked list contributes weight / (rrf_k + rank); chunks
+--    found by both lists rise to the top. `similarity` is the cosine
+--    similarity when the chunk came from the vector list, otherwise NULL.
+CREATE OR REPLACE FUNCTION match_document_chunks_hybrid (
+  p_user_id uuid,
+  query_embedding vector(3072),
+  query_text text,
+  match_threshold float,
+  match_count int,
+  p_agent_id uuid DEFAULT NULL,
+  candidate_count int DEFAULT NULL,
+  rrf_k int DEFAULT 60,
+  full_text_weight float DEFAULT 1.0,
+  semantic_weight float DEFAULT 1.0,
+  ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float,
+  score float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  candidates int := coalesce(candidate_count, match_count * 4);
+  lexical_query tsquery := any_term_tsquery(query_text);
+BEGIN
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+  PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+  RETURN QUERY
+  -- NOT MATERIALIZED keeps the tenant filter inlined, so each list below can
+  -- still use its own index instead of scanning a materialized copy.
+  WITH scoped AS NOT MATERIALIZED (
+    SELECT dc.*
+    FROM document_chunks AS dc
+    WHERE dc.user_id = p_user_id
+      AND (p_agent_id IS NULL OR dc.document_id IN (
+        SELECT d.id FROM documents AS d WHERE d.agent_id = p_agent_id))
+  ),
+  -- Ranks are assigned after the LIMIT so the index scans stay bounded.
+  semantic AS (
+    SELECT c.id, c.similarity, row_number() OVER (ORDER BY c.distance) AS rank
+    FROM (
+      SELECT
+        s.id,
+        s.embedding::halfvec(3072) <=> query_embedding::halfvec(3072) AS distance,
+        1 - (s.embedding <=> query_embedding) AS similarity
+      FROM scoped AS s
+      WHERE s.embedding IS NOT NULL
+      ORDER BY s.embedding::halfvec(3072) <=> query_embedding::halfvec(3072)
+      LIMIT candidates
+    ) AS c
+  ),
+  lexical AS (
+    SELECT c.id, row_number() OVER (ORDER BY c.lexical_rank DESC) AS rank
+    FROM (
+      SELECT s.id, ts_rank_cd(s.content_tsv, lexical_query) AS lexical_rank
+      FROM scoped AS s
+      WHERE lexical_query IS NOT NULL AND s.content_tsv @@ lexical_query
+      ORDER BY lexical_rank DESC
+      LIMIT candidates
+    ) AS c
+  ),
+  fused AS (
+    SELECT
+      coalesce(sem.id, lex.id) AS id,
+      sem.similarity,
+      coalesce(semantic_weight / (rrf_k + sem.rank), 0.0)
+        + coalesce(full_text_weight / (rrf_k + lex.rank), 0.0) AS score
+    FROM (SELECT * FROM semantic WHERE semantic.similarity > match_threshold) AS sem
+    FULL OUTER JOIN lexical AS lex ON lex.id = sem.id
+  )
+  SELECT dc.id, dc.document_id, dc.content, f.similarity, f.score
+  FROM fused AS f
+  JOIN document_chunks AS dc ON dc.id = f.id
+  ORDER BY f.score DESC
+  LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,96 @@
+-- 015_multi_query_matching.sql
+-- Multi-query retrieval in a single round trip. The API expands a user query
+-- into several variants (original, history-rewritten, keywords), embeds them
+-- in one batch request and sends all embeddings here. Each embedding yields a
+-- ranked vector list, the combined variant text yields one full-text list,
+-- and all lists are fused with reciprocal-rank fusion and deduplicated.
+
+CREATE OR REPLACE FUNCTION match_document_chunks_multi (
+  p_user_id uuid,
+  -- JSON array of 3072-dim embeddings; jsonb keeps the PostgREST payload simple.
+  query_embeddings jsonb,
+  query_text text,
+  match_threshold float,
+  match_count int,
+  p_agent_id uuid DEFAULT NULL,
+  candidate_count int DEFAULT NULL,
+  rrf_k int DEFAULT 60,
+  ef_search int DEFAULT NULL
+)
+RETURNS TABLE (
+  id uuid,
+  document_id uuid,
+  content text,
+  similarity float,
+  score float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  candidates int := coalesce(candidate_count, match_count * 4);
+  lexical_query tsquery := any_term_tsquery(query_text);
+BEGIN
+  IF ef_search IS NOT NULL THEN
+    PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  END IF;
+  PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+
+  RETURN QUERY
+  WITH queries AS (
+    SELECT q.ord, (q.value::text)::vector(3072) AS embedding
+    FROM jsonb_array_elements(query_embeddings) WITH ORDINALITY AS q(value, ord)
+  ),
+  scoped AS NOT MATERIALIZED (
+    SELECT dc.*
+    FROM document_chunks AS dc
+    WHERE dc.user_id = p_user_id
+      AND (p_agent_id IS NULL OR dc.document_id IN (
+        SELECT d.id FROM documents AS d WHERE d.agent_id = p_agent_id))
+  ),
+  -- One bounded index scan per query embedding.
+  semantic AS (
+    SELECT
+      c.id,
+      c.similarity,
+      row_number() OVER (PARTITION BY queries.ord ORDER BY c.distance) AS rank
+    FROM queries
+    CROSS JOIN LATERAL (
+      SELECT
+        s.id,
+        s.embedding::halfvec(3072) <=> queries.embedding::halfvec(3072) AS distance,
+        1 - (s.embedding <=> queries.embedding) AS similarity
+      FROM scoped AS s
+      WHERE s.embedding IS NOT NULL
+      ORDER BY s.embedding::halfvec(3072) <=> queries.embedding::halfvec(3072)
+      LIMIT candidates
+    ) AS c
+  ),
+  lexical AS (
+    SELECT c.id, row_number() OVER (ORDER BY c.lexical_rank DESC) AS rank
+    FROM (
+      SELECT s.id, ts_rank_cd(s.content_tsv, lexical_query) AS lexical_rank
+      FROM scoped AS s
+      WHERE lexical_query IS NOT NULL AND s.content_tsv @@ lexical_query
+      ORDER BY lexical_rank DESC
+      LIMIT candidates
+    ) AS c
+  ),
+  fused AS (
+    SELECT u.id, max(u.similarity) AS similarity, sum(u.score) AS score
+    FROM (
+      SELECT sem.id, sem.similarity, 1.0 / (rrf_k + sem.rank) AS score
+      FROM semantic AS sem
+      WHERE sem.similarity > match_threshold
+      UNION ALL
+      SELECT lex.id, NULL::float, 1.0 / (rrf_k + lex.rank)
+      FROM lexical AS lex
+    ) AS u
+    GROUP BY u.id
+  )
+  SELECT dc.id, dc.document_id, dc.content, f.similarity, f.score::float
+  FROM fused AS f
+  JOIN document_chunks AS dc ON dc.id = f.id
+  ORDER BY f.score DESC
+  LIMIT match_count;
+END;
+$$;
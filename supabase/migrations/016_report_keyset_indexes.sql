@@ -0,0 +1,21 @@
+-- 016_report_keyset_indexes.sql
+-- The /reports/* endpoints page through each table with keyset pagination,
+-- ordered by (created_at, id) descending within a user. These composite
+-- indexes let every page be served by an index range scan, however deep.
+-- The report tables are created outside these migrations, so each index is
+-- only created when its table exists.
+
+DO $$
+DECLARE
+  t text;
+BEGIN
+  FOREACH t IN ARRAY ARRAY['opportunity_briefs', 'performance_logs', 'executive_summaries'] LOOP
+    IF to_regclass('public.' || t) IS NOT NULL THEN
+      EXECUTE format(
+        'CREATE INDEX IF NOT EXISTS %I ON public.%I (user_id, created_at DESC, id DESC)',
+        'idx_' || t || '_user_keyset', t
+      );
+    END IF;
+  END LOOP;
+END;
+$$;
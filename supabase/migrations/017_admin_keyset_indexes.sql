@@ -0,0 +1,17 @@
+-- 017_admin_keyset_indexes.sql
+-- Admin listings and bulk exports page through agents and conversations
+-- ordered by (created_at, id) descending. These indexes serve every page
+-- with an index range scan, so deep pages cost the same as the first one.
+
+CREATE INDEX IF NOT EXISTS idx_agents_keyset
+  ON public.agents (created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_keyset
+  ON public.conversations (created_at DESC, id DESC);
+
+-- Filtered exports (per user or per agent) keep the same order.
+CREATE INDEX IF NOT EXISTS idx_conversations_user_keyset
+  ON public.conversations (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_conversations_agent_keyset
+  ON public.conversations (agent_id, created_at DESC, id DESC);
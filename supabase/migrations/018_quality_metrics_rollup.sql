@@ -0,0 +1,245 @@
+-- 018_quality_metrics_rollup.sql
+-- /quality/metrics reads one precomputed row per user. This migration adds
+-- the pipeline that fills it: rollup_quality_metrics() folds conversations
+-- newer than a (created_at, id) watermark into per-agent and per-user
+-- rollups (counts, sums and a response-time histogram), one batch at a time.
+-- Conversations are never rescanned, so reading metrics stays O(1).
+
+-- 1. Raw signals on each conversation turn.
+ALTER TABLE public.conversations
+  ADD COLUMN IF NOT EXISTS response_time_ms integer,
+  ADD COLUMN IF NOT EXISTS csat smallint CHECK (csat BETWEEN 1 AND 5);
+
+COMMENT ON COLUMN public.conversations.response_time_ms IS 'Time taken to generate bot_response, in milliseconds.';
+COMMENT ON COLUMN public.conversations.csat IS 'Customer satisfaction score (1-5) given for this turn, if any.';
+
+-- The watermark walk reads conversations in (created_at, id) order.
+CREATE INDEX IF NOT EXISTS idx_conversations_created_at_id
+  ON public.conversations (created_at, id);
+
+-- 2. Rollup tables. response_time_histogram holds one count per bucket with
+-- upper bounds of 500, 1000, 2000, 5000, 10000 and 30000 ms, plus an
+-- overflow bucket for anything slower.
+CREATE TABLE IF NOT EXISTS public.quality_metrics_agent (
+  user_id uuid NOT NULL,
+  agent_id uuid NOT NULL,
+  conversations_count bigint NOT NULL DEFAULT 0,
+  response_time_count bigint NOT NULL DEFAULT 0,
+  response_time_sum_ms bigint NOT NULL DEFAULT 0,
+  response_time_histogram bigint[] NOT NULL DEFAULT '{0,0,0,0,0,0,0}',
+  csat_count bigint NOT NULL DEFAULT 0,
+  csat_sum bigint NOT NULL DEFAULT 0,
+  avg_response_time_sec double precision NOT NULL DEFAULT 0,
+  csat double precision NOT NULL DEFAULT 0,
+  updated_at timestamptz NOT NULL DEFAULT now(),
+  PRIMARY KEY (user_id, agent_id)
+);
+
+-- quality_metrics may predate this migration; only add what is missing.
+CREATE TABLE IF NOT EXISTS public.quality_metrics (
+  user_id uuid PRIMARY KEY
+);
+
+ALTER TABLE public.quality_metrics
+  ADD COLUMN IF NOT EXISTS conversations_reviewed bigint NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS avg_response_time_sec double precision NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS csat double precision NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS response_time_count bigint NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS response_time_sum_ms bigint NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS response_time_histogram bigint[] NOT NULL DEFAULT '{0,0,0,0,0,0,0}',
+  ADD COLUMN IF NOT EXISTS csat_count bigint NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS csat_sum bigint NOT NULL DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS updated_at timestamptz NOT NULL DEFAULT now();
+
+CREATE TABLE IF NOT EXISTS public.rollup_watermarks (
+  name text PRIMARY KEY,
+  last_created_at timestamptz NOT NULL DEFAULT '-infinity',
+  last_id uuid NOT NULL DEFAULT '00000000-0000-0000-0000-000000000000',
+  updated_at timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO public.rollup_watermarks (name) VALUES ('quality_metrics')
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE public.quality_metrics_agent ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.quality_metrics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.rollup_watermarks ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.bigint_array_add(a bigint[], b bigint[])
+RETURNS bigint[]
+LANGUAGE sql IMMUTABLE
+AS $$
+  SELECT array_agg(coalesce(a[i], 0) + coalesce(b[i], 0) ORDER BY i)
+  FROM generate_series(1, greatest(cardinality(a), cardinality(b))) AS i;
+$$;
+
+-- 3. Folds one batch of conversations past the watermark into the rollups
+-- and advances the watermark, all in one transaction. Rows younger than
+-- `settle_interval` are left for a later run so that turns committed slightly
+-- out of created_at order are not skipped. Returns the number of rows folded;
+-- call it until it returns 0.
+CREATE OR REPLACE FUNCTION public.rollup_quality_metrics(
+  batch_size int DEFAULT 5000,
+  settle_interval interval DEFAULT '1 minute'
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  wm record;
+  folded integer;
+BEGIN
+  -- Serializes concurrent runs of the job.
+  SELECT last_created_at, last_id INTO wm
+  FROM public.rollup_watermarks
+  WHERE name = 'quality_metrics'
+  FOR UPDATE;
+
+  WITH batch AS (
+    SELECT c.id, c.user_id, c.agent_id, c.created_at, c.response_time_ms, c.csat,
+           width_bucket(c.response_time_ms, ARRAY[500, 1000, 2000, 5000, 10000, 30000]) + 1 AS bucket
+    FROM public.conversations c
+    WHERE (c.created_at, c.id) > (wm.last_created_at, wm.last_id)
+      AND c.created_at < now() - settle_interval
+    ORDER BY c.created_at, c.id
+    LIMIT batch_size
+  ),
+  deltas AS (
+    SELECT user_id, agent_id,
+           count(*) AS conversations_count,
+           count(response_time_ms) AS response_time_count,
+           coalesce(sum(response_time_ms), 0) AS response_time_sum_ms,
+           ARRAY[
+             count(*) FILTER (WHERE bucket = 1), count(*) FILTER (WHERE bucket = 2),
+             count(*) FILTER (WHERE bucket = 3), count(*) FILTER (WHERE bucket = 4),
+             count(*) FILTER (WHERE bucket = 5), count(*) FILTER (WHERE bucket = 6),
+             count(*) FILTER (WHERE bucket = 7)
+           ] AS response_time_histogram,
+           count(csat) AS csat_count,
+           coalesce(sum(csat), 0) AS csat_sum
+    FROM batch
+    GROUP BY user_id, agent_id
+  ),
+  agent_rollup AS (
+    INSERT INTO public.quality_metrics_agent AS m (
+      user_id, agent_id, conversations_count, response_time_count, response_time_sum_ms,
+      response_time_histogram, csat_count, csat_sum, avg_response_time_sec, csat
+    )
+    SELECT d.user_id, d.agent_id, d.conversations_count, d.response_time_count, d.response_time_sum_ms,
+           d.response_time_histogram, d.csat_count, d.csat_sum,
+           coalesce(d.response_time_sum_ms / 1000.0 / nullif(d.response_time_count, 0), 0),
+           coalesce(d.csat_sum::double precision / nullif(d.csat_count, 0), 0)
+    FROM deltas d
+    ON CONFLICT (user_id, agent_id) DO UPDATE SET
+      conversations_count = m.conversations_count + EXCLUDED.conversations_count,
+      response_time_count = m.response_time_count + EXCLUDED.response_time_count,
+      response_time_sum_ms = m.response_time_sum_ms + EXCLUDED.response_time_sum_ms,
+      response_time_histogram = public.bigint_array_add(m.response_time_histogram, EXCLUDED.response_time_histogram),
+      csat_count = m.csat_count + EXCLUDED.csat_count,
+      csat_sum = m.csat_sum + EXCLUDED.csat_sum,
+      avg_response_time_sec = coalesce(
+        (m.response_time_sum_ms + EXCLUDED.response_time_sum_ms) / 1000.0
+        / nullif(m.response_time_count + EXCLUDED.response_time_count, 0), 0),
+      csat = coalesce(
+        (m.csat_sum + EXCLUDED.csat_sum)::double precision
+        / nullif(m.csat_count + EXCLUDED.csat_count, 0), 0),
+      updated_at = now()
+  ),
+  user_deltas AS (
+    SELECT user_id,
+           sum(conversations_count)::bigint AS conversations_count,
+           sum(response_time_count)::bigint AS response_time_count,
+           sum(response_time_sum_ms)::bigint AS response_time_sum_ms,
+           ARRAY[
+             sum(response_time_histogram[1]), sum(response_time_histogram[2]),
+             sum(response_time_histogram[3]), sum(response_time_histogram[4]),
+             sum(response_time_histogram[5]), sum(response_time_histogram[6]),
+             sum(response_time_histogram[7])
+           ]::bigint[] AS response_time_histogram,
+           sum(csat_count)::bigint AS csat_count,
+           sum(csat_sum)::bigint AS csat_sum
+    FROM deltas
+    GROUP BY user_id
+  ),
+  user_rollup AS (
+    INSERT INTO public.quality_metrics AS m (
+      user_id, conversations_reviewed, response_time_count, response_time_sum_ms,
+      response_time_histogram, csat_count, csat_sum, avg_response_time_sec, csat
+    )
+    SELECT d.user_id, d.conversations_count, d.response_time_count, d.response_time_sum_ms,
+           d.response_time_histogram, d.csat_count, d.csat_sum,
+           coalesce(d.response_time_sum_ms / 1000.0 / nullif(d.response_time_count, 0), 0),
+           coalesce(d.csat_sum::double precision / nullif(d.csat_count, 0), 0)
+    FROM user_deltas d
+    ON CONFLICT (user_id) DO UPDATE SET
+      conversations_reviewed = m.conversations_reviewed + EXCLUDED.conversations_reviewed,
+      response_time_count = m.response_time_count + EXCLUDED.response_time_count,
+      response_time_sum_ms = m.response_time_sum_ms + EXCLUDED.response_time_sum_ms,
+      response_time_histogram = public.bigint_array_add(m.response_time_histogram, EXCLUDED.response_time_histogram),
+      csat_count = m.csat_count + EXCLUDED.csat_count,
+      csat_sum = m.csat_sum + EXCLUDED.csat_sum,
+      avg_response_time_sec = coalesce(
+        (m.response_time_sum_ms + EXCLUDED.response_time_sum_ms) / 1000.0
+        / nullif(m.response_time_count + EXCLUDED.response_time_count, 0), 0),
+      csat = coalesce(
+        (m.csat_sum + EXCLUDED.csat_sum)::double precision
+        / nullif(m.csat_count + EXCLUDED.csat_count, 0), 0),
+      updated_at = now()
+  ),
+  advance AS (
+    UPDATE public.rollup_watermarks w
+    SET last_created_at = l.created_at, last_id = l.id, updated_at = now()
+    FROM (SELECT created_at, id FROM batch ORDER BY created_at DESC, id DESC LIMIT 1) l
+    WHERE w.name = 'quality_metrics'
+  )
+  SELECT count(*) INTO folded FROM batch;
+
+  RETURN folded;
+END;
+$$;
+
+-- 4. A CSAT score usually arrives after its turn has been folded. Apply the
+-- change directly to the rollups in that case; turns still past the
+-- watermark will be picked up by the next rollup run.
+CREATE OR REPLACE FUNCTION public.apply_csat_to_quality_rollups()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  wm record;
+  count_delta integer := (NEW.csat IS NOT NULL)::int - (OLD.csat IS NOT NULL)::int;
+  sum_delta integer := coalesce(NEW.csat, 0) - coalesce(OLD.csat, 0);
+BEGIN
+  SELECT last_created_at, last_id INTO wm
+  FROM public.rollup_watermarks
+  WHERE name = 'quality_metrics'
+  FOR SHARE;
+
+  IF (NEW.created_at, NEW.id) > (wm.last_created_at, wm.last_id) THEN
+    RETURN NEW;
+  END IF;
+
+  UPDATE public.quality_metrics_agent
+  SET csat_count = csat_count + count_delta,
+      csat_sum = csat_sum + sum_delta,
+      csat = coalesce((csat_sum + sum_delta)::double precision / nullif(csat_count + count_delta, 0), 0),
+      updated_at = now()
+  WHERE user_id = NEW.user_id AND agent_id = NEW.agent_id;
+
+  UPDATE public.quality_metrics
+  SET csat_count = csat_count + count_delta,
+      csat_sum = csat_sum + sum_delta,
+      csat = coalesce((csat_sum + sum_delta)::double precision / nullif(csat_count + count_delta, 0), 0),
+      updated_at = now()
+  WHERE user_id = NEW.user_id;
+
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS conversations_csat_rollup ON public.conversations;
+CREATE TRIGGER conversations_csat_rollup
+AFTER UPDATE OF csat ON public.conversations
+FOR EACH ROW
+WHEN (OLD.csat IS DISTINCT FROM NEW.csat)
+EXECUTE FUNCTION public.apply_csat_to_quality_rollups();
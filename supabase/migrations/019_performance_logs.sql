@@ -0,0 +1,40 @@
+-- 019_performance_logs.sql
+-- Per-turn timing records written in batches by ProcessChatMessage and read
+-- by /reports/performance-log. Every stage is an integer millisecond count,
+-- so a row stays small at one row per chat turn.
+--   ingest_ms      time spent in the ingest endpoint before enqueueing
+--   queue_wait_ms  time between enqueueing and processing starting
+--   retrieval_ms   embedding plus chunk search
+--   generation_ms  LLM call
+--   total_ms       end to end, from ingest to reply
+-- Stages that were not measured for a turn are NULL.
+
+CREATE TABLE IF NOT EXISTS public.performance_logs (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  user_id uuid NOT NULL,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- The table may predate this migration; only add what is missing.
+ALTER TABLE public.performance_logs
+  ADD COLUMN IF NOT EXISTS agent_id uuid,
+  ADD COLUMN IF NOT EXISTS ingest_ms integer,
+  ADD COLUMN IF NOT EXISTS queue_wait_ms integer,
+  ADD COLUMN IF NOT EXISTS retrieval_ms integer,
+  ADD COLUMN IF NOT EXISTS generation_ms integer,
+  ADD COLUMN IF NOT EXISTS total_ms integer;
+
+-- Keyset pages per tenant (see 016), and per agent for regression tracking.
+CREATE INDEX IF NOT EXISTS idx_performance_logs_user_keyset
+  ON public.performance_logs (user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_performance_logs_agent_created_at
+  ON public.performance_logs (agent_id, created_at DESC);
+
+ALTER TABLE public.performance_logs ENABLE ROW LEVEL SECURITY;
+
+-- Rows are written by the backend with the service role, which bypasses RLS.
+DROP POLICY IF EXISTS "Users can read their own performance logs" ON public.performance_logs;
+CREATE POLICY "Users can read their own performance logs"
+ON public.performance_logs
+FOR SELECT
+USING (user_id = auth.uid());
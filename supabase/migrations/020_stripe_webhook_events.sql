@@ -0,0 +1,115 @@
+-- 020_stripe_webhook_events.sql
+-- Durable dedup store for Stripe webhooks. /webhook verifies an event,
+-- inserts it here keyed by its Stripe event ID and returns 200; a background
+-- processor applies it afterwards. Stripe retries of an event already stored
+-- are acknowledged without being applied twice, and events that failed or
+-- were interrupted can be replayed from this table.
+
+CREATE TABLE IF NOT EXISTS public.stripe_webhook_events (
+  id text PRIMARY KEY,                 -- Stripe event ID (evt_...)
+  type text NOT NULL,
+  ordering_key text NOT NULL,          -- subscription ID, or the event ID when there is none
+  stripe_created bigint NOT NULL,      -- event.created, epoch seconds
+  payload jsonb NOT NULL,
+  status text NOT NULL DEFAULT 'pending'
+    CHECK (status IN ('pending', 'processed', 'failed')),
+  attempts integer NOT NULL DEFAULT 0,
+  last_error text,
+  received_at timestamptz NOT NULL DEFAULT now(),
+  processed_at timestamptz
+);
+
+COMMENT ON TABLE public.stripe_webhook_events IS 'Stripe webhook events received, for deduplication and replay.';
+
+-- Replay scans only the unprocessed events, oldest first.
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_unprocessed
+  ON public.stripe_webhook_events (stripe_created, id)
+  WHERE status <> 'processed';
+
+ALTER TABLE public.stripe_webhook_events ENABLE ROW LEVEL SECURITY;
+
+-- Stripe does not deliver events in order. Each subscription remembers the
+-- creation time of the last event applied to it, so an older event arriving
+-- late cannot overwrite newer state.
+ALTER TABLE public.subscriptions
+  ADD COLUMN IF NOT EXISTS stripe_event_created bigint;
+
+-- Applies a customer.subscription.* event unless a newer one was already
+-- applied. Returns 'applied', 'stale', or 'missing' when the subscription
+-- row does not exist yet (its checkout event has not been processed).
+CREATE OR REPLACE FUNCTION public.apply_subscription_event(
+  p_stripe_subscription_id text,
+  p_status public.subscription_status,
+  p_cancel_at_period_end boolean,
+  p_current_period_start timestamptz,
+  p_current_period_end timestamptz,
+  p_event_created bigint
+)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  last_created bigint;
+BEGIN
+  SELECT stripe_event_created INTO last_created
+  FROM public.subscriptions
+  WHERE stripe_subscription_id = p_stripe_subscription_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN 'missing';
+  END IF;
+  IF last_created IS NOT NULL AND last_created > p_event_created THEN
+    RETURN 'stale';
+  END IF;
+
+  UPDATE public.subscriptions
+  SET status = p_status,
+      cancel_at_period_end = p_cancel_at_period_end,
+      current_period_start = coalesce(p_current_period_start, current_period_start),
+      current_period_end = coalesce(p_current_period_end, current_period_end),
+      stripe_event_created = p_event_created
+  WHERE stripe_subscription_id = p_stripe_subscription_id;
+  RETURN 'applied';
+END;
+$$;
+
+-- Creates or updates a subscription from its checkout.session.completed
+-- event, unless a newer event was already applied to it: a checkout
+-- replayed after an update must not roll its state back. Returns the
+-- stored row either way.
+CREATE OR REPLACE FUNCTION public.upsert_checkout_subscription(
+  p_user_id uuid,
+  p_plan_id text,
+  p_status public.subscription_status,
+  p_stripe_subscription_id text,
+  p_stripe_customer_id text,
+  p_current_period_start timestamptz,
+  p_current_period_end timestamptz,
+  p_cancel_at_period_end boolean,
+  p_event_created bigint
+)
+RETURNS SETOF public.subscriptions
+LANGUAGE sql
+AS $$
+  INSERT INTO public.subscriptions AS s (
+    user_id, plan_id, status, stripe_subscription_id, stripe_customer_id,
+    current_period_start, current_period_end, cancel_at_period_end, stripe_event_created
+  )
+  VALUES (
+    p_user_id, p_plan_id, p_status, p_stripe_subscription_id, p_stripe_customer_id,
+    p_current_period_start, p_current_period_end, p_cancel_at_period_end, p_event_created
+  )
+  ON CONFLICT (stripe_subscription_id) DO UPDATE SET
+    user_id = EXCLUDED.user_id,
+    plan_id = EXCLUDED.plan_id,
+    status = EXCLUDED.status,
+    stripe_customer_id = EXCLUDED.stripe_customer_id,
+    current_period_start = EXCLUDED.current_period_start,
+    current_period_end = EXCLUDED.current_period_end,
+    cancel_at_period_end = EXCLUDED.cancel_at_period_end,
+    stripe_event_created = EXCLUDED.stripe_event_created
+  WHERE s.stripe_event_created IS NULL OR s.stripe_event_created <= EXCLUDED.stripe_event_created;
+
+  SELECT * FROM public.subscriptions WHERE stripe_subscription_id = p_stripe_subscription_id;
+$$;
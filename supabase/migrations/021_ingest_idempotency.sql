@@ -0,0 +1,52 @@
+-- 021_ingest_idempotency.sql
+-- The WhatsApp gateway retries a message when the ingest call times out.
+-- Each message is claimed here by its gateway message ID before credits are
+-- debited, and the response sent for it is stored, so a retry gets the
+-- original response back instead of debiting and enqueueing again.
+-- A claim still 'processing' after its lease belonged to an API instance
+-- that died before settling it, and a retry may take it over.
+
+CREATE TABLE IF NOT EXISTS public.ingest_requests (
+  message_id text PRIMARY KEY,
+  status text NOT NULL DEFAULT 'processing'
+    CHECK (status IN ('processing', 'completed')),
+  response_status integer,
+  response_body jsonb,
+  claimed_at timestamptz NOT NULL DEFAULT now(),
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE public.ingest_requests IS 'Gateway message IDs already ingested, with the response sent for each.';
+
+CREATE INDEX IF NOT EXISTS idx_ingest_requests_created_at
+  ON public.ingest_requests (created_at);
+
+ALTER TABLE public.ingest_requests ENABLE ROW LEVEL SECURITY;
+
+-- Claims message IDs, taking over 'processing' claims older than p_lease.
+-- Returns the IDs claimed by this call; the others were seen before.
+CREATE OR REPLACE FUNCTION public.claim_ingest_requests(p_message_ids text[], p_lease interval)
+RETURNS SETOF text
+LANGUAGE sql
+AS $$
+  INSERT INTO public.ingest_requests (message_id)
+  SELECT DISTINCT unnest(p_message_ids)
+  ON CONFLICT (message_id) DO UPDATE SET claimed_at = now()
+    WHERE ingest_requests.status = 'processing'
+      AND ingest_requests.claimed_at < now() - p_lease
+  RETURNING message_id;
+$$;
+
+-- Gateway retries stop within minutes; keys only need to outlive them.
+-- Schedule with pg_cron, e.g. hourly: SELECT purge_ingest_requests('1 day');
+CREATE OR REPLACE FUNCTION public.purge_ingest_requests(older_than interval DEFAULT '1 day')
+RETURNS integer
+LANGUAGE sql
+AS $$
+  WITH purged AS (
+    DELETE FROM public.ingest_requests
+    WHERE created_at < now() - older_than
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM purged;
+$$;
@@ -0,0 +1,45 @@
+-- 022_decrement_credits_batch.sql
+-- Multi-user counterpart to decrement_credits (009), used by the batch ingest
+-- endpoint to debit the credits of a whole batch in one call.
+--
+-- p_requests is a JSON array of {"user_id": uuid, "amount": int}. Each user
+-- is granted as many credits as requested or as remain, whichever is lower,
+-- so a batch is partially accepted when a balance runs out. Users without an
+-- active subscription are granted 0.
+
+create or replace function decrement_credits_batch(p_requests jsonb)
+returns table (user_id uuid, granted int, new_credits int) as $$
+#variable_conflict use_column
+declare
+    req record;
+    sub record;
+begin
+    -- Subscriptions are locked in user_id order so that concurrent batches
+    -- touching the same users cannot deadlock.
+    for req in
+        select (r->>'user_id')::uuid as requester, sum((r->>'amount')::int)::int as amount
+        from jsonb_array_elements(p_requests) as r
+        group by 1
+        order by 1
+    loop
+        select s.id, s.message_credits into sub
+        from public.subscriptions s
+        where s.user_id = req.requester and s.status = 'active'
+        limit 1
+        for update;
+
+        user_id := req.requester;
+        if not found then
+            granted := 0;
+            new_credits := 0;
+        else
+            granted := least(req.amount, greatest(sub.message_credits, 0));
+            update public.subscriptions
+            set message_credits = message_credits - granted
+            where id = sub.id
+            returning message_credits into new_credits;
+        end if;
+        return next;
+    end loop;
+end;
+$$ language plpgsql security definer;
@@ -0,0 +1,87 @@
+-- 023_message_outbox.sql
+-- Transactional outbox for WhatsApp ingest. Debiting a message credit and
+-- recording the message to enqueue happen in one transaction, so a message
+-- is never charged without being delivered nor delivered without being
+-- charged. A relay in the API (infrastructure/outbox_relay.py) publishes
+-- outbox rows to the Cloudflare queue in batches and deletes them once
+-- published.
+
+CREATE TABLE IF NOT EXISTS public.message_outbox (
+  id bigint GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+  payload jsonb NOT NULL,
+  attempts integer NOT NULL DEFAULT 0,
+  -- Rows are claimed by pushing this forward (a lease) and retried once it passes.
+  available_at timestamptz NOT NULL DEFAULT now(),
+  last_error text,
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE public.message_outbox IS 'Ingested messages waiting to be published to the processing queue.';
+
+CREATE INDEX IF NOT EXISTS idx_message_outbox_available
+  ON public.message_outbox (available_at, id);
+
+ALTER TABLE public.message_outbox ENABLE ROW LEVEL SECURITY;
+
+-- Debits one credit and stores the message in the outbox, or does neither.
+create or replace function enqueue_message(p_user_id uuid, p_payload jsonb)
+returns table (success boolean, new_credits int) as $$
+declare
+    debit record;
+begin
+    select * into debit from decrement_credits(p_user_id, 1);
+    if debit.success then
+        insert into public.message_outbox (payload) values (p_payload);
+    end if;
+    return query select debit.success, debit.new_credits;
+end;
+$$ language plpgsql security definer;
+
+-- Batch counterpart of enqueue_message. p_messages is a JSON array of
+-- {"user_id": uuid, "payload": {...}}; each user's messages are accepted in
+-- array order while their credits last (see decrement_credits_batch, 022).
+-- Returns whether each message, by its index in the array, was accepted.
+create or replace function enqueue_messages_batch(p_messages jsonb)
+returns table (message_index int, accepted boolean) as $$
+    with messages as (
+        select (ord - 1)::int as message_index,
+               (m->>'user_id')::uuid as requester,
+               m->'payload' as payload,
+               row_number() over (partition by m->>'user_id' order by ord) as rank
+        from jsonb_array_elements(p_messages) with ordinality as t(m, ord)
+    ),
+    granted as (
+        select g.user_id, g.granted
+        from decrement_credits_batch(
+            (select jsonb_agg(jsonb_build_object('user_id', requester, 'amount', 1)) from messages)
+        ) g
+    ),
+    decided as (
+        select m.message_index, m.payload, m.rank <= coalesce(g.granted, 0) as accepted
+        from messages m
+        left join granted g on g.user_id = m.requester
+    ),
+    inserted as (
+        insert into public.message_outbox (payload)
+        select payload from decided where accepted order by message_index
+        returning 1
+    )
+    select message_index, accepted from decided order by message_index;
+$$ language sql security definer;
+
+-- Leases up to p_limit publishable rows to a relay. SKIP LOCKED lets several
+-- API instances relay concurrently without publishing the same rows.
+create or replace function claim_outbox_messages(p_limit int, p_lease_seconds int)
+returns setof public.message_outbox as $$
+    update public.message_outbox o
+    set attempts = o.attempts + 1,
+        available_at = now() + make_interval(secs => p_lease_seconds)
+    where o.id in (
+        select id from public.message_outbox
+        where available_at <= now()
+        order by id
+        limit p_limit
+        for update skip locked
+    )
+    returning o.*;
+$$ language sql security definer;
@@ -0,0 +1,58 @@
+-- 024_rate_limits.sql
+-- Per-plan request rate limits enforced by the API's admission control
+-- (api/core/admission.py), and the shared counters API instances use to
+-- keep those limits fleet-wide.
+
+-- 1. Limits per plan: a steady rate and a burst allowance, for the whole
+--    tenant and for each of its agents.
+alter table public.plans
+add column if not exists rate_limit_per_minute integer not null default 20,
+add column if not exists rate_limit_burst integer not null default 10,
+add column if not exists agent_rate_limit_per_minute integer not null default 10,
+add column if not exists agent_rate_limit_burst integer not null default 5;
+
+comment on column public.plans.rate_limit_per_minute is 'Sustained API and message requests per minute allowed per tenant.';
+comment on column public.plans.rate_limit_burst is 'Requests a tenant may make at once before the per-minute rate applies.';
+
+update public.plans
+set rate_limit_per_minute = 120,
+    rate_limit_burst = 60,
+    agent_rate_limit_per_minute = 60,
+    agent_rate_limit_burst = 30
+where id = 'pro';
+
+-- 2. Tokens consumed per bucket by each API instance. Counters only grow
+--    while an instance runs; rows of stopped instances age out.
+create table if not exists public.rate_limit_usage (
+    bucket_key text not null,
+    instance_id text not null,
+    consumed bigint not null default 0,
+    updated_at timestamptz not null default now(),
+    primary key (bucket_key, instance_id)
+);
+
+alter table public.rate_limit_usage enable row level security;
+
+-- Adds an instance's consumption since its last sync and returns, per
+-- bucket, the totals of the other instances seen in the last 10 minutes.
+create or replace function sync_rate_limit_usage(p_instance_id text, p_consumed jsonb)
+returns table (bucket_key text, others_consumed bigint) as $$
+    with reported as (
+        insert into public.rate_limit_usage as u (bucket_key, instance_id, consumed)
+        select key, p_instance_id, value::bigint from jsonb_each_text(p_consumed)
+        on conflict (bucket_key, instance_id)
+        do update set consumed = u.consumed + excluded.consumed, updated_at = now()
+        returning 1
+    )
+    select u.bucket_key, sum(u.consumed)::bigint
+    from public.rate_limit_usage u
+    where u.instance_id <> p_instance_id
+      and u.updated_at > now() - interval '10 minutes'
+    group by u.bucket_key;
+$$ language sql security definer;
+
+-- Schedule with pg_cron, e.g. hourly: SELECT purge_rate_limit_usage();
+create or replace function purge_rate_limit_usage()
+returns void as $$
+    delete from public.rate_limit_usage where updated_at < now() - interval '1 hour';
+$$ language sql;
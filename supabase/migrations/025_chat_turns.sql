@@ -0,0 +1,53 @@
+-- 025_chat_turns.sql
+-- The chat queue delivers at least once: the outbox relay republishes a batch
+-- whose publish failed halfway, and the queue redelivers messages whose lease
+-- ran out. The chat consumer claims each message by its gateway message ID
+-- before answering it, so a duplicate does not run a second LLM turn or log
+-- the conversation twice.
+
+CREATE TABLE IF NOT EXISTS public.chat_turns (
+  message_id text PRIMARY KEY,
+  status text NOT NULL DEFAULT 'processing'
+    CHECK (status IN ('processing', 'completed')),
+  claimed_at timestamptz NOT NULL DEFAULT now(),
+  created_at timestamptz NOT NULL DEFAULT now()
+);
+
+COMMENT ON TABLE public.chat_turns IS 'Gateway message IDs the chat consumer has answered or is answering.';
+
+CREATE INDEX IF NOT EXISTS idx_chat_turns_created_at
+  ON public.chat_turns (created_at);
+
+ALTER TABLE public.chat_turns ENABLE ROW LEVEL SECURITY;
+
+-- Claims a message ID. A claim still 'processing' after p_lease belonged to a
+-- consumer that died mid-turn and can be taken over. Returns false when the
+-- message was already answered or another consumer is answering it.
+CREATE OR REPLACE FUNCTION public.claim_chat_turn(p_message_id text, p_lease interval)
+RETURNS boolean
+LANGUAGE sql
+AS $$
+  WITH claimed AS (
+    INSERT INTO public.chat_turns (message_id)
+    VALUES (p_message_id)
+    ON CONFLICT (message_id) DO UPDATE SET claimed_at = now()
+      WHERE chat_turns.status = 'processing'
+        AND chat_turns.claimed_at < now() - p_lease
+    RETURNING 1
+  )
+  SELECT EXISTS (SELECT 1 FROM claimed);
+$$;
+
+-- Redeliveries stop once the queue drops a message; keys only need to outlive them.
+-- Schedule with pg_cron, e.g. hourly: SELECT purge_chat_turns('1 day');
+CREATE OR REPLACE FUNCTION public.purge_chat_turns(older_than interval DEFAULT '1 day')
+RETURNS integer
+LANGUAGE sql
+AS $$
+  WITH purged AS (
+    DELETE FROM public.chat_turns
+    WHERE created_at < now() - older_than
+    RETURNING 1
+  )
+  SELECT count(*)::integer FROM purged;
+$$;
@@ -0,0 +1,45 @@
+-- 026_document_segments.sql
+-- Uploaded documents reach the embedding worker in page-aligned segments
+-- (a single one for plain text). Each segment is stored as its own
+-- document_chunks rows, keyed by the document, its first page and the chunk's
+-- position in the segment, so a redelivered segment overwrites its rows
+-- instead of adding new ones. A document is completed once every segment
+-- the API published has been stored.
+
+ALTER TABLE public.document_chunks
+  ADD COLUMN IF NOT EXISTS page_start integer,
+  ADD COLUMN IF NOT EXISTS page_end integer,
+  ADD COLUMN IF NOT EXISTS chunk_index integer NOT NULL DEFAULT 0;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_document_chunks_segment
+  ON public.document_chunks (document_id, page_start, chunk_index);
+
+ALTER TABLE public.documents
+  ADD COLUMN IF NOT EXISTS segment_count integer;
+
+COMMENT ON COLUMN public.documents.segment_count IS 'Queue segments the document was published in; NULL while publishing.';
+
+-- Called by the API with the segment count once every segment is published,
+-- and by the worker (without it) after storing each segment; whichever runs
+-- last completes the document. Returns whether the document is completed.
+CREATE OR REPLACE FUNCTION public.complete_document_segments(
+  p_document_id uuid,
+  p_segment_count integer DEFAULT NULL
+)
+RETURNS boolean
+LANGUAGE sql
+AS $$
+  UPDATE public.documents AS d
+  SET
+    segment_count = COALESCE(p_segment_count, d.segment_count),
+    status = CASE
+      WHEN COALESCE(p_segment_count, d.segment_count) <= (
+        SELECT count(DISTINCT dc.page_start)
+        FROM public.document_chunks AS dc
+        WHERE dc.document_id = d.id AND dc.page_start IS NOT NULL
+      ) THEN 'completed'
+      ELSE d.status
+    END
+  WHERE d.id = p_document_id
+  RETURNING d.status = 'completed';
+$$;
@@ -0,0 +1,25 @@
+-- 027_rate_limit_usage_per_instance.sql
+-- sync_rate_limit_usage returned one total per bucket over the instances
+-- seen in the last 10 minutes. When an instance's row aged out the total
+-- dropped, and when it reported again its whole counter came back at once
+-- and was debited as new consumption. It now returns each instance's
+-- counter, which callers diff one by one.
+
+drop function if exists sync_rate_limit_usage(text, jsonb);
+
+-- Adds an instance's consumption since its last sync and returns the
+-- counters of the other instances active in the last 10 minutes.
+create or replace function sync_rate_limit_usage(p_instance_id text, p_consumed jsonb)
+returns table (bucket_key text, instance_id text, consumed bigint) as $$
+    with reported as (
+        insert into public.rate_limit_usage as u (bucket_key, instance_id, consumed)
+        select key, p_instance_id, value::bigint from jsonb_each_text(p_consumed)
+        on conflict (bucket_key, instance_id)
+        do update set consumed = u.consumed + excluded.consumed, updated_at = now()
+        returning 1
+    )
+    select u.bucket_key, u.instance_id, u.consumed
+    from public.rate_limit_usage u
+    where u.instance_id <> p_instance_id
+      and u.updated_at > now() - interval '10 minutes';
+$$ language sql security definer;
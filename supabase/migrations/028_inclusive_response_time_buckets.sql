@@ -0,0 +1,185 @@
+-- 028_inclusive_response_time_buckets.sql
+-- The response-time histogram documents its bounds (500, 1000, 2000, 5000,
+-- 10000 and 30000 ms) as inclusive upper bounds, and the API labels them
+-- le_ms. width_bucket counts a value equal to a threshold in the bucket
+-- above, so a 500 ms turn landed in the 500-1000 ms bucket. Bucketing now
+-- lives in response_time_bucket(), which shifts integer milliseconds by one
+-- so each bound falls in its own bucket, and the rollup uses it.
+-- Histograms already folded keep their counts; only turns exactly on a
+-- bound were affected.
+
+-- 1-based histogram index of a response time: 1 for <= 500 ms through 6 for
+-- <= 30000 ms, 7 for anything slower. NULL stays NULL and is not counted.
+CREATE OR REPLACE FUNCTION public.response_time_bucket(response_time_ms integer)
+RETURNS integer
+LANGUAGE sql IMMUTABLE
+AS $$
+  SELECT width_bucket(response_time_ms - 1, ARRAY[500, 1000, 2000, 5000, 10000, 30000]) + 1;
+$$;
+
+-- Same as in 018, bucketing with response_time_bucket().
+CREATE OR REPLACE FUNCTION public.rollup_quality_metrics(
+  batch_size int DEFAULT 5000,
+  settle_interval interval DEFAULT '1 minute'
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  wm record;
+  folded integer;
+BEGIN
+  -- Serializes concurrent runs of the job.
+  SELECT last_created_at, last_id INTO wm
+  FROM public.rollup_watermarks
+  WHERE name = 'quality_metrics'
+  FOR UPDATE;
+
+  WITH batch AS (
+    SELECT c.id, c.user_id, c.agent_id, c.created_at, c.response_time_ms, c.csat,
+           public.response_time_bucket(c.response_time_ms) AS bucket
+    FROM public.conversations c
+    WHERE (c.created_at, c.id) > (wm.last_created_at, wm.last_id)
+      AND c.created_at < now() - settle_interval
+    ORDER BY c.created_at, c.id
+    LIMIT batch_size
+  ),
+  deltas AS (
+    SELECT user_id, agent_id,
+           count(*) AS conversations_count,
+           count(response_time_ms) AS response_time_count,
+           coalesce(sum(response_time_ms), 0) AS response_time_sum_ms,
+           ARRAY[
+             count(*) FILTER (WHERE bucket = 1), count(*) FILTER (WHERE bucket = 2),
+             count(*) FILTER (WHERE bucket = 3), count(*) FILTER (WHERE bucket = 4),
+             count(*) FILTER (WHERE bucket = 5), count(*) FILTER (WHERE bucket = 6),
+             count(*) FILTER (WHERE bucket = 7)
+           ] AS response_time_histogram,
+           count(csat) AS csat_count,
+           coalesce(sum(csat), 0) AS csat_sum
+    FROM batch
+    GROUP BY user_id, agent_id
+  ),
+  agent_rollup AS (
+    INSERT INTO public.quality_metrics_agent AS m (
+      user_id, agent_id, conversations_count, response_time_count, response_time_sum_ms,
+      response_time_histogram, csat_count, csat_sum, avg_response_time_sec, csat
+    )
+    SELECT d.user_id, d.agent_id, d.conversations_count, d.response_time_count, d.response_time_sum_ms,
+           d.response_time_histogram, d.csat_count, d.csat_sum,
+           coalesce(d.response_time_sum_ms / 1000.0 / nullif(d.response_time_count, 0), 0),
+           coalesce(d.csat_sum::double precision / nullif(d.csat_count, 0), 0)
+    FROM deltas d
+    ON CONFLICT (user_id, agent_id) DO UPDATE SET
+      conversations_count = m.conversations_count + EXCLUDED.conversations_count,
+      response_time_count = m.response_time_count + EXCLUDED.response_time_count,
+      response_time_sum_ms = m.response_time_sum_ms + EXCLUDED.response_time_sum_ms,
+      response_time_histogram = public.bigint_array_add(m.response_time_histogram, EXCLUDED.response_time_histogram),
+      csat_count = m.csat_count + EXCLUDED.csat_count,
+      csat_sum = m.csat_sum + EXCLUDED.csat_sum,
+      avg_response_time_sec = coalesce(
+        (m.response_time_sum_ms + EXCLUDED.response_time_sum_ms) / 1000.0
+        / nullif(m.response_time_count + EXCLUDED.response_time_count, 0), 0),
+      csat = coalesce(
+        (m.csat_sum + EXCLUDED.csat_sum)::double precision
+        / nullif(m.csat_count + EXCLUDED.csat_count, 0), 0),
+      updated_at = now()
+  ),
+  user_deltas AS (
+    SELECT user_id,
+           sum(conversations_count)::bigint AS conversations_count,
+           sum(response_time_count)::bigint AS response_time_count,
+           sum(response_time_sum_ms)::bigint AS response_time_sum_ms,
+           ARRAY[
+             sum(response_time_histogram[1]), sum(response_time_histogram[2]),
+             sum(response_time_histogram[3]), sum(response_time_histogram[4]),
+             sum(response_time_histogram[5]), sum(response_time_histogram[6]),
+             sum(response_time_histogram[7])
+           ]::bigint[] AS response_time_histogram,
+           sum(csat_count)::bigint AS csat_count,
+           sum(csat_sum)::bigint AS csat_sum
+    FROM deltas
+    GROUP BY user_id
+  ),
+  user_rollup AS (
+    INSERT INTO public.quality_metrics AS m (
+      user_id, conversations_reviewed, response_time_count, response_time_sum_ms,
+      response_time_histogram, csat_count, csat_sum, avg_response_time_sec, csat
+    )
+    SELECT d.user_id, d.conversations_count, d.response_time_count, d.response_time_sum_ms,
+           d.response_time_histogram, d.csat_count, d.csat_sum,
+           coalesce(d.response_time_sum_ms / 1000.0 / nullif(d.response_time_count, 0), 0),
+           coalesce(d.csat_sum::double precision / nullif(d.csat_count, 0), 0)
+    FROM user_deltas d
+    ON CONFLICT (user_id) DO UPDATE SET
+      conversations_reviewed = m.conversations_reviewed + EXCLUDED.conversations_reviewed,
+      response_time_count = m.response_time_count + EXCLUDED.response_time_count,
+      response_time_sum_ms = m.response_time_sum_ms + EXCLUDED.response_time_sum_ms,
+      response_time_histogram = public.bigint_array_add(m.response_time_histogram, EXCLUDED.response_time_histogram),
+      csat_count = m.csat_count + EXCLUDED.csat_count,
+      csat_sum = m.csat_sum + EXCLUDED.csat_sum,
+      avg_response_time_sec = coalesce(
+        (m.response_time_sum_ms + EXCLUDED.response_time_sum_ms) / 1000.0
+        / nullif(m.response_time_count + EXCLUDED.response_time_count, 0), 0),
+      csat = coalesce(
+        (m.csat_sum + EXCLUDED.csat_sum)::double precision
+        / nullif(m.csat_count + EXCLUDED.csat_count, 0), 0),
+      updated_at = now()
+  ),
+  advance AS (
+    UPDATE public.rollup_watermarks w
+    SET last_created_at = l.created_at, last_id = l.id, updated_at = now()
+    FROM (SELECT created_at, id FROM batch ORDER BY created_at DESC, id DESC LIMIT 1) l
+    WHERE w.name = 'quality_metrics'
+  )
+  SELECT count(*) INTO folded FROM batch;
+
+  RETURN folded;
+END;
+$$;
+
+-- 4. A CSAT score usually arrives after its turn has been folded. Apply the
+-- change directly to the rollups in that case; turns still past the
+-- watermark will be picked up by the next rollup run.
+CREATE OR REPLACE FUNCTION public.apply_csat_to_quality_rollups()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  wm record;
+  count_delta integer := (NEW.csat IS NOT NULL)::int - (OLD.csat IS NOT NULL)::int;
+  sum_delta integer := coalesce(NEW.csat, 0) - coalesce(OLD.csat, 0);
+BEGIN
+  SELECT last_created_at, last_id INTO wm
+  FROM public.rollup_watermarks
+  WHERE name = 'quality_metrics'
+  FOR SHARE;
+
+  IF (NEW.created_at, NEW.id) > (wm.last_created_at, wm.last_id) THEN
+    RETURN NEW;
+  END IF;
+
+  UPDATE public.quality_metrics_agent
+  SET csat_count = csat_count + count_delta,
+      csat_sum = csat_sum + sum_delta,
+      csat = coalesce((csat_sum + sum_delta)::double precision / nullif(csat_count + count_delta, 0), 0),
+      updated_at = now()
+  WHERE user_id = NEW.user_id AND agent_id = NEW.agent_id;
+
+  UPDATE public.quality_metrics
+  SET csat_count = csat_count + count_delta,
+      csat_sum = csat_sum + sum_delta,
+      csat = coalesce((csat_sum + sum_delta)::double precision / nullif(csat_count + count_delta, 0), 0),
+      updated_at = now()
+  WHERE user_id = NEW.user_id;
+
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS conversations_csat_rollup ON public.conversations;
+CREATE TRIGGER conversations_csat_rollup
+AFTER UPDATE OF csat ON public.conversations
+FOR EACH ROW
+WHEN (OLD.csat IS DISTINCT FROM NEW.csat)
+EXECUTE FUNCTION public.apply_csat_to_quality_rollups();
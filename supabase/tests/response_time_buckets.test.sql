@@ -0,0 +1,18 @@
+-- Run with `supabase test db`.
+BEGIN;
+CREATE EXTENSION IF NOT EXISTS pgtap WITH SCHEMA extensions;
+
+SELECT plan(9);
+
+SELECT is(public.response_time_bucket(0), 1, '0 ms is in the first bucket');
+SELECT is(public.response_time_bucket(500), 1, '500 ms is within the 500 ms bound');
+SELECT is(public.response_time_bucket(501), 2, '501 ms is in the 1000 ms bucket');
+SELECT is(public.response_time_bucket(1000), 2, '1000 ms is within the 1000 ms bound');
+SELECT is(public.response_time_bucket(2000), 3, '2000 ms is within the 2000 ms bound');
+SELECT is(public.response_time_bucket(10000), 5, '10000 ms is within the 10000 ms bound');
+SELECT is(public.response_time_bucket(30000), 6, '30000 ms is within the last bound');
+SELECT is(public.response_time_bucket(30001), 7, 'slower turns go to the overflow bucket');
+SELECT is(public.response_time_bucket(NULL), NULL::integer, 'turns without a response time are not bucketed');
+
+SELECT * FROM finish();
+ROLLBACK;
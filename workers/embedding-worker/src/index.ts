@@ -7,13 +7,16 @@ export interface Env {
 	SUPABASE_SERVICE_ROLE_KEY: string;
 	GOOGLE_API_PROJECT_ID: string;
 	GOOGLE_API_LOCATION: string;
+	OPENAI_API_KEY: string;
 	// The GOOGLE_APPLICATION_CREDENTIALS_JSON secret is also implicitly available
 }
 
 // Payloads from the queue can be for a knowledge document or a chat message
 interface DocumentPayload {
 	document_id: string; // UUID
+	user_id: string; // UUID
 	text: string;
+	pages: [number, number]; // First and last page of the segment
 }
 
 interface ChatMessagePayload {
@@ -23,6 +26,13 @@ interface ChatMessagePayload {
 
 type EmbeddingPayload = DocumentPayload | ChatMessagePayload;
 
+// document_chunks.embedding holds text-embedding-3-large vectors, the model
+// the API embeds queries with.
+const DOCUMENT_EMBEDDING_MODEL = 'text-embedding-3-large';
+// Segments arrive with up to 32k characters; they are stored as chunks of
+// at most this size, split between paragraphs.
+const CHUNK_MAX_CHARS = 4000;
+
 // Type guard to differentiate payloads
 function isDocumentPayload(payload: EmbeddingPayload): payload is DocumentPayload {
 	return (payload as DocumentPayload).document_id !== undefined;
@@ -34,6 +44,10 @@ export default {
 
 		for (const message of batch.messages) {
 			const payload = message.body;
+			if (isDocumentPayload(payload)) {
+				await storeDocumentSegment(payload, message, supabase, env);
+				continue;
+			}
 			let embedding: number[];
 
 			try {
@@ -43,53 +57,33 @@ export default {
 			} catch (err: any) {
 				console.error(`Failed to generate embedding for message ${message.id}: ${err.message}`);
 				// Mark as failed in DB and ack to avoid retries for now
-				if (isDocumentPayload(payload)) {
-					await supabase.from('documents').update({ status: 'failed' }).eq('id', payload.document_id);
-				} else {
-					await supabase.from('messages').update({ status: 'failed' }).eq('id', payload.messageId);
-				}
+				await supabase.from('messages').update({ status: 'failed' }).eq('id', payload.messageId);
 				message.ack();
 				continue; // Move to the next message
 			}
 
 			try {
-				if (isDocumentPayload(payload)) {
-					// Logic for knowledge documents
-					console.log(`Updating document ${payload.document_id} with embedding.`);
-					const { error } = await supabase
-						.from('documents')
-						.update({
-							embedding: embedding,
-							status: 'completed',
-						})
-						.eq('id', payload.document_id);
-
-					if (error) throw new Error(`Supabase document update error: ${error.message}`);
-					console.log(`Successfully processed document ${payload.document_id}.`);
-
-				} else {
-					// Logic for chat messages
-					console.log(`Storing embedding for message ${payload.messageId}.`);
-					// A. Insert new document record for the message embedding
-					const { error: insertError } = await supabase.from('documents').insert({
-						message_id: payload.messageId,
-						content: payload.text,
-						embedding: embedding,
-						status: 'completed', // Document record is immediately complete
-					});
-					if (insertError) throw new Error(`Supabase insert error: ${insertError.message}`);
-
-					// B. Update original message status
-					const { error: updateError } = await supabase
-						.from('messages')
-						.update({ status: 'completed' })
-						.eq('id', payload.messageId);
-					if (updateError) {
-						// This is not a fatal error for the embedding, but should be logged.
-						console.warn(`Failed to update message status for ${payload.messageId}: ${updateError.message}`);
-					}
-					console.log(`Successfully processed message ${payload.messageId}.`);
+				// Logic for chat messages
+				console.log(`Storing embedding for message ${payload.messageId}.`);
+				// A. Insert new document record for the message embedding
+				const { error: insertError } = await supabase.from('documents').insert({
+					message_id: payload.messageId,
+					content: payload.text,
+					embedding: embedding,
+					status: 'completed', // Document record is immediately complete
+				});
+				if (insertError) throw new Error(`Supabase insert error: ${insertError.message}`);
+
+				// B. Update original message status
+				const { error: updateError } = await supabase
+					.from('messages')
+					.update({ status: 'completed' })
+					.eq('id', payload.messageId);
+				if (updateError) {
+					// This is not a fatal error for the embedding, but should be logged.
+					console.warn(`Failed to update message status for ${payload.messageId}: ${updateError.message}`);
 				}
+				console.log(`Successfully processed message ${payload.messageId}.`);
 
 				message.ack(); // Mark as processed successfully
 			} catch (err: any) {
@@ -101,6 +95,128 @@ export default {
 	},
 };
 
+// Stores one segment of a knowledge document as document_chunks rows. Rows are
+// keyed by document, first page and position, so a redelivered segment
+// overwrites its own rows; the document is completed once all segments are in.
+async function storeDocumentSegment(
+	payload: DocumentPayload,
+	message: Message<EmbeddingPayload>,
+	supabase: ReturnType<typeof createClient>,
+	env: Env,
+): Promise<void> {
+	const [pageStart, pageEnd] = payload.pages;
+	// The API deletes the document when an upload fails after some segments
+	// were published; those segments are dropped instead of being embedded and
+	// retried against the document_chunks foreign key.
+	const { data: document, error: lookupError } = await supabase
+		.from('documents')
+		.select('id')
+		.eq('id', payload.document_id)
+		.maybeSingle();
+	if (lookupError) {
+		console.error(`Error looking up document for message ID ${message.id}: ${lookupError.message}`);
+		message.retry();
+		return;
+	}
+	if (!document) {
+		console.warn(`Dropping pages ${pageStart}-${pageEnd} of deleted document ${payload.document_id}.`);
+		message.ack();
+		return;
+	}
+
+	const chunks = splitIntoChunks(payload.text, CHUNK_MAX_CHARS);
+	let embeddings: number[][];
+	try {
+		console.log(`Embedding pages ${pageStart}-${pageEnd} of document ${payload.document_id} (${chunks.length} chunks).`);
+		embeddings = await generateDocumentEmbeddings(chunks, env);
+	} catch (err: any) {
+		console.error(`Failed to generate embeddings for message ${message.id}: ${err.message}`);
+		// Mark as failed in DB and ack to avoid retries for now
+		await supabase.from('documents').update({ status: 'failed' }).eq('id', payload.document_id);
+		message.ack();
+		return;
+	}
+
+	try {
+		const rows = chunks.map((content, index) => ({
+			document_id: payload.document_id,
+			user_id: payload.user_id,
+			content,
+			embedding: embeddings[index],
+			page_start: pageStart,
+			page_end: pageEnd,
+			chunk_index: index,
+		}));
+		const { error } = await supabase
+			.from('document_chunks')
+			.upsert(rows, { onConflict: 'document_id,page_start,chunk_index' });
+		if (error) throw new Error(`Supabase chunk upsert error: ${error.message}`);
+
+		const { error: rpcError } = await supabase.rpc('complete_document_segments', {
+			p_document_id: payload.document_id,
+		});
+		if (rpcError) throw new Error(`Supabase document status error: ${rpcError.message}`);
+		console.log(`Stored pages ${pageStart}-${pageEnd} of document ${payload.document_id}.`);
+		message.ack();
+	} catch (err: any) {
+		console.error(`Error saving chunks for message ID ${message.id}: ${err.message}`);
+		// A DB error occurred, retry the message.
+		message.retry();
+	}
+}
+
+// Splits text between paragraphs into chunks of at most maxChars; a single
+// longer paragraph is cut at maxChars.
+function splitIntoChunks(text: string, maxChars: number): string[] {
+	const chunks: string[] = [];
+	let current = '';
+	for (const paragraph of text.split(/\n{2,}/)) {
+		const trimmed = paragraph.trim();
+		if (!trimmed) continue;
+		if (current && current.length + trimmed.length + 2 > maxChars) {
+			chunks.push(current);
+			current = '';
+		}
+		for (let start = 0; start < trimmed.length; start += maxChars) {
+			const piece = trimmed.slice(start, start + maxChars);
+			if (piece.length === maxChars) {
+				if (current) chunks.push(current);
+				chunks.push(piece);
+				current = '';
+			} else {
+				current = current ? `${current}\n\n${piece}` : piece;
+			}
+		}
+	}
+	if (current) chunks.push(current);
+	return chunks;
+}
+
+async function generateDocumentEmbeddings(texts: string[], env: Env): Promise<number[][]> {
+	const response = await fetch('https://api.openai.com/v1/embeddings', {
+		method: 'POST',
+		headers: {
+			Authorization: `Bearer ${env.OPENAI_API_KEY}`,
+			'Content-Type': 'application/json',
+		},
+		body: JSON.stringify({ model: DOCUMENT_EMBEDDING_MODEL, input: texts }),
+	});
+
+	if (!response.ok) {
+		const errorBody = await response.text();
+		throw new Error(`Failed to generate embeddings: ${response.status} ${errorBody}`);
+	}
+
+	const data: any = await response.json();
+	const embeddings = (data?.data ?? [])
+		.sort((a: any, b: any) => a.index - b.index)
+		.map((item: any) => item.embedding);
+	if (embeddings.length !== texts.length) {
+		throw new Error('Invalid response from embedding API');
+	}
+	return embeddings;
+}
+
 async function generateEmbedding(text: string, env: Env): Promise<number[]> {
 	// Using Google Auth Library to get credentials and make a request to the Vertex AI Embedding API
 	const auth = new GoogleAuth({